@@ -1,6 +1,24 @@
 import requests
 import json
 import getpass
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+
+# Status codes worth another attempt; 401 is handled by logging in again
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+SAVE_PAYLOAD = {
+    "promptOptions": {
+        "saveAsWithAnswers": True,
+        "saveAsFilterWithPrompts": True,
+        "saveAsTemplateWithPrompts": True
+    }
+}
 
 def authenticate(session, env_info, user_info):
     response = session.post(f"{env_info['BASE_URL']}/api/auth/login", json=user_info)
@@ -11,72 +29,227 @@ def authenticate(session, env_info, user_info):
         print("Authentication failed:", response.json())
         return None
 
-# Define environment information
-env_info = {
-    'BASE_URL': 'http://localhost:8080/MicroStrategyLibrary',  # Replace with your Strategy server URL
-}
-
-# Define user information
-user_info = {
-    'loginMode': 1,  # This can vary based on your authentication method
-    'username': 'administrator',  # Replace with your username
-    'password': getpass.getpass(prompt='Password Source ')  # Replace with your password
-}
-
-# Create a session
-session = requests.Session()
-
-# Authenticate
-x_mstr_auth_token = authenticate(session, env_info, user_info)
-
-# Use the token for subsequent requests
-headers = {
-    'X-MSTR-AuthToken': x_mstr_auth_token,
-    'Content-Type': 'application/json',
-    'Accept': 'application/json',
-    'X-MSTR-ProjectID': 'B19DEDCC11D4E0EFC000EB9495D0F44F'  # Replace with your project ID
-}
-
-# Load your JSON payload from a local file
-with open('C:\\Users\\ajaym\\Desktop\\mstr-rest-api\\ffsqljason.json', 'r') as file:
-    json_payload = json.load(file)
-
-# Create the report using the JSON payload
-create_report_url = f"{env_info['BASE_URL']}/api/model/reports?showExpressionAs=tree&showAdvancedProperties=true"
-response = session.post(create_report_url, headers=headers, json=json_payload)
-
-if response.status_code == 201:
-    print("Report created successfully:", response.json())
-
-    report_id = response.json().get('information', {}).get('objectId')
-    print("Report ID:", report_id)
-
-    instance_id = response.headers.get('X-MSTR-MS-Instance')
-    print("Instance ID:", instance_id)
-
-    save_report_url = f"{env_info['BASE_URL']}/api/model/reports/{report_id}/instances/save"
-
-    # Build save headers with required tokens
-    save_headers = {
-        'X-MSTR-AuthToken': headers['X-MSTR-AuthToken'],
-        'X-MSTR-MS-Instance': instance_id,
-        'Content-Type': 'application/json',
-        'Accept': 'application/json'
+class ReportBuildError(Exception):
+    pass
+
+class MstrClient:
+    """One pooled, authenticated session shared by all report threads.
+
+    The auth token is renewed once when a call comes back 401 (other threads
+    that hit the same expiry reuse the new token), 429/5xx answers and
+    connection errors are retried with exponential backoff, and a Retry-After
+    from the server pauses every thread, not just the one that got it.
+    """
+
+    def __init__(self, env_info, user_info, project_id, pool_size=8, max_retries=5, backoff=0.5):
+        self.env_info = env_info
+        self.user_info = user_info
+        self.project_id = project_id
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.token = None
+        self.token_generation = 0
+        self.logins = 0
+        self._auth_lock = threading.Lock()
+        self._paused_until = 0.0
+
+    def login(self, seen_generation=None):
+        """(Re)authenticate unless another thread already did since ``seen_generation``"""
+        with self._auth_lock:
+            if seen_generation is not None and seen_generation != self.token_generation:
+                return
+            token = authenticate(self.session, self.env_info, self.user_info)
+            if token is None:
+                raise ReportBuildError("Authentication failed")
+            self.token = token
+            self.token_generation += 1
+            self.logins += 1
+
+    def _wait_for_rate_limit(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def post(self, url, expected_status, headers=None, payload=None):
+        """POST with token renewal and retries; returns the response with ``expected_status``"""
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_rate_limit()
+            generation = self.token_generation
+            request_headers = {'X-MSTR-AuthToken': self.token, 'Content-Type': 'application/json',
+                               'Accept': 'application/json'}
+            request_headers.update(headers or {})
+            try:
+                response = self.session.post(url, headers=request_headers, json=payload, timeout=120)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                last_error = f"{type(e).__name__}: {str(e)}"
+            else:
+                if response.status_code == expected_status:
+                    return response
+                last_error = f"{response.status_code} {response.text[:500]}"
+                if response.status_code == 401:
+                    # Token expired: log in again and retry straight away
+                    self.login(generation)
+                    continue
+                if response.status_code not in TRANSIENT_STATUSES:
+                    raise ReportBuildError(last_error)
+                retry_after = response.headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    self._paused_until = max(self._paused_until, time.monotonic() + int(retry_after))
+            if attempt < self.max_retries:
+                time.sleep(self.backoff * (2 ** attempt))
+        raise ReportBuildError(f"Gave up after {self.max_retries + 1} attempts: {last_error}")
+
+    def create_report(self, payload):
+        """Create a report instance; returns (report id, instance id)"""
+        create_report_url = f"{self.env_info['BASE_URL']}/api/model/reports?showExpressionAs=tree&showAdvancedProperties=true"
+        response = self.post(create_report_url, 201, {'X-MSTR-ProjectID': self.project_id}, payload)
+        report_id = response.json().get('information', {}).get('objectId')
+        instance_id = response.headers.get('X-MSTR-MS-Instance')
+        if not report_id or not instance_id:
+            raise ReportBuildError(f"Create response without report/instance id: {response.text[:500]}")
+        return report_id, instance_id
+
+    def save_report(self, report_id, instance_id):
+        save_report_url = f"{self.env_info['BASE_URL']}/api/model/reports/{report_id}/instances/save"
+        self.post(save_report_url, 201, {'X-MSTR-MS-Instance': instance_id}, SAVE_PAYLOAD)
+
+class Journal:
+    """Append-only NDJSON log of report states, used to skip saved reports on rerun"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def saved_keys(self):
+        saved = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    if entry.get('status') == 'saved':
+                        saved.add(entry['key'])
+        return saved
+
+    def record(self, key, status, **fields):
+        entry = dict(key=key, status=status, time=time.strftime('%Y-%m-%dT%H:%M:%S'), **fields)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+                f.flush()
+
+def iter_payloads(source):
+    """Yield (key, payload) from a directory of .json files or an NDJSON file ('-' for stdin)"""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith('.json'):
+                with open(os.path.join(source, name), 'r') as file:
+                    yield name, json.load(file)
+        return
+    stream = sys.stdin if source == '-' else open(source, 'r')
+    try:
+        for line_no, line in enumerate(stream, 1):
+            if line.strip():
+                yield f"line-{line_no}", json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def build_report(client, journal, key, payload):
+    """Create and save one report, journaling each step"""
+    # Report instances live in the server session, so an unsaved one from an
+    # earlier run cannot be saved later; such payloads are created again
+    report_id, instance_id = client.create_report(payload)
+    journal.record(key, 'created', report_id=report_id, instance_id=instance_id)
+    client.save_report(report_id, instance_id)
+    journal.record(key, 'saved', report_id=report_id)
+    return report_id
+
+def run_bulk(client, source, journal, concurrency=4):
+    """Build every not-yet-saved payload from ``source`` with ``concurrency`` reports in flight"""
+    done = journal.saved_keys()
+    if done:
+        print(f"Skipping {len(done)} reports already saved according to {journal.path}")
+    client.login()
+
+    started = time.perf_counter()
+    saved, failed = 0, 0
+
+    def finish(future):
+        nonlocal saved, failed
+        key = in_flight.pop(future)
+        try:
+            future.result()
+            saved += 1
+        except Exception as e:
+            failed += 1
+            journal.record(key, 'failed', error=str(e))
+            print(f"Failed to build {key}: {str(e)}")
+        total = saved + failed
+        if total % 50 == 0:
+            elapsed = time.perf_counter() - started
+            print(f"{saved} saved, {failed} failed, {saved / elapsed * 60:.1f} reports/min")
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for key, payload in iter_payloads(source):
+            if key in done:
+                continue
+            if len(in_flight) >= concurrency:
+                for future in wait(in_flight, return_when=FIRST_COMPLETED).done:
+                    finish(future)
+            in_flight[pool.submit(build_report, client, journal, key, payload)] = key
+        while in_flight:
+            for future in wait(in_flight, return_when=FIRST_COMPLETED).done:
+                finish(future)
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "saved": saved,
+        "failed": failed,
+        "skipped": len(done),
+        "seconds": round(elapsed, 1),
+        "reports_per_min": round(saved / elapsed * 60, 1) if elapsed else None,
+        "logins": client.logins
+    }
+    print(f"Done: {json.dumps(summary)}")
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create and save MicroStrategy reports from mapping-approved payloads")
+    parser.add_argument('source', help="Directory of .json payloads, or an NDJSON file ('-' for stdin)")
+    parser.add_argument('--base-url', default='http://localhost:8080/MicroStrategyLibrary', help="Strategy server URL")
+    parser.add_argument('--project-id', default='B19DEDCC11D4E0EFC000EB9495D0F44F', help="Project ID")
+    parser.add_argument('--username', default='administrator')
+    parser.add_argument('--login-mode', type=int, default=1, help="Depends on your authentication method")
+    parser.add_argument('--concurrency', type=int, default=4, help="Reports in flight at once")
+    parser.add_argument('--max-retries', type=int, default=5, help="Retries per call for 429/5xx/connection errors")
+    parser.add_argument('--journal', default='report_build_journal.ndjson', help="Progress journal; saved reports are skipped on rerun")
+    args = parser.parse_args(argv)
+
+    # Define environment information
+    env_info = {
+        'BASE_URL': args.base_url.rstrip('/'),
     }
 
-    save_payload = {
-        "promptOptions": {
-            "saveAsWithAnswers": True,
-            "saveAsFilterWithPrompts": True,
-            "saveAsTemplateWithPrompts": True
-        }
+    # Define user information
+    user_info = {
+        'loginMode': args.login_mode,
+        'username': args.username,
+        'password': os.environ.get('MSTR_PASSWORD') or getpass.getpass(prompt='Password Source ')
     }
 
-    save_response = session.post(save_report_url, headers=save_headers, json=save_payload)
+    client = MstrClient(env_info, user_info, args.project_id, pool_size=args.concurrency,
+                        max_retries=args.max_retries)
+    summary = run_bulk(client, args.source, Journal(args.journal), concurrency=args.concurrency)
+    return 0 if summary['failed'] == 0 else 1
 
-    if save_response.status_code == 201:
-        print("Report saved successfully.")
-    else:
-        print("Failed to save report:", save_response.status_code, save_response.text)
-else:
-    print("Failed to create report:", response.status_code, response.text)
\ No newline at end of file
+if __name__ == '__main__':
+    sys.exit(main())
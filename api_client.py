@@ -0,0 +1,116 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class APIError(Exception):
+    """Non-2xx answer from the backend"""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+class SuperKartClient:
+    """Keep-alive client for the SuperKart backend.
+
+    One pooled ``requests.Session`` is reused for every call so clicks skip the
+    TCP/TLS handshake; connection errors and 429/5xx answers are retried with
+    exponential backoff. ``/model_info`` and ``/features`` are cached for
+    ``metadata_ttl`` seconds. Scoring is side-effect free, so POSTs are retried
+    as well.
+    """
+
+    def __init__(self, base_url, timeout=30, retries=3, backoff_factor=0.3,
+                 pool_size=10, metadata_ttl=60, max_workers=8):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.metadata_ttl = metadata_ttl
+        self.max_workers = max_workers
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'POST']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    def _request(self, method, path, timeout=None, **kwargs):
+        response = self.session.request(method, f"{self.base_url}{path}",
+                                        timeout=timeout or self.timeout, **kwargs)
+        if response.status_code != 200:
+            raise APIError(response.status_code, response.text)
+        return response.json()
+
+    def _cached_get(self, path, params=None, timeout=None):
+        key = (path, tuple(sorted((params or {}).items())))
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and now - entry[0] < self.metadata_ttl:
+                return entry[1]
+        value = self._request('GET', path, params=params, timeout=timeout)
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self):
+        """Forget cached metadata, e.g. after a model reload"""
+        with self._cache_lock:
+            self._cache.clear()
+
+    def model_info(self):
+        return self._cached_get('/model_info', timeout=10)
+
+    def features(self):
+        return self._cached_get('/features', timeout=10)
+
+    def sales_cube(self, by=(), **filters):
+        """Aggregated sales rolled up to the ``by`` dimensions, e.g. sales_cube(['Store_Type'])"""
+        params = {"by": ",".join(by)}
+        params.update({k: v if isinstance(v, str) else tuple(v) for k, v in filters.items()})
+        return self._cached_get('/analytics/cube', params=params, timeout=10)
+
+    def predict(self, record):
+        """Score one record; returns the /predict response body"""
+        return self._request('POST', '/predict', json=record)
+
+    def predict_many(self, records):
+        """Score several records with one /predict/batch round trip.
+
+        Falls back to concurrent /predict calls on backends without the batch
+        endpoint. Returns one prediction (or None for a rejected record) per
+        input record, in order.
+        """
+        if not records:
+            return []
+        try:
+            return self._request('POST', '/predict/batch', json=records)['predictions']
+        except APIError as e:
+            if e.status_code not in (404, 405):
+                raise
+        logger.info("Backend has no /predict/batch, scoring records concurrently")
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(records))) as pool:
+            return [result['prediction'] for result in pool.map(self.predict, records)]
+
+    def scenarios(self, base, sweeps):
+        """Score a what-if grid around ``base`` with one /predict/scenarios call"""
+        return self._request('POST', '/predict/scenarios', json={"base": base, "sweeps": sweeps})
+
+    def close(self):
+        self.session.close()
@@ -8,6 +8,13 @@ import json
 from datetime import datetime
 import time
 
+from api_client import APIError, SuperKartClient
+from superkart_options import (
+    SUGAR_CONTENT_OPTIONS, PRODUCT_TYPE_OPTIONS, STORE_SIZE_OPTIONS,
+    STORE_LOCATION_TYPE_OPTIONS, STORE_TYPE_OPTIONS,
+    PRODUCT_WEIGHT_RANGE, PRODUCT_VISIBILITY_RANGE, PRODUCT_MRP_RANGE
+)
+
 # Page configuration
 st.set_page_config(
     page_title="SuperKart Sales Forecasting Dashboard",
@@ -19,28 +26,49 @@ st.set_page_config(
 # Backend API URL (change this to your deployed backend URL)
 API_BASE_URL = "https://YOUR_USERNAME-superkart-sales-api.hf.space"  # Update with your actual Hugging Face backend URL
 
+@st.cache_resource
+def get_client():
+    """One pooled keep-alive client shared by all reruns and sessions"""
+    return SuperKartClient(API_BASE_URL)
+
 def make_prediction(data):
     """Make prediction using the backend API"""
     try:
-        response = requests.post(f"{API_BASE_URL}/predict", json=data, timeout=30)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"API Error: {response.status_code} - {response.text}")
-            return None
+        return get_client().predict(data)
+    except APIError as e:
+        st.error(f"API Error: {e.status_code} - {e.text}")
+        return None
+    except requests.exceptions.RequestException as e:
+        st.error(f"Connection Error: {str(e)}")
+        return None
+
+def make_predictions(records):
+    """Predict several scenarios in one round trip; None on failure"""
+    try:
+        return get_client().predict_many(records)
+    except APIError as e:
+        st.error(f"API Error: {e.status_code} - {e.text}")
+        return None
+    except requests.exceptions.RequestException as e:
+        st.error(f"Connection Error: {str(e)}")
+        return None
+
+def run_scenarios(base, sweeps):
+    """Score a what-if grid on the backend in one request; None on failure"""
+    try:
+        return get_client().scenarios(base, sweeps)
+    except APIError as e:
+        st.error(f"API Error: {e.status_code} - {e.text}")
+        return None
     except requests.exceptions.RequestException as e:
         st.error(f"Connection Error: {str(e)}")
         return None
 
 def get_model_info():
-    """Get model information from backend"""
+    """Get model information from backend (cached for a minute)"""
     try:
-        response = requests.get(f"{API_BASE_URL}/model_info", timeout=10)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
-    except requests.exceptions.RequestException:
+        return get_client().model_info()
+    except (APIError, requests.exceptions.RequestException):
         return None
 
 def main():
@@ -81,10 +109,12 @@ def main():
     
     # Sidebar for navigation
     st.sidebar.title("Navigation")
-    page = st.sidebar.selectbox("Choose a page", ["Prediction", "Model Info", "Data Analysis", "About"])
+    page = st.sidebar.selectbox("Choose a page", ["Prediction", "Scenario Analysis", "Model Info", "Data Analysis", "About"])
     
     if page == "Prediction":
         prediction_page()
+    elif page == "Scenario Analysis":
+        scenario_page()
     elif page == "Model Info":
         model_info_page()
     elif page == "Data Analysis":
@@ -102,26 +132,19 @@ def prediction_page():
         st.subheader("Product Information")
         
         # Product inputs
-        product_weight = st.number_input("Product Weight (kg)", min_value=0.1, max_value=100.0, value=19.2, step=0.1)
-        product_sugar_content = st.selectbox("Product Sugar Content", ["Low Fat", "Regular"])
-        product_visibility = st.slider("Product Visibility", min_value=0.0, max_value=1.0, value=0.073, step=0.001)
-        product_type = st.selectbox("Product Type", [
-            "Dairy", "Soft Drinks", "Meat", "Fruits and Vegetables", 
-            "Household", "Baking Goods", "Snack Foods", "Frozen Foods",
-            "Breakfast", "Health and Hygiene", "Hard Drinks", "Canned",
-            "Breads", "Starchy Foods", "Others", "Seafood"
-        ])
-        product_mrp = st.number_input("Product MRP (₹)", min_value=1.0, max_value=500.0, value=226.8, step=0.1)
+        product_weight = st.number_input("Product Weight (kg)", min_value=PRODUCT_WEIGHT_RANGE[0], max_value=PRODUCT_WEIGHT_RANGE[1], value=19.2, step=0.1)
+        product_sugar_content = st.selectbox("Product Sugar Content", SUGAR_CONTENT_OPTIONS)
+        product_visibility = st.slider("Product Visibility", min_value=PRODUCT_VISIBILITY_RANGE[0], max_value=PRODUCT_VISIBILITY_RANGE[1], value=0.073, step=0.001)
+        product_type = st.selectbox("Product Type", PRODUCT_TYPE_OPTIONS)
+        product_mrp = st.number_input("Product MRP (₹)", min_value=PRODUCT_MRP_RANGE[0], max_value=PRODUCT_MRP_RANGE[1], value=226.8, step=0.1)
     
     with col2:
         st.subheader("Store Information")
         
         # Store inputs
-        store_size = st.selectbox("Store Size", ["Small", "Medium", "High"])
-        store_location_type = st.selectbox("Store Location Type", ["Tier 1", "Tier 2", "Tier 3"])
-        store_type = st.selectbox("Store Type", [
-            "Grocery Store", "Supermarket Type1", "Supermarket Type2", "Supermarket Type3"
-        ])
+        store_size = st.selectbox("Store Size", STORE_SIZE_OPTIONS)
+        store_location_type = st.selectbox("Store Location Type", STORE_LOCATION_TYPE_OPTIONS)
+        store_type = st.selectbox("Store Type", STORE_TYPE_OPTIONS)
     
     # Prediction button
     if st.button("🔮 Predict Sales", type="primary"):
@@ -164,6 +187,88 @@ def prediction_page():
         else:
             st.error("❌ Prediction failed. Please check the backend connection.")
 
+def scenario_page():
+    """What-if response curves for price and placement"""
+    st.markdown('<h2 class="section-header">🧪 Scenario Analysis</h2>', unsafe_allow_html=True)
+    
+    with st.expander("Base product and store", expanded=True):
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            product_weight = st.number_input("Product Weight (kg)", min_value=PRODUCT_WEIGHT_RANGE[0], max_value=PRODUCT_WEIGHT_RANGE[1], value=19.2, step=0.1)
+            product_sugar_content = st.selectbox("Product Sugar Content", SUGAR_CONTENT_OPTIONS)
+            product_visibility = st.slider("Product Visibility", min_value=PRODUCT_VISIBILITY_RANGE[0], max_value=PRODUCT_VISIBILITY_RANGE[1], value=0.073, step=0.001)
+            product_type = st.selectbox("Product Type", PRODUCT_TYPE_OPTIONS)
+            product_mrp = st.number_input("Product MRP (₹)", min_value=PRODUCT_MRP_RANGE[0], max_value=PRODUCT_MRP_RANGE[1], value=226.8, step=0.1)
+        with col2:
+            store_size = st.selectbox("Store Size", STORE_SIZE_OPTIONS)
+            store_location_type = st.selectbox("Store Location Type", STORE_LOCATION_TYPE_OPTIONS)
+            store_type = st.selectbox("Store Type", STORE_TYPE_OPTIONS)
+    
+    base = {
+        "Product_Weight": product_weight,
+        "Product_Sugar_Content": product_sugar_content,
+        "Product_Visibility": product_visibility,
+        "Product_Type": product_type,
+        "Product_MRP": product_mrp,
+        "Store_Size": store_size,
+        "Store_Location_Type": store_location_type,
+        "Store_Type": store_type
+    }
+    
+    # Sweep settings
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        sweep_feature = st.selectbox("Vary", ["Product_MRP", "Product_Visibility"])
+        value_range = PRODUCT_MRP_RANGE if sweep_feature == "Product_MRP" else PRODUCT_VISIBILITY_RANGE
+        start, stop = st.slider("Range", min_value=value_range[0], max_value=value_range[1], value=value_range)
+        points = st.slider("Points", min_value=10, max_value=500, value=200, step=10)
+    with col2:
+        split_by = st.selectbox("One curve per", ["None", "Store_Type", "Store_Location_Type", "Store_Size"])
+        split_options = {
+            "Store_Type": STORE_TYPE_OPTIONS,
+            "Store_Location_Type": STORE_LOCATION_TYPE_OPTIONS,
+            "Store_Size": STORE_SIZE_OPTIONS
+        }
+        split_values = []
+        if split_by != "None":
+            split_values = st.multiselect("Values", split_options[split_by], default=split_options[split_by])
+    
+    if st.button("📉 Plot Response Curves", type="primary"):
+        # The whole grid is expanded and scored on the backend in one request
+        sweeps = {sweep_feature: {"start": start, "stop": stop, "num": points}}
+        if split_values:
+            sweeps[split_by] = split_values
+        
+        with st.spinner("Scoring scenarios..."):
+            result = run_scenarios(base, sweeps)
+        
+        if result:
+            x_values = result['axes'][0]['values']
+            curves = []
+            if len(result['axes']) == 1:
+                curves.append(pd.DataFrame({sweep_feature: x_values, 'Predicted Sales': result['predictions']}))
+            else:
+                # predictions[i][j]: i-th x value, j-th split value
+                for j, label in enumerate(result['axes'][1]['values']):
+                    curves.append(pd.DataFrame({
+                        sweep_feature: x_values,
+                        'Predicted Sales': [row[j] for row in result['predictions']],
+                        split_by: label
+                    }))
+            curve_df = pd.concat(curves, ignore_index=True)
+            
+            fig = px.line(curve_df, x=sweep_feature, y='Predicted Sales',
+                          color=split_by if split_values else None,
+                          title=f"Predicted Sales vs {sweep_feature}")
+            fig.add_vline(x=base[sweep_feature], line_dash="dash", line_color="gray")
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption(f"{result['count']} scenarios scored in one request · model {result.get('model_type', 'Unknown')}")
+            
+            with st.expander("Scenario data"):
+                st.dataframe(curve_df, use_container_width=True)
+        else:
+            st.error("❌ Scenario analysis failed. Please check the backend connection.")
+
 def model_info_page():
     """Model information page"""
     st.markdown('<h2 class="section-header">🤖 Model Information</h2>', unsafe_allow_html=True)
@@ -196,48 +301,74 @@ def model_info_page():
     else:
         st.error("❌ Unable to connect to backend API")
 
+def get_sales_cube(by, **filters):
+    """Aggregated sales from the backend's sales cube (cached for a minute)"""
+    try:
+        return get_client().sales_cube(by, **filters)
+    except (APIError, requests.exceptions.RequestException):
+        return None
+
 def data_analysis_page():
     """Data analysis and visualization page"""
     st.markdown('<h2 class="section-header">📊 Data Analysis & Insights</h2>', unsafe_allow_html=True)
     
-    # Sample data for demonstration
-    np.random.seed(42)
-    sample_data = pd.DataFrame({
-        'Store_Type': ['Grocery Store', 'Supermarket Type1', 'Supermarket Type2', 'Supermarket Type3'] * 25,
-        'Store_Size': ['Small', 'Medium', 'High'] * 33 + ['Small'],
-        'Product_Type': ['Dairy', 'Soft Drinks', 'Meat', 'Fruits and Vegetables', 'Household'] * 20,
-        'Sales': np.random.normal(2000, 500, 100),
-        'Product_MRP': np.random.normal(150, 50, 100)
-    })
+    # Charts are drawn from pre-aggregated slices of SuperKart.csv, never from raw rows
+    by_store_type = get_sales_cube(['Store_Type'])
+    if not by_store_type:
+        st.error("❌ Sales data unavailable. Build the cube on the backend with `python sales_cube.py SuperKart.csv`")
+        return
+    by_product_type = get_sales_cube(['Product_Type'])
+    by_mrp_band = get_sales_cube(['MRP_Band', 'Store_Size'])
+    by_location = get_sales_cube(['Store_Location_Type'])
+    
+    st.caption(f"Based on {by_store_type['source_rows']:,} sales records · updated {by_store_type['updated_at']}")
     
     # Sales by Store Type
     st.subheader("Sales Distribution by Store Type")
-    fig1 = px.box(sample_data, x='Store_Type', y='Sales', color='Store_Type',
-                  title="Sales Distribution Across Different Store Types")
+    store_df = pd.DataFrame(by_store_type['rows'])
+    fig1 = go.Figure()
+    for _, row in store_df.iterrows():
+        # Quartiles come from the cube's sales sketch
+        fig1.add_trace(go.Box(
+            name=row['Store_Type'], q1=[row['sales_p25']], median=[row['sales_p50']],
+            q3=[row['sales_p75']], lowerfence=[row['sales_min']], upperfence=[row['sales_max']],
+            mean=[row['sales_mean']]
+        ))
+    fig1.update_layout(title="Sales Distribution Across Different Store Types", yaxis_title="Sales")
     st.plotly_chart(fig1, use_container_width=True)
     
     # Sales by Product Type
     st.subheader("Average Sales by Product Type")
-    avg_sales = sample_data.groupby('Product_Type')['Sales'].mean().sort_values(ascending=True)
-    fig2 = px.bar(x=avg_sales.values, y=avg_sales.index, orientation='h',
+    product_df = pd.DataFrame(by_product_type['rows']).sort_values('sales_mean', ascending=True)
+    fig2 = px.bar(product_df, x='sales_mean', y='Product_Type', orientation='h',
+                  hover_data=['count', 'sales_total'],
+                  labels={'sales_mean': 'Average Sales', 'Product_Type': 'Product Type'},
                   title="Average Sales by Product Category")
     st.plotly_chart(fig2, use_container_width=True)
     
-    # Correlation between MRP and Sales
+    # Relationship between MRP and Sales
     st.subheader("Price vs Sales Relationship")
-    fig3 = px.scatter(sample_data, x='Product_MRP', y='Sales', color='Store_Size',
-                      title="Relationship between Product MRP and Sales")
+    mrp_df = pd.DataFrame(by_mrp_band['rows'])
+    fig3 = px.line(mrp_df, x='MRP_Band', y='sales_mean', color='Store_Size', markers=True,
+                   category_orders={'MRP_Band': by_mrp_band['mrp_bands'], 'Store_Size': STORE_SIZE_OPTIONS},
+                   labels={'sales_mean': 'Average Sales', 'MRP_Band': 'Product MRP (₹)'},
+                   title="Average Sales by MRP Band and Store Size")
     st.plotly_chart(fig3, use_container_width=True)
     
     # Business Insights
     st.subheader("📈 Key Business Insights")
     
+    best_store = store_df.loc[store_df['sales_mean'].idxmax()]
+    best_product = product_df.iloc[-1]
+    worst_product = product_df.iloc[0]
+    location_df = pd.DataFrame(by_location['rows']).sort_values('sales_total', ascending=False)
+    best_band = mrp_df.groupby('MRP_Band')['sales_total'].sum() / mrp_df.groupby('MRP_Band')['count'].sum()
+    
     insights = [
-        "**Store Performance**: Supermarket Type1 stores show highest average sales performance",
-        "**Product Categories**: Dairy and Meat products demonstrate strong sales potential",
-        "**Pricing Strategy**: Products with MRP between ₹100-200 show optimal sales performance",
-        "**Store Size Impact**: Medium-sized stores often outperform both small and large stores",
-        "**Location Matters**: Tier 1 cities generate higher sales volumes but with increased competition"
+        f"**Store Performance**: {best_store['Store_Type']} stores show the highest average sales (₹{best_store['sales_mean']:,.0f} per product)",
+        f"**Product Categories**: {best_product['Product_Type']} leads average sales (₹{best_product['sales_mean']:,.0f}), {worst_product['Product_Type']} trails (₹{worst_product['sales_mean']:,.0f})",
+        f"**Pricing Strategy**: Products priced at ₹{best_band.idxmax()} show the highest average sales",
+        f"**Location Matters**: {location_df.iloc[0]['Store_Location_Type']} locations generate the largest sales volume (₹{location_df.iloc[0]['sales_total']:,.0f} in total)"
     ]
     
     for insight in insights:
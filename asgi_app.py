@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import flask_app
+import metrics
+import wire_formats
+
+logger = logging.getLogger(__name__)
+
+# Threads that run parsing + model evaluation off the event loop
+ASGI_WORKER_THREADS = int(os.environ.get('ASGI_WORKER_THREADS', 4))
+# Requests allowed to wait for or hold a worker thread before we answer 429
+ASGI_MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', 256))
+ASGI_MAX_BODY_BYTES = int(os.environ.get('ASGI_MAX_BODY_BYTES', 64 * 1024 * 1024))
+# Seconds to wait for in-flight predictions on shutdown
+ASGI_DRAIN_TIMEOUT = float(os.environ.get('ASGI_DRAIN_TIMEOUT', 30))
+
+
+class Overloaded(Exception):
+    pass
+
+
+class PredictionPool:
+    """Bounded thread pool for model work with admission control"""
+
+    def __init__(self, workers, max_pending):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='predict')
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self._idle = None
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded()
+        if self._idle is None:
+            self._idle = asyncio.Event()
+        self.pending += 1
+        self._idle.clear()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+            if self.pending == 0:
+                self._idle.set()
+
+    async def drain(self, timeout):
+        """Wait for in-flight work to finish, then stop the threads"""
+        if self.pending and self._idle is not None:
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Shutdown with {self.pending} predictions still in flight")
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+pool = PredictionPool(ASGI_WORKER_THREADS, ASGI_MAX_PENDING)
+draining = False
+
+
+async def read_body(receive):
+    """Read the request body without blocking the loop; None if it is too large"""
+    chunks = []
+    size = 0
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError("Client disconnected")
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > ASGI_MAX_BODY_BYTES:
+            return None
+        chunks.append(chunk)
+        more_body = message.get('more_body', False)
+    return b''.join(chunks)
+
+
+async def send_json(send, payload, status=200, headers=(), mimetype=wire_formats.JSON_MIMETYPE):
+    """Send ``payload`` as JSON, or in ``mimetype`` when the client negotiated a binary format"""
+    body, mimetype = wire_formats.encode(payload, status, mimetype)
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', mimetype.encode('latin-1')),
+            (b'content-length', str(len(body)).encode()),
+            (b'access-control-allow-origin', b'*'),
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_text(send, text, content_type, status=200):
+    body = text.encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode('latin-1')),
+            (b'content-length', str(len(body)).encode()),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _predict(body, mimetype, echo, model_name):
+    with metrics.stage('parse'):
+        try:
+            data = flask_app.decode_record_body(body, mimetype)
+        except wire_formats.UnsupportedMediaType as e:
+            return {"error": str(e)}, 415
+    return flask_app.predict_payload(data, echo, model_name)
+
+
+def _reload(body):
+    try:
+        data = json.loads(body) if body else {}
+    except ValueError:
+        data = {}
+    return flask_app.reload_payload(data.get('version') if isinstance(data, dict) else None)
+
+
+def _predict_scenarios(body, mimetype, model_name):
+    with metrics.stage('batch_parse'):
+        try:
+            data = flask_app.decode_record_body(body, mimetype)
+        except wire_formats.UnsupportedMediaType as e:
+            return {"error": str(e)}, 415
+    return flask_app.scenario_payload(data, model_name)
+
+
+def _predict_batch(body, mimetype, chunk_size, model_name):
+    try:
+        with metrics.stage('batch_parse'):
+            records = flask_app.parse_batch_records(body, mimetype)
+    except wire_formats.UnsupportedMediaType as e:
+        return {"error": str(e)}, 415
+    except ValueError as e:
+        return {"error": f"Invalid request body: {str(e)}"}, 400
+    return flask_app.predict_batch_payload(records, chunk_size, model_name)
+
+
+async def run_pooled(send, job, mimetype=wire_formats.JSON_MIMETYPE):
+    """(payload, status) of ``job`` on the worker pool, or None after answering 429"""
+    try:
+        return await pool.run(*job)
+    except Overloaded:
+        await send_json(send, {"error": "Too many requests in flight, retry later"}, 429,
+                        headers=[(b'retry-after', b'1')], mimetype=mimetype)
+        return None
+
+
+ROUTES = ('/', '/live', '/ready', '/features', '/model_info', '/metrics', '/drift', '/predict',
+          '/predict/batch', '/predict/scenarios', '/analytics/cube', '/admin/reload', '/admin/rollback')
+
+
+async def handle_http(scope, receive, send):
+    method = scope['method']
+    path = scope['path'].rstrip('/') or '/'
+
+    if method == 'OPTIONS':
+        await send({'type': 'http.response.start', 'status': 204, 'headers': [
+            (b'access-control-allow-origin', b'*'),
+            (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+            (b'access-control-allow-headers', b'content-type, x-admin-token, prefer'),
+        ]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    if method == 'GET' and path == '/':
+        await send_json(send, flask_app.home_payload())
+    elif method == 'GET' and path == '/live':
+        await send_json(send, {"status": "alive", "pid": os.getpid()})
+    elif method == 'GET' and path == '/ready':
+        payload, status = flask_app.ready_payload()
+        await send_json(send, payload, status)
+    elif method == 'GET' and path == '/features':
+        await send_json(send, flask_app.features_payload())
+    elif method == 'GET' and path == '/model_info':
+        await send_json(send, flask_app.model_info_payload())
+    elif method == 'GET' and path == '/analytics/cube':
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        by = [d for d in query.pop('by', [''])[0].split(',') if d]
+        result = await run_pooled(send, (flask_app.sales_cube_payload, by, query))
+        if result is not None:
+            await send_json(send, *result)
+    elif method == 'GET' and path == '/drift':
+        result = await run_pooled(send, (flask_app.drift_payload,))
+        if result is not None:
+            await send_json(send, *result)
+    elif method == 'GET' and path == '/metrics':
+        await send_text(send, metrics.render_prometheus(), 'text/plain; version=0.0.4')
+    elif method == 'POST' and path in ('/admin/reload', '/admin/rollback'):
+        headers = dict(scope.get('headers') or [])
+        token = headers.get(b'x-admin-token', b'').decode('latin-1')
+        if not flask_app.admin_authorized(token):
+            await send_json(send, {"error": "Admin token missing or invalid"}, 403)
+            return
+        body = await read_body(receive)
+        # Loading runs on the default executor so predictions keep their threads
+        loop = asyncio.get_running_loop()
+        if path == '/admin/reload':
+            payload, status = await loop.run_in_executor(None, _reload, body)
+        else:
+            payload, status = flask_app.rollback_payload()
+        await send_json(send, payload, status)
+    elif method == 'POST' and path in ('/predict', '/predict/batch', '/predict/scenarios'):
+        if draining:
+            await send_json(send, {"error": "Server is shutting down"}, 503)
+            return
+        body = await read_body(receive)
+        if body is None:
+            await send_json(send, {"error": "Request body too large"}, 413)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        mimetype = headers.get(b'content-type', b'').decode('latin-1').split(';')[0].strip()
+        accept = wire_formats.negotiate(headers.get(b'accept', b'').decode('latin-1'))
+        if accept is None:
+            await send_json(send, wire_formats.not_acceptable_payload(), 406)
+            return
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        model_name = query.get('model', [None])[0]
+        if path == '/predict':
+            echo = flask_app.echo_requested(query.get('echo', [None])[0],
+                                            headers.get(b'prefer', b'').decode('latin-1'))
+            job = (_predict, body, mimetype, echo, model_name)
+        elif path == '/predict/scenarios':
+            job = (_predict_scenarios, body, mimetype, model_name)
+        else:
+            try:
+                chunk_size = flask_app.parse_chunk_size(query.get('chunk_size', [None])[0])
+            except ValueError as e:
+                await send_json(send, {"error": str(e)}, 400, mimetype=accept)
+                return
+            job = (_predict_batch, body, mimetype, chunk_size, model_name)
+
+        result = await run_pooled(send, job, mimetype=accept)
+        if result is not None:
+            await send_json(send, *result, mimetype=accept)
+    elif path in ROUTES:
+        await send_json(send, {"error": "Method not allowed"}, 405)
+    else:
+        await send_json(send, {"error": "Endpoint not found"}, 404)
+
+
+async def handle_lifespan(receive, send):
+    global draining
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Accept connections right away; /ready turns 200 once the model is warm
+            flask_app.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            draining = True
+            logger.info(f"Draining {pool.pending} in-flight predictions")
+            await pool.drain(ASGI_DRAIN_TIMEOUT)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI entry point, e.g. ``uvicorn asgi_app:app --port 7860``"""
+    if scope['type'] == 'lifespan':
+        await handle_lifespan(receive, send)
+    elif scope['type'] == 'http':
+        started = time.perf_counter()
+        statuses = []
+
+        async def send_and_record(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+            await send(message)
+
+        try:
+            await handle_http(scope, receive, send_and_record)
+        except ConnectionError:
+            pass
+        if statuses:
+            path = scope['path'].rstrip('/') or '/'
+            metrics.record_request(path if path in ROUTES else 'unmatched', statuses[0],
+                                   time.perf_counter() - started)
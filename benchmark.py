@@ -0,0 +1,334 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import flask_app
+from superkart_options import (
+    SUGAR_CONTENT_OPTIONS, PRODUCT_TYPE_OPTIONS, STORE_SIZE_OPTIONS,
+    STORE_LOCATION_TYPE_OPTIONS, STORE_TYPE_OPTIONS,
+    PRODUCT_WEIGHT_RANGE, PRODUCT_VISIBILITY_RANGE, PRODUCT_MRP_RANGE
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZES = [1, 10, 100, 1000, 10000, 100000]
+DEFAULT_CONCURRENCY = [1, 4, 16, 64]
+LAYERS = ['preprocess', 'model', 'compiled_preprocess', 'flat_model', 'flask', 'gunicorn']
+
+
+def synthetic_records(n, seed=42):
+    """Reproducible SuperKart records drawn from the dashboard's input choices"""
+    rng = np.random.default_rng(seed)
+    columns = {
+        'Product_Weight': rng.uniform(*PRODUCT_WEIGHT_RANGE, n).round(2),
+        'Product_Sugar_Content': rng.choice(SUGAR_CONTENT_OPTIONS, n),
+        'Product_Visibility': rng.uniform(*PRODUCT_VISIBILITY_RANGE, n).round(3),
+        'Product_Type': rng.choice(PRODUCT_TYPE_OPTIONS, n),
+        'Product_MRP': rng.uniform(*PRODUCT_MRP_RANGE, n).round(2),
+        'Store_Size': rng.choice(STORE_SIZE_OPTIONS, n),
+        'Store_Location_Type': rng.choice(STORE_LOCATION_TYPE_OPTIONS, n),
+        'Store_Type': rng.choice(STORE_TYPE_OPTIONS, n),
+    }
+    return pd.DataFrame(columns)
+
+
+def peak_rss_mb(pids=None):
+    """Peak RSS of this process, or summed over ``pids`` (Linux /proc)"""
+    if pids is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    total_kb = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total_kb += int(line.split()[1])
+        except OSError:
+            continue
+    return round(total_kb / 1024, 1) if total_kb else None
+
+
+def summarize(layer, batch_size, concurrency, latencies, wall_seconds, rss_mb):
+    latencies_ms = np.asarray(latencies) * 1000.0
+    n_calls = len(latencies_ms)
+    return {
+        "layer": layer,
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "calls": n_calls,
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(latencies_ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 4),
+        "rows_per_sec": round(n_calls * batch_size / wall_seconds, 1) if wall_seconds else None,
+        "peak_rss_mb": rss_mb,
+    }
+
+
+def time_calls(fn, min_calls=5, max_calls=1000, budget_seconds=2.0):
+    """Call ``fn`` until ``min_calls`` and the time budget (or ``max_calls``) are reached"""
+    fn()  # warm-up
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < max_calls:
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+        if len(latencies) >= min_calls and time.perf_counter() - started >= budget_seconds:
+            break
+    return latencies, time.perf_counter() - started
+
+
+def time_concurrent(fn, concurrency, calls_per_worker):
+    """Run ``fn`` from ``concurrency`` threads; returns per-call latencies and wall time"""
+    def worker(_):
+        out = []
+        for _ in range(calls_per_worker):
+            t0 = time.perf_counter()
+            fn()
+            out.append(time.perf_counter() - t0)
+        return out
+
+    fn()  # warm-up
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [lat for chunk in pool.map(worker, range(concurrency)) for lat in chunk]
+    return latencies, time.perf_counter() - started
+
+
+def bench_in_process(layers, batch_sizes, budget_seconds):
+    results = []
+    for batch_size in batch_sizes:
+        df = synthetic_records(batch_size)
+        records = df.to_dict('records')
+        X = flask_app.preprocessor.transform(df)
+        X_dense = X.toarray() if hasattr(X, 'toarray') else X
+
+        candidates = {
+            'preprocess': lambda: flask_app.preprocessor.transform(df),
+            'model': lambda: flask_app.model.predict(X),
+        }
+        if flask_app.compiled_preprocessor is not None:
+            candidates['compiled_preprocess'] = lambda: flask_app.compiled_preprocessor.transform(records)
+        if flask_app.flat_model is not None:
+            candidates['flat_model'] = lambda: flask_app.flat_model.predict(X_dense)
+
+        for layer in layers:
+            if layer not in candidates:
+                continue
+            latencies, wall = time_calls(candidates[layer], budget_seconds=budget_seconds)
+            results.append(summarize(layer, batch_size, 1, latencies, wall, peak_rss_mb()))
+            logger.info(f"{layer} batch={batch_size}: p50={results[-1]['p50_ms']}ms "
+                        f"rows/sec={results[-1]['rows_per_sec']}")
+    return results
+
+
+def _http_jobs(batch_sizes, post):
+    """(batch_size, callable) pairs: /predict for one row, /predict/batch otherwise"""
+    jobs = []
+    for batch_size in batch_sizes:
+        records = synthetic_records(batch_size).to_dict('records')
+        if batch_size == 1:
+            body = json.dumps(records[0]).encode('utf-8')
+            jobs.append((batch_size, lambda body=body: post('/predict', body)))
+        else:
+            body = json.dumps(records).encode('utf-8')
+            jobs.append((batch_size, lambda body=body: post('/predict/batch', body)))
+    return jobs
+
+
+def _calls_per_worker(batch_size, concurrency, target_rows=20000, max_calls=200):
+    return max(1, min(max_calls, target_rows // (batch_size * concurrency)))
+
+
+def bench_flask(batch_sizes, concurrency_levels):
+    results = []
+
+    def post(path, body):
+        client = flask_app.app.test_client()
+        response = client.post(path, data=body, content_type='application/json')
+        if response.status_code != 200:
+            raise RuntimeError(f"{path} returned {response.status_code}")
+
+    for batch_size, call in _http_jobs(batch_sizes, post):
+        for concurrency in concurrency_levels:
+            latencies, wall = time_concurrent(call, concurrency, _calls_per_worker(batch_size, concurrency))
+            results.append(summarize('flask', batch_size, concurrency, latencies, wall, peak_rss_mb()))
+            logger.info(f"flask batch={batch_size} c={concurrency}: p99={results[-1]['p99_ms']}ms "
+                        f"rows/sec={results[-1]['rows_per_sec']}")
+    return results
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def bench_gunicorn(batch_sizes, concurrency_levels, workers, threads):
+    port = _free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               GUNICORN_THREADS=str(threads))
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', os.path.join(here, 'gunicorn.conf.py'),
+         '--bind', f'127.0.0.1:{port}', '--chdir', os.getcwd(), '--pythonpath', here, 'flask_app:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.time() + 120
+        while True:
+            # /ready turns 200 only after the model load and warm-up, so timing never includes them
+            try:
+                with urllib.request.urlopen(base_url + '/ready', timeout=1) as response:
+                    if response.status == 200:
+                        break
+            except OSError:  # 503 (HTTPError) while starting, or not listening yet
+                pass
+            if time.time() > deadline or server.poll() is not None:
+                raise RuntimeError("gunicorn did not become ready")
+            time.sleep(0.5)
+
+        def post(path, body):
+            request = urllib.request.Request(base_url + path, data=body,
+                                             headers={'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request, timeout=300) as response:
+                response.read()
+
+        results = []
+        for batch_size, call in _http_jobs(batch_sizes, post):
+            for concurrency in concurrency_levels:
+                latencies, wall = time_concurrent(call, concurrency, _calls_per_worker(batch_size, concurrency))
+                rss = peak_rss_mb([server.pid] + _child_pids(server.pid))
+                results.append(summarize('gunicorn', batch_size, concurrency, latencies, wall, rss))
+                logger.info(f"gunicorn batch={batch_size} c={concurrency}: p99={results[-1]['p99_ms']}ms "
+                            f"rows/sec={results[-1]['rows_per_sec']}")
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(results, baseline, tolerance):
+    """Regressions vs ``baseline``: lower rows/sec or higher p99 beyond ``tolerance``"""
+    def key(r):
+        return (r['layer'], r['batch_size'], r['concurrency'])
+
+    previous = {key(r): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        if old.get('rows_per_sec') and result['rows_per_sec'] < old['rows_per_sec'] * (1 - tolerance):
+            regressions.append({**dict(zip(('layer', 'batch_size', 'concurrency'), key(result))),
+                                "metric": "rows_per_sec", "baseline": old['rows_per_sec'],
+                                "current": result['rows_per_sec']})
+        if old.get('p99_ms') and result['p99_ms'] > old['p99_ms'] * (1 + tolerance):
+            regressions.append({**dict(zip(('layer', 'batch_size', 'concurrency'), key(result))),
+                                "metric": "p99_ms", "baseline": old['p99_ms'],
+                                "current": result['p99_ms']})
+    return regressions
+
+
+def _versions():
+    versions = {"python": platform.python_version()}
+    for name in ('numpy', 'pandas', 'sklearn', 'xgboost', 'flask', 'gunicorn'):
+        try:
+            versions[name] = __import__(name).__version__
+        except Exception:
+            versions[name] = None
+    return versions
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmark for the SuperKart API")
+    parser.add_argument('--layers', default='preprocess,model,compiled_preprocess,flat_model,flask',
+                        help=f"Comma-separated subset of {','.join(LAYERS)}")
+    parser.add_argument('--batch-sizes', type=_int_list, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--http-batch-sizes', type=_int_list, default=[1, 100, 10000],
+                        help="Batch sizes for the flask/gunicorn layers")
+    parser.add_argument('--concurrency', type=_int_list, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--budget', type=float, default=2.0, help="Seconds per in-process measurement")
+    parser.add_argument('--gunicorn-workers', type=int, default=2)
+    parser.add_argument('--gunicorn-threads', type=int, default=4)
+    parser.add_argument('--out', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="Earlier results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed relative slowdown before a result counts as a regression")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # Repeated synthetic records would otherwise be served from the prediction cache
+    os.environ.setdefault('PREDICTION_CACHE_SIZE', '0')
+    layers = [layer for layer in args.layers.split(',') if layer]
+    unknown = set(layers) - set(LAYERS)
+    if unknown:
+        parser.error(f"Unknown layers: {sorted(unknown)}")
+
+    if not flask_app.load_model_and_preprocessor() or flask_app.model is None or flask_app.preprocessor is None:
+        print("Model and preprocessor must be available in the working directory")
+        return 2
+
+    results = bench_in_process(layers, args.batch_sizes, args.budget)
+    if 'flask' in layers:
+        results += bench_flask(args.http_batch_sizes, args.concurrency)
+    if 'gunicorn' in layers:
+        results += bench_gunicorn(args.http_batch_sizes, args.concurrency,
+                                  args.gunicorn_workers, args.gunicorn_threads)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": _versions(),
+            "model_type": flask_app.model_type_name(),
+            "settings": {k: v for k, v in os.environ.items()
+                         if k.startswith(('USE_', 'MODEL_', 'PREDICTION_CACHE', 'MICRO_BATCH', 'FLAT_'))},
+        },
+        "results": results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance)
+        for regression in report["regressions"]:
+            logger.warning(f"Regression: {regression}")
+        exit_code = 1 if report["regressions"] else 0
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote {len(results)} results to {args.out}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
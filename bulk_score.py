@@ -0,0 +1,202 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import flask_app
+from superkart_options import COLUMN_ALIASES
+
+logger = logging.getLogger(__name__)
+
+
+def _is_parquet(path):
+    return path.lower().endswith(('.parquet', '.pq'))
+
+
+def read_chunks(path, chunk_size):
+    """Yield (chunk_index, DataFrame) from a CSV or Parquet file without loading it whole"""
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        for index, batch in enumerate(parquet_file.iter_batches(batch_size=chunk_size)):
+            yield index, batch.to_pandas()
+    else:
+        for index, chunk in enumerate(pd.read_csv(path, chunksize=chunk_size)):
+            yield index, chunk
+
+
+def _model_ready():
+    version = flask_app.active_version
+    return version is not None and version.complete
+
+
+def _init_worker():
+    """Load the model in this process; raise RuntimeError if there is none to score with"""
+    # Fork-started workers inherit loaded artifacts; spawn-started ones load their own
+    if _model_ready():
+        return
+    if not flask_app.load_model_and_preprocessor() or not _model_ready():
+        reason = flask_app.versions.last_error or "model or preprocessor file missing"
+        raise RuntimeError(f"Cannot score without a model ({reason}); checked "
+                           f"{flask_app.MODEL_DIR or flask_app.MODEL_PATH} and {flask_app.PREPROCESSOR_PATH}")
+
+
+def score_chunk(index, chunk):
+    """Score one input chunk; returns (chunk_index, chunk with prediction/error columns)"""
+    _init_worker()
+    # Accept SuperKart.csv's notebook column names; the output keeps the input's names
+    features, valid, errors = flask_app.validate_frame(chunk.rename(columns=COLUMN_ALIASES))
+    predictions = np.full(len(chunk), np.nan)
+    if valid.any():
+        predictions[valid] = flask_app.predict_frame(features[valid])
+    out = chunk.reset_index(drop=True)
+    out['prediction'] = predictions
+    out['error'] = errors
+    return index, out
+
+
+class CsvSink:
+    """Appends scored chunks to one CSV file; ``position`` is the resume point"""
+
+    def __init__(self, path, resume_position=None):
+        self.path = path
+        if resume_position is not None and os.path.exists(path):
+            # Drop any rows written after the last journaled chunk
+            with open(path, 'r+b') as f:
+                f.truncate(resume_position)
+            self.has_header = resume_position > 0
+        else:
+            open(path, 'w').close()
+            self.has_header = False
+
+    def write(self, index, df):
+        with open(self.path, 'a', newline='') as f:
+            df.to_csv(f, header=not self.has_header, index=False)
+            self.has_header = True
+            return f.tell()
+
+
+class ParquetSink:
+    """Writes each scored chunk as a part file of a Parquet dataset directory"""
+
+    def __init__(self, path, resume_position=None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, index, df):
+        part = os.path.join(self.path, f'part-{index:06d}.parquet')
+        df.to_parquet(part + '.tmp', index=False)
+        os.replace(part + '.tmp', part)
+        return index
+
+
+class Journal:
+    """Records the last chunk written so an interrupted run can resume"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state):
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def score_file(input_path, output_path, chunk_size=50000, workers=None, resume=False):
+    """Stream ``input_path`` through the model into ``output_path``.
+
+    Chunks are scored in a process pool with at most ``2 * workers`` chunks in
+    flight and written in input order, so memory stays bounded by the chunk
+    size regardless of the file size. Returns a summary dict.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Fail before the output or journal is touched and before any chunk is submitted
+    _init_worker()
+    journal = Journal(output_path + '.progress.json')
+    state = journal.load() if resume else None
+    if state and (state.get('input') != os.path.abspath(input_path) or state.get('chunk_size') != chunk_size):
+        raise ValueError("Journal was written for a different input or chunk size; run without --resume")
+
+    next_chunk = state['next_chunk'] if state else 0
+    rows_done = state['rows'] if state else 0
+    sink_cls = ParquetSink if _is_parquet(output_path) else CsvSink
+    sink = sink_cls(output_path, state['position'] if state else None)
+    if state:
+        logger.info(f"Resuming at chunk {next_chunk} ({rows_done} rows already scored)")
+
+    started = time.perf_counter()
+    rows_this_run = 0
+
+    def record(index, scored):
+        nonlocal rows_done, rows_this_run
+        position = sink.write(index, scored)
+        rows_done += len(scored)
+        rows_this_run += len(scored)
+        journal.save({"input": os.path.abspath(input_path), "chunk_size": chunk_size,
+                      "next_chunk": index + 1, "rows": rows_done, "position": position})
+        elapsed = time.perf_counter() - started
+        logger.info(f"Chunk {index}: {rows_done} rows total, "
+                    f"{rows_this_run / elapsed if elapsed else 0:,.0f} rows/sec")
+
+    chunks = ((i, c) for i, c in read_chunks(input_path, chunk_size) if i >= next_chunk)
+
+    if workers == 1:
+        for index, chunk in chunks:
+            record(*score_chunk(index, chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            in_flight = []
+            for index, chunk in chunks:
+                in_flight.append(pool.submit(score_chunk, index, chunk))
+                if len(in_flight) >= 2 * workers:
+                    record(*in_flight.pop(0).result())
+            for future in in_flight:
+                record(*future.result())
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "rows": rows_done,
+        "rows_this_run": rows_this_run,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows_this_run / elapsed, 1) if elapsed else None,
+        "output": output_path,
+    }
+    logger.info(f"Scored {rows_this_run} rows in {elapsed:.1f}s "
+                f"({summary['rows_per_sec']} rows/sec) -> {output_path}")
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a SuperKart CSV/Parquet file in bulk")
+    parser.add_argument('input', help="Input .csv or .parquet file")
+    parser.add_argument('output', help="Output .csv file or .parquet dataset directory")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="Rows per chunk")
+    parser.add_argument('--workers', type=int, default=None, help="Scoring processes (default: all cores)")
+    parser.add_argument('--resume', action='store_true', help="Continue after the last completed chunk")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        summary = score_file(args.input, args.output, chunk_size=args.chunk_size,
+                             workers=args.workers, resume=args.resume)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    print(json.dumps(summary))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
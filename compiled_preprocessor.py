@@ -0,0 +1,162 @@
+import logging
+import warnings
+
+import numpy as np
+
+from startup import lazy_import
+
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledPreprocessor:
+    """Pandas-free replica of the fitted SuperKart ColumnTransformer.
+
+    The fitted StandardScaler is reduced to fixed mean/scale arrays and each
+    OneHotEncoder column to a dict mapping category -> output column index, so
+    raw records can be written straight into a preallocated feature matrix.
+    """
+
+    def __init__(self, n_output, numeric, categorical, handle_unknown='ignore'):
+        # numeric: list of (input_name, output_index, mean, scale)
+        # categorical: list of (input_name, {category: output_index})
+        self.n_output = n_output
+        self.numeric = numeric
+        self.categorical = categorical
+        self.handle_unknown = handle_unknown
+        self.feature_names = [name for name, *_ in numeric] + [name for name, _ in categorical]
+
+    @classmethod
+    def from_column_transformer(cls, column_transformer):
+        """Extract lookup tables from a fitted ColumnTransformer"""
+        numeric = []
+        categorical = []
+        handle_unknown = 'ignore'
+        offset = 0
+
+        for name, transformer, columns in column_transformer.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            if transformer == 'passthrough':
+                raise ValueError(f"Unsupported passthrough transformer '{name}'")
+
+            kind = type(transformer).__name__
+            if kind == 'StandardScaler':
+                means = transformer.mean_ if transformer.with_mean else np.zeros(len(columns))
+                scales = transformer.scale_ if transformer.with_std else np.ones(len(columns))
+                for i, column in enumerate(columns):
+                    numeric.append((column, offset, float(means[i]), float(scales[i])))
+                    offset += 1
+            elif kind == 'OneHotEncoder':
+                if getattr(transformer, 'infrequent_categories_', None) is not None and any(
+                        c is not None for c in transformer.infrequent_categories_):
+                    raise ValueError("Infrequent category grouping is not supported")
+                if transformer.handle_unknown != 'ignore':
+                    handle_unknown = 'error'
+                drop_idx = transformer.drop_idx_
+                for i, column in enumerate(columns):
+                    lookup = {}
+                    dropped = None if drop_idx is None else drop_idx[i]
+                    for j, category in enumerate(transformer.categories_[i]):
+                        if dropped is not None and j == dropped:
+                            # Dropped category encodes as all zeros
+                            lookup[category] = None
+                            continue
+                        lookup[category] = offset
+                        offset += 1
+                    categorical.append((column, lookup))
+            else:
+                raise ValueError(f"Unsupported transformer '{name}' ({kind})")
+
+        return cls(offset, numeric, categorical, handle_unknown)
+
+    def _lookup(self, column, lookup, value):
+        if value in lookup:
+            return lookup[value]
+        if self.handle_unknown == 'ignore':
+            return None
+        raise ValueError(f"Found unknown category {value!r} in column '{column}'")
+
+    def transform(self, records):
+        """Map a raw dict or list of dicts to a dense feature matrix"""
+        if isinstance(records, dict):
+            records = [records]
+
+        out = np.zeros((len(records), self.n_output), dtype=np.float64)
+        for row, record in enumerate(records):
+            for column, index, mean, scale in self.numeric:
+                out[row, index] = (float(record[column]) - mean) / scale
+            for column, lookup in self.categorical:
+                index = self._lookup(column, lookup, record[column])
+                if index is not None:
+                    out[row, index] = 1.0
+        return out
+
+    def transform_frame(self, df):
+        """Column-wise variant of transform() for an already built DataFrame"""
+        n_rows = len(df)
+        out = np.zeros((n_rows, self.n_output), dtype=np.float64)
+        rows = np.arange(n_rows)
+        for column, index, mean, scale in self.numeric:
+            out[:, index] = (df[column].to_numpy(dtype=np.float64) - mean) / scale
+        for column, lookup in self.categorical:
+            # Look each distinct value up once, then scatter by code
+            codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            indices = np.array([self._lookup(column, lookup, v) for v in uniques.tolist()], dtype=object)
+            hit_unique = indices != None  # noqa: E711 - elementwise comparison
+            columns = np.full(len(uniques), -1, dtype=np.intp)
+            columns[hit_unique] = indices[hit_unique].astype(np.intp)
+            row_columns = columns[codes]
+            hit = row_columns >= 0
+            out[rows[hit], row_columns[hit]] = 1.0
+        return out
+
+    def probe_records(self):
+        """Synthetic records covering every category plus one unknown value"""
+        n_probe = max([len(lookup) for _, lookup in self.categorical] + [1]) + 1
+        records = []
+        for i in range(n_probe):
+            record = {}
+            for j, (column, _, mean, scale) in enumerate(self.numeric):
+                record[column] = mean + scale * ((i + j) % 5 - 2) / 2.0
+            for column, lookup in self.categorical:
+                categories = list(lookup)
+                record[column] = categories[i] if i < len(categories) else '__unseen__'
+            records.append(record)
+        if self.handle_unknown != 'ignore':
+            records = [r for r in records if '__unseen__' not in r.values()]
+        return records
+
+
+def _to_dense(matrix):
+    return matrix.toarray() if hasattr(matrix, 'toarray') else np.asarray(matrix)
+
+
+def compile_preprocessor(preprocessor, atol=1e-9):
+    """Compile ``preprocessor`` and verify it against ``preprocessor.transform``.
+
+    Returns None when the transformer cannot be compiled or the parity check
+    fails, in which case callers should keep using the sklearn path.
+    """
+    try:
+        compiled = CompiledPreprocessor.from_column_transformer(preprocessor)
+        probe = compiled.probe_records()
+        with warnings.catch_warnings():
+            # The probe deliberately includes unseen categories
+            warnings.simplefilter('ignore', UserWarning)
+            expected = _to_dense(preprocessor.transform(pd.DataFrame(probe)))
+        actual = compiled.transform(probe)
+        frame_actual = compiled.transform_frame(pd.DataFrame(probe))
+    except Exception as e:
+        logger.warning(f"Compiled preprocessor unavailable, using sklearn path: {str(e)}")
+        return None
+
+    if expected.shape != actual.shape or not (
+            np.allclose(expected, actual, rtol=0, atol=atol)
+            and np.allclose(expected, frame_actual, rtol=0, atol=atol)):
+        logger.warning("Compiled preprocessor failed parity check, using sklearn path")
+        return None
+
+    logger.info(f"Compiled preprocessor ready ({compiled.n_output} output features)")
+    return compiled
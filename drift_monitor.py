@@ -0,0 +1,470 @@
+import bisect
+import glob
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Fraction of /predict and /predict/batch rows folded into the sketches; 0 disables the monitor
+DRIFT_SAMPLE_RATE = float(os.environ.get('DRIFT_SAMPLE_RATE', 0.1))
+# Sampled rows needed before a feature gets a drift status
+DRIFT_MIN_SAMPLES = int(os.environ.get('DRIFT_MIN_SAMPLES', 200))
+# Distinct unseen categories remembered per feature; the rest only count as "other"
+DRIFT_MAX_UNSEEN = int(os.environ.get('DRIFT_MAX_UNSEEN', 50))
+
+# Population stability index thresholds (the usual 0.1 / 0.25 rule of thumb)
+PSI_MODERATE = 0.1
+PSI_DRIFT = 0.25
+# Share of values the OneHotEncoder never saw (and silently zeroes) that counts as drift on its own
+UNSEEN_RATE_DRIFT = 0.05
+
+# Bins of the numeric reference histograms (training quantiles)
+PROFILE_BINS = 20
+REPORTED_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# Floor for empty bins so the PSI stays finite
+PSI_EPSILON = 1e-4
+
+
+def profile_path_for(preprocessor_path):
+    """Where the training reference profile for ``preprocessor_path`` lives: <stem>.profile.json beside it"""
+    return os.path.splitext(preprocessor_path)[0] + '.profile.json'
+
+
+def build_profile(df, numeric_features, categorical_features, bins=PROFILE_BINS):
+    """Reference profile of the raw training features, saved next to the preprocessor at fit time"""
+    profile = {"created_at": datetime.now().isoformat(), "rows": len(df), "source": "training",
+               "numeric": {}, "categorical": {}}
+    for feature in numeric_features:
+        values = df[feature].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values)]
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])).tolist()
+        counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(edges) + 1)
+        profile["numeric"][feature] = {
+            "mean": float(values.mean()),
+            "std": float(values.std()),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "edges": edges,
+            "proportions": (counts / counts.sum()).tolist(),
+            "quantiles": {str(q): float(np.quantile(values, q)) for q in REPORTED_QUANTILES},
+        }
+    for feature in categorical_features:
+        frequencies = df[feature].astype(str).value_counts(normalize=True)
+        profile["categorical"][feature] = {"frequencies": {k: float(v) for k, v in frequencies.items()}}
+    return profile
+
+
+def profile_from_preprocessor(preprocessor):
+    """Coarser reference for preprocessors without a saved profile.
+
+    Means and standard deviations come from the StandardScaler and the known
+    categories from the OneHotEncoder; there are no training distributions,
+    so numeric PSI and category proportions are not available.
+    """
+    profile = {"created_at": None, "rows": None, "source": "preprocessor", "numeric": {}, "categorical": {}}
+    for _, transformer, columns in getattr(preprocessor, 'transformers_', []):
+        kind = type(transformer).__name__
+        if kind == 'StandardScaler' and transformer.with_mean and transformer.with_std:
+            for column, mean, scale in zip(columns, transformer.mean_, transformer.scale_):
+                # Bins of a quarter standard deviation out to three, for the quantile sketch
+                edges = (float(mean) + float(scale) * np.linspace(-3, 3, 25)).tolist()
+                profile["numeric"][column] = {"mean": float(mean), "std": float(scale), "edges": edges,
+                                              "proportions": None, "quantiles": None}
+        elif kind == 'OneHotEncoder':
+            for column, categories in zip(columns, transformer.categories_):
+                profile["categorical"][column] = {"frequencies": {str(c): None for c in categories}}
+    return profile
+
+
+def load_profile(preprocessor_path, preprocessor=None):
+    """Saved training profile for ``preprocessor_path``, else one derived from ``preprocessor``, else None"""
+    try:
+        with open(profile_path_for(preprocessor_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+    if preprocessor is not None:
+        return profile_from_preprocessor(preprocessor)
+    return None
+
+
+def psi(expected, actual):
+    """Population stability index between two proportion vectors"""
+    total = 0.0
+    for e, a in zip(expected, actual):
+        e, a = max(e, PSI_EPSILON), max(a, PSI_EPSILON)
+        total += (a - e) * math.log(a / e)
+    return total
+
+
+def drift_status(score, count):
+    if count < DRIFT_MIN_SAMPLES:
+        return "insufficient_data"
+    if score is None:
+        return "unknown"
+    if score >= PSI_DRIFT:
+        return "drift"
+    if score >= PSI_MODERATE:
+        return "moderate"
+    return "ok"
+
+
+class NumericSketch:
+    """Running mean/variance plus a histogram over fixed (reference) bin edges.
+
+    The histogram doubles as a quantile sketch. Memory is fixed by the number
+    of bins, and two sketches over the same edges merge by adding counts.
+    """
+
+    def __init__(self, edges):
+        self.edges = list(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.invalid = 0
+
+    def add(self, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            self.invalid += 1
+            return
+        if value != value:
+            self.invalid += 1
+            return
+        # Welford's update
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.counts[bisect.bisect_right(self.edges, value)] += 1
+
+    def add_array(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        self.invalid += int((~valid).sum())
+        values = values[valid]
+        if len(values) == 0:
+            return
+        counts = np.bincount(np.searchsorted(self.edges, values, side='right'), minlength=len(self.counts))
+        self.counts = [a + int(b) for a, b in zip(self.counts, counts)]
+        self._merge_moments(len(values), float(values.mean()), float(((values - values.mean()) ** 2).sum()))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def _merge_moments(self, n, mean, m2):
+        # Chan et al.'s parallel combination of (count, mean, M2)
+        total = self.n + n
+        if total == 0:
+            return
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+
+    def merge(self, state):
+        n, mean, m2, low, high, invalid, counts = state
+        self._merge_moments(n, mean, m2)
+        self.min = min(self.min, low if low is not None else math.inf)
+        self.max = max(self.max, high if high is not None else -math.inf)
+        self.invalid += invalid
+        self.counts = [a + b for a, b in zip(self.counts, counts)]
+
+    def state(self):
+        return [self.n, self.mean, self.m2, self.min if self.n else None, self.max if self.n else None,
+                self.invalid, self.counts[:]]
+
+    def quantile(self, q):
+        """Quantile estimate, interpolated linearly inside the histogram bin"""
+        if self.n == 0:
+            return None
+        target = q * self.n
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= target:
+                low = self.edges[i - 1] if i > 0 else self.min
+                high = self.edges[i] if i < len(self.edges) else self.max
+                low, high = max(low, self.min), min(high, self.max)
+                return low + (high - low) * (target - cumulative) / count
+            cumulative += count
+        return self.max
+
+    def report(self, reference):
+        std = math.sqrt(self.m2 / self.n) if self.n else None
+        proportions = [c / self.n for c in self.counts] if self.n else None
+        score = psi(reference["proportions"], proportions) \
+            if proportions and reference.get("proportions") else None
+        ref_std = reference.get("std") or None
+        return {
+            "count": self.n,
+            "invalid": self.invalid,
+            "psi": round(score, 6) if score is not None else None,
+            "status": drift_status(score, self.n),
+            "mean": round(self.mean, 6) if self.n else None,
+            "reference_mean": reference.get("mean"),
+            # Shift of the mean in training standard deviations
+            "mean_shift": round((self.mean - reference["mean"]) / ref_std, 4) if self.n and ref_std else None,
+            "std_ratio": round(std / ref_std, 4) if std is not None and ref_std else None,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+            "quantiles": {str(q): self.quantile(q) for q in REPORTED_QUANTILES} if self.n else None,
+            "reference_quantiles": reference.get("quantiles"),
+        }
+
+
+class CategoricalSketch:
+    """Counts per training category, plus a bounded table of categories the encoder never saw"""
+
+    def __init__(self, categories, max_unseen=DRIFT_MAX_UNSEEN):
+        self.counts = dict.fromkeys(categories, 0)
+        self.unseen = {}
+        self.unseen_other = 0
+        self.missing = 0
+        self.max_unseen = max_unseen
+
+    @property
+    def total(self):
+        return sum(self.counts.values()) + sum(self.unseen.values()) + self.unseen_other
+
+    def add(self, value, count=1):
+        if value is None:
+            self.missing += count
+            return
+        value = str(value)
+        if value in self.counts:
+            self.counts[value] += count
+        elif value in self.unseen or len(self.unseen) < self.max_unseen:
+            self.unseen[value] = self.unseen.get(value, 0) + count
+        else:
+            self.unseen_other += count
+
+    def merge(self, state):
+        counts, unseen, unseen_other, missing = state
+        for value, count in counts.items():
+            self.add(value, count)
+        for value, count in unseen.items():
+            self.add(value, count)
+        self.unseen_other += unseen_other
+        self.missing += missing
+
+    def state(self):
+        return [dict(self.counts), dict(self.unseen), self.unseen_other, self.missing]
+
+    def report(self, reference):
+        total = self.total
+        unseen_total = sum(self.unseen.values()) + self.unseen_other
+        frequencies = reference["frequencies"]
+        score = None
+        if total and all(v is not None for v in frequencies.values()):
+            # Unseen categories form one extra bucket the training data had none of
+            expected = [frequencies.get(c, 0.0) for c in self.counts] + [0.0]
+            actual = [self.counts[c] / total for c in self.counts] + [unseen_total / total]
+            score = psi(expected, actual)
+        unseen_rate = unseen_total / total if total else None
+        status = drift_status(score, total)
+        if status != "insufficient_data" and unseen_rate >= UNSEEN_RATE_DRIFT:
+            status = "drift"
+        top_unseen = sorted(self.unseen.items(), key=lambda item: -item[1])[:10]
+        return {
+            "count": total,
+            "missing": self.missing,
+            "psi": round(score, 6) if score is not None else None,
+            "status": status,
+            "unseen_rate": round(unseen_rate, 6) if total else None,
+            "unseen": dict(top_unseen),
+            "frequencies": {c: round(n / total, 6) for c, n in self.counts.items()} if total else None,
+            "reference_frequencies": frequencies,
+        }
+
+
+class DriftMonitor:
+    """Sampled streaming sketches of the production inputs, compared against a training profile.
+
+    Every process keeps its own sketches and, with METRICS_DIR set, writes
+    them to drift-<pid>.json there; report() merges the sketches of all
+    workers that use the same reference.
+    """
+
+    def __init__(self, profile, reference_id, sample_rate=DRIFT_SAMPLE_RATE):
+        self.profile = profile
+        self.reference_id = reference_id
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._reset()
+        self._dirty = False
+        self._flusher_pid = None
+        self._stopped = False
+
+    def _reset(self):
+        self.seen = 0
+        self.sampled = 0
+        self.started_at = datetime.now().isoformat()
+        self.numeric = {f: NumericSketch(ref["edges"]) for f, ref in self.profile["numeric"].items()}
+        self.categorical = {f: CategoricalSketch(ref["frequencies"])
+                            for f, ref in self.profile["categorical"].items()}
+
+    def observe(self, record):
+        """Fold one validated request record into the sketches, if it is sampled"""
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        with self._lock:
+            self.seen += 1
+            if not sampled:
+                return
+            self.sampled += 1
+            for feature, sketch in self.numeric.items():
+                sketch.add(record.get(feature))
+            for feature, sketch in self.categorical.items():
+                sketch.add(record.get(feature))
+            self._dirty = True
+        self._ensure_flusher()
+
+    def observe_frame(self, df):
+        """Fold a sample of the rows of a validated batch DataFrame into the sketches"""
+        rows = len(df)
+        if self.sample_rate < 1.0:
+            df = df[np.random.random(rows) < self.sample_rate]
+        with self._lock:
+            self.seen += rows
+            if len(df) == 0:
+                return
+            self.sampled += len(df)
+            for feature, sketch in self.numeric.items():
+                sketch.add_array(df[feature].to_numpy(dtype=np.float64))
+            for feature, sketch in self.categorical.items():
+                sketch.missing += int(df[feature].isna().sum())
+                for value, count in df[feature].dropna().value_counts().items():
+                    sketch.add(value, int(count))
+            self._dirty = True
+        self._ensure_flusher()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "reference_id": self.reference_id,
+                "started_at": self.started_at,
+                "seen": self.seen,
+                "sampled": self.sampled,
+                "numeric": {f: s.state() for f, s in self.numeric.items()},
+                "categorical": {f: s.state() for f, s in self.categorical.items()},
+            }
+
+    # --- cross-process sharing -------------------------------------------
+
+    def _ensure_flusher(self):
+        if metrics.METRICS_DIR is None or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            # Threads do not survive fork; each worker starts its own flusher
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_loop, name='drift-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        while not self._stopped:
+            time.sleep(metrics.METRICS_FLUSH_INTERVAL)
+            # A monitor replaced by a reload must not overwrite its successor's file
+            if self._dirty and not self._stopped:
+                self._dirty = False
+                try:
+                    self.flush()
+                except OSError as e:
+                    logger.warning(f"Could not write drift snapshot: {str(e)}")
+
+    def flush(self):
+        os.makedirs(metrics.METRICS_DIR, exist_ok=True)
+        path = os.path.join(metrics.METRICS_DIR, f'drift-{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def stop(self):
+        """Stop flushing; used when a model reload replaces this monitor"""
+        self._stopped = True
+
+    def _collect(self):
+        """This process's snapshot plus those of live workers on the same reference.
+
+        Snapshots of exited workers are dropped (and their files removed), so
+        traffic seen before a worker restart does not count towards drift forever.
+        """
+        snapshots = [self.snapshot()]
+        if metrics.METRICS_DIR is not None:
+            for path in glob.glob(os.path.join(metrics.METRICS_DIR, 'drift-*.json')):
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if snapshot.get('pid') == os.getpid():
+                    continue
+                if not metrics._pid_alive(snapshot.get('pid')):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                if snapshot.get('reference_id') == self.reference_id:
+                    snapshots.append(snapshot)
+        return snapshots
+
+    # --- reporting ---------------------------------------------------------
+
+    def report(self):
+        """Drift scores per feature, merged across all workers"""
+        snapshots = self._collect()
+        merged = DriftMonitor(self.profile, self.reference_id, self.sample_rate)
+        for snapshot in snapshots:
+            merged.seen += snapshot['seen']
+            merged.sampled += snapshot['sampled']
+            for feature, state in snapshot['numeric'].items():
+                if feature in merged.numeric:
+                    merged.numeric[feature].merge(state)
+            for feature, state in snapshot['categorical'].items():
+                if feature in merged.categorical:
+                    merged.categorical[feature].merge(state)
+
+        features = {f: s.report(self.profile["numeric"][f]) for f, s in merged.numeric.items()}
+        features.update({f: s.report(self.profile["categorical"][f]) for f, s in merged.categorical.items()})
+        scores = [r["psi"] for r in features.values() if r["psi"] is not None]
+        drifting = sorted(f for f, r in features.items() if r["status"] == "drift")
+        return {
+            "reference_id": self.reference_id,
+            "reference": {"source": self.profile.get("source"), "rows": self.profile.get("rows"),
+                          "created_at": self.profile.get("created_at")},
+            "sample_rate": self.sample_rate,
+            "requests_seen": merged.seen,
+            "rows_sampled": merged.sampled,
+            "workers": len(snapshots),
+            "since": min(s['started_at'] for s in snapshots),
+            "max_psi": round(max(scores), 6) if scores else None,
+            "drifting_features": drifting,
+            "status": "drift" if drifting else drift_status(max(scores) if scores else None, merged.sampled),
+            "features": features,
+            "timestamp": datetime.now().isoformat(),
+        }
+
+
+def monitor_from_env(profile, reference_id):
+    """DriftMonitor for ``profile`` at DRIFT_SAMPLE_RATE, or None when disabled or without a profile"""
+    if DRIFT_SAMPLE_RATE <= 0 or profile is None:
+        return None
+    return DriftMonitor(profile, reference_id, min(DRIFT_SAMPLE_RATE, 1.0))
@@ -1,12 +1,35 @@
+# First, so the startup timing covers every other import
+import startup
+from startup import lazy_import
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
-import pandas as pd
 import numpy as np
-import joblib
+import hmac
 import logging
 from datetime import datetime
 import os
+import time
+
+# pandas, joblib and sklearn (through the pickles) load on first use, normally
+# in the background warm-up, so /live and /features answer right away
+pd = lazy_import('pandas')
+joblib = lazy_import('joblib')
+DEFERRED_IMPORTS = ('pandas', 'pyarrow', 'joblib', 'sklearn')
+
+import metrics
+import model_compact
+import model_store
+import model_training
+import model_versions
+import sales_cube
+import wire_formats
+from compiled_preprocessor import compile_preprocessor
+from drift_monitor import load_profile, monitor_from_env
+from micro_batcher import batcher_from_env
+from model_registry import PRODUCTION, registry_from_env
+from prediction_cache import cache_from_env
+from tree_inference import compile_model
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,129 +37,822 @@ logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = wire_formats.FastJSONProvider(app)
 CORS(app)
 
 # Global variables for model and preprocessor
 model = None
 preprocessor = None
 feature_names = None
+compiled_preprocessor = None
+flat_model = None
+prediction_cache = None
+active_version = None
+drift_monitor = None
+
+MODEL_PATH = os.environ.get('MODEL_PATH', 'superkart_model.pkl')
+PREPROCESSOR_PATH = os.environ.get('PREPROCESSOR_PATH', 'superkart_preprocessor.pkl')
+
+# MODEL_STORE=mmap serves the flattened trees from a read-only memory-mapped
+# bundle (built from MODEL_PATH on first use) instead of unpickling the model
+# in every worker, so all workers share one copy through the page cache
+USE_MODEL_STORE = os.environ.get('MODEL_STORE', '') == 'mmap'
+# Bundle of MODEL_PATH; other models get <model stem>_store beside their pickle
+MODEL_STORE_DIR = os.environ.get('MODEL_STORE_DIR', 'superkart_model_store')
+
+# A <model>.compact.npz written by model_compact.py is served instead of the
+# pickle when present; set USE_COMPACT_MODEL=0 to ignore it
+USE_COMPACT_MODEL = os.environ.get('USE_COMPACT_MODEL', '1') == '1'
+
+# Set USE_COMPILED_PREPROCESSOR=0 to always go through sklearn's ColumnTransformer
+USE_COMPILED_PREPROCESSOR = os.environ.get('USE_COMPILED_PREPROCESSOR', '1') == '1'
+
+# Set USE_FLAT_FOREST=0 to score with model.predict instead of the flattened trees
+USE_FLAT_FOREST = os.environ.get('USE_FLAT_FOREST', '1') == '1'
+
+# Above this many rows sklearn's compiled tree walk is faster than the NumPy traversal
+FLAT_FOREST_MAX_ROWS = int(os.environ.get('FLAT_FOREST_MAX_ROWS', 1024))
+
+# Numeric inputs; everything else in feature_names is categorical
+numeric_features = ['Product_Weight', 'Product_Visibility', 'Product_MRP']
+
+# MODEL_DIR holds one subdirectory per model version (e.g. 2024-06-01/superkart_model.pkl);
+# without it the version is MODEL_PATH/PREPROCESSOR_PATH as they are on disk
+MODEL_DIR = os.environ.get('MODEL_DIR')
+# Seconds between checks for a new model version; 0 only reloads through /admin/reload
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+# Required in the X-Admin-Token header of /admin/*; admin routes are off when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Largest number of rows sent through the preprocessor/model in one call
+BATCH_MAX_CHUNK_SIZE = int(os.environ.get('PREDICT_BATCH_MAX_CHUNK', 10000))
+
+# Pre-aggregated sales cube built by `python sales_cube.py SuperKart.csv`
+SALES_CUBE_PATH = os.environ.get('SALES_CUBE_PATH', 'superkart_sales_cube.parquet')
+
+# Largest what-if grid /predict/scenarios will expand
+SCENARIO_MAX_POINTS = int(os.environ.get('SCENARIO_MAX_POINTS', 20000))
+
+# Set STARTUP_WARMUP=0 to skip the synthetic warm-up requests before /ready turns 200
+STARTUP_WARMUP = os.environ.get('STARTUP_WARMUP', '1') == '1'
+
+def resolve_version(version_id=None):
+    """(version id, model path, preprocessor path) to load, or None if unknown"""
+    if MODEL_DIR:
+        versions_on_disk = model_versions.list_versions(
+            MODEL_DIR, os.path.basename(MODEL_PATH),
+            os.path.basename(model_compact.compact_path_for(MODEL_PATH)))
+        version_id = version_id or model_versions.read_pin(MODEL_DIR) or \
+            (versions_on_disk[-1] if versions_on_disk else None)
+        if version_id not in versions_on_disk:
+            return None
+        version_dir = os.path.join(MODEL_DIR, version_id)
+        preprocessor_path = os.path.join(version_dir, os.path.basename(PREPROCESSOR_PATH))
+        if not os.path.exists(preprocessor_path):
+            # Versions that only ship a model reuse the shared preprocessor
+            preprocessor_path = PREPROCESSOR_PATH
+        return version_id, os.path.join(version_dir, os.path.basename(MODEL_PATH)), preprocessor_path
+
+    current = model_versions.file_version_id(MODEL_PATH, model_compact.compact_path_for(MODEL_PATH),
+                                             PREPROCESSOR_PATH)
+    if version_id not in (None, current):
+        return None
+    return current, MODEL_PATH, PREPROCESSOR_PATH
+
+def load_version(version_id, model_path, preprocessor_path):
+    """Load one model/preprocessor pair into a ModelVersion without activating it"""
+    load_started = time.perf_counter()
+    rss_before = metrics.current_rss_bytes()
+    version = model_versions.ModelVersion(version_id, model_path=model_path,
+                                          preprocessor_path=preprocessor_path)
+    store_dir = MODEL_STORE_DIR
+    if MODEL_DIR or model_path != MODEL_PATH:
+        # Every other model (MODEL_DIR versions, registry models) gets its own bundle beside it
+        store_dir = model_store.store_dir_for(model_path)
+
+    compact_path = model_compact.compact_source(model_path) if USE_COMPACT_MODEL else None
+
+    # Load model (you'll need to train and save this first)
+    if USE_MODEL_STORE and (os.path.exists(model_path) or compact_path or model_store.read_manifest(store_dir)):
+        version.flat_model = model_store.load_or_build(model_path, store_dir,
+                                                       use_compact=USE_COMPACT_MODEL)
+        version.model = version.flat_model
+        version.model_store = store_dir
+        version.tree_check = model_store.read_store_check(store_dir)
+        logger.info(f"Model mapped read-only from {store_dir}")
+    elif compact_path:
+        version.flat_model = model_compact.load_compact(compact_path)
+        version.model = version.flat_model
+        version.compact_model = compact_path
+        version.tree_check = model_compact.read_check(compact_path)
+        logger.info(f"Compact model loaded from {compact_path}")
+    elif os.path.exists(model_path):
+        version.model = joblib.load(model_path)
+        logger.info("Model loaded successfully")
+        version.flat_model = compile_model(version.model) if USE_FLAT_FOREST else None
+    else:
+        logger.warning("Model file not found. Please train and save the model first.")
+
+    # Load preprocessor
+    if os.path.exists(preprocessor_path):
+        version.preprocessor = joblib.load(preprocessor_path)
+        logger.info("Preprocessor loaded successfully")
+        if USE_COMPILED_PREPROCESSOR:
+            version.compiled_preprocessor = compile_preprocessor(version.preprocessor)
+        # Training distributions for the drift monitor (written by model_training.py)
+        version.reference_profile = load_profile(preprocessor_path, version.preprocessor)
+    else:
+        logger.warning("Preprocessor file not found.")
+
+    # Written by model_training.py next to the model; None for hand-made models
+    version.training_metrics = model_training.read_metrics(model_path)
+
+    metrics.record_model_load(time.perf_counter() - load_started,
+                              metrics.current_rss_bytes() - rss_before, model_path)
+    return version
+
+def smoke_test_version(version):
+    """Warm up ``version`` and check its serving path against plain sklearn"""
+    def reference(v, records):
+        if v.model is v.flat_model:
+            # Mapped/compact versions serve the FlatForest itself and never unpickle
+            # the model: the trees are checked against the rows recorded with the
+            # artifact (which allow for pruning), the rest against sklearn below
+            if v.tree_check is None:
+                return None
+            model_compact.verify_check(v.flat_model, v.tree_check)
+        X = v.preprocessor.transform(pd.DataFrame(records, columns=feature_names))
+        return v.model.predict(X)
+
+    def served(v, records):
+        return predict_matrix(transform_records(records, v), v)
+
+    return model_versions.run_smoke_test(version, served, reference,
+                                         model_versions.smoke_test_records())
+
+def activate_version(version):
+    """Point the module-level references at ``version``"""
+    global model, preprocessor, compiled_preprocessor, flat_model, active_version, drift_monitor
+    model, preprocessor = version.model, version.preprocessor
+    compiled_preprocessor, flat_model = version.compiled_preprocessor, version.flat_model
+    # Drift is measured against the reference of the version being served
+    if drift_monitor is not None:
+        drift_monitor.stop()
+    drift_monitor = monitor_from_env(version.reference_profile, version.version_id)
+    # Requests read active_version once, so this assignment is the actual swap
+    active_version = version
+    if prediction_cache is not None:
+        prediction_cache.refresh_version()
+
+versions = model_versions.VersionManager(resolve_version, load_version, smoke_test_version,
+                                         activate_version)
+
+def load_registry_model(name, spec):
+    """Load and smoke-test one named model from the registry file"""
+    model_path = spec['model_path']
+    preprocessor_path = spec.get('preprocessor_path') or PREPROCESSOR_PATH
+    version_id = f"{name}:{model_versions.file_version_id(model_path, model_compact.compact_path_for(model_path), preprocessor_path)}"
+    version = load_version(version_id, model_path, preprocessor_path)
+    if not version.complete:
+        raise ValueError(f"Model or preprocessor file missing for registry model {name}")
+    version.smoke_test = smoke_test_version(version)
+    return version
+
+# MODEL_REGISTRY=registry.json serves further named models (per store type,
+# A/B splits, shadow candidates) next to production; see model_registry.py
+model_registry = registry_from_env(load_registry_model)
+
+def select_version(record=None, requested=None):
+    """(model name, ModelVersion) for a request: ?model=, a registry route or split, else production"""
+    if model_registry is None:
+        if requested not in (None, '', PRODUCTION):
+            raise LookupError(f"Unknown model {requested!r}; no MODEL_REGISTRY is configured")
+        return PRODUCTION, active_version
+    name = model_registry.select(record, requested)
+    if name == PRODUCTION:
+        return name, active_version
+    return name, model_registry.get(name)
+
+def score_record(version, record):
+    """Prediction for one record with ``version`` (production when None), used for shadow scoring"""
+    version = version or active_version
+    return predict_matrix(transform_records([record], version), version)[0]
 
 def load_model_and_preprocessor():
     """Load the trained model and preprocessor"""
-    global model, preprocessor, feature_names
+    global feature_names, prediction_cache
     
     try:
-        # Load model (you'll need to train and save this first)
-        if os.path.exists('superkart_model.pkl'):
-            model = joblib.load('superkart_model.pkl')
-            logger.info("Model loaded successfully")
-        else:
-            logger.warning("Model file not found. Please train and save the model first.")
-            
-        # Load preprocessor
-        if os.path.exists('superkart_preprocessor.pkl'):
-            preprocessor = joblib.load('superkart_preprocessor.pkl')
-            logger.info("Preprocessor loaded successfully")
-        else:
-            logger.warning("Preprocessor file not found.")
-            
         # Define feature names (based on SuperKart dataset)
         feature_names = [
             'Product_Weight', 'Product_Sugar_Content', 'Product_Visibility',
             'Product_Type', 'Product_MRP', 'Store_Size', 'Store_Location_Type',
             'Store_Type'
         ]
+
+        if prediction_cache is None:
+            prediction_cache = cache_from_env(
+                feature_names, numeric_features,
+                version_fn=lambda: active_version.version_id if active_version else None)
+
+        versions.reload(force=True)
+        versions.start_watcher(MODEL_WATCH_INTERVAL)
         
         return True
     except Exception as e:
         logger.error(f"Error loading model/preprocessor: {str(e)}")
         return False
 
-@app.route('/')
-def home():
-    """Health check endpoint"""
-    return jsonify({
+def warm_up():
+    """Send synthetic records through every request path once, so the first real request pays no first-call costs"""
+    version = active_version
+    records = model_versions.smoke_test_records()
+    # /predict: body decoding, compiled preprocessor, single-row scoring, encoders
+    for mimetype in wire_formats.available_mimetypes(arrow=False):
+        body, _ = wire_formats.encode(records[0], 200, mimetype)
+        record = decode_record_body(body, mimetype)
+        prediction = predict_matrix(transform_records([record], version), version)[0]
+        wire_formats.encode({"prediction": float(prediction), "input_data": record}, 200, mimetype)
+    # /predict/batch and /predict/scenarios: parsing, column-wise validation, chunked scoring
+    batch = parse_batch_records(wire_formats.dumps(records), wire_formats.JSON_MIMETYPE)
+    input_df, valid, _ = validate_batch(batch)
+    predictions = predict_frame(input_df[valid], version=version).tolist()
+    payload = {"predictions": predictions, "errors": [], "count": len(predictions)}
+    for mimetype in wire_formats.available_mimetypes():
+        wire_formats.encode(payload, 200, mimetype)
+    if wire_formats.ARROW_STREAM_MIMETYPE in wire_formats.available_mimetypes():
+        body = wire_formats.write_arrow({f: input_df[f].tolist() for f in feature_names})
+        validate_frame(wire_formats.read_arrow(body, wire_formats.ARROW_STREAM_MIMETYPE))
+    with app.test_request_context():
+        jsonify(payload)
+    return True
+
+def startup_steps():
+    """(phase name, function) pairs run before the process reports ready"""
+    steps = [('deferred_imports', lambda: startup.load_deferred(*DEFERRED_IMPORTS)),
+             ('model_load', load_model_and_preprocessor)]
+    if STARTUP_WARMUP:
+        steps.append(('warm_up', warm_up))
+    return steps
+
+def start(background=True):
+    """Load and warm up the model once per process, on a background thread unless told otherwise"""
+    return startup_state.run(startup_steps(), background)
+
+def ready_payload():
+    """Readiness body and status: 200 once a complete model is loaded and warmed up"""
+    version = active_version
+    ready = startup_state.ready and version is not None and version.complete
+    payload = {
+        "ready": ready,
+        "model_version": version.version_id if version is not None else None,
+        "startup": startup_state.stats()
+    }
+    return payload, 200 if ready else 503
+
+def model_unavailable():
+    """Error body and status while no complete model version is active"""
+    if startup_state.state == startup.STARTING:
+        return {"error": "Model is still loading, retry shortly"}, 503
+    return {
+        "error": "Model or preprocessor not loaded. Please check server logs."
+    }, 500
+
+def home_payload():
+    """Health check body"""
+    return {
         "message": "SuperKart Sales Prediction API",
-        "status": "healthy",
+        "status": "healthy" if startup_state.ready else startup_state.state,
         "timestamp": datetime.now().isoformat(),
         "model_loaded": model is not None,
         "preprocessor_loaded": preprocessor is not None
-    })
+    }
 
-@app.route('/predict', methods=['POST'])
-def predict():
-    """Make sales prediction"""
+@app.route('/')
+def home():
+    """Health check endpoint"""
+    return jsonify(home_payload())
+
+@app.route('/live')
+def live():
+    """Liveness probe: the process is up and serving HTTP, loaded or not"""
+    return jsonify({"status": "alive", "pid": os.getpid()})
+
+@app.route('/ready')
+def ready():
+    """Readiness probe: 503 until the model is loaded and warmed up"""
+    payload, status = ready_payload()
+    return jsonify(payload), status
+
+def predict_payload(data, echo=True, model_name=None):
+    """Score one record; returns (response dict, HTTP status)
+
+    With ``echo=False`` the record is not repeated back as ``input_data``.
+    ``model_name`` picks a registry model; otherwise the registry's routes and
+    split decide, falling back to production.
+    """
     try:
+        # One version for the whole request, even if a reload swaps it meanwhile
+        try:
+            model_name, version = select_version(data if isinstance(data, dict) else None, model_name)
+        except LookupError as e:
+            return {"error": str(e)}, 404
+
         # Check if model is loaded
-        if model is None or preprocessor is None:
-            return jsonify({
-                "error": "Model or preprocessor not loaded. Please check server logs."
-            }), 500
+        if version is None or not version.complete:
+            return model_unavailable()
             
-        # Get JSON data from request
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({"error": "No JSON data provided"}), 400
+        if not data or not isinstance(data, dict):
+            return {"error": "No JSON data provided"}, 400
             
         # Validate required features
-        missing_features = [f for f in feature_names if f not in data]
+        with metrics.stage('validate'):
+            missing_features = [f for f in feature_names if f not in data]
         if missing_features:
-            return jsonify({
+            return {
                 "error": f"Missing required features: {missing_features}",
                 "required_features": feature_names
-            }), 400
+            }, 400
+
+        monitor = drift_monitor
+        if monitor is not None:
+            monitor.observe(data)
             
-        # Create DataFrame from input data
-        input_df = pd.DataFrame([data])
-        
-        # Preprocess the data
-        processed_data = preprocessor.transform(input_df)
-        
-        # Make prediction
-        prediction = model.predict(processed_data)[0]
+        # The cache and the micro-batcher are keyed to the production version
+        is_production = version is active_version
+        cache_key = None
+        prediction = None
+        if prediction_cache is not None and is_production and not hasattr(version.model, 'predict_proba'):
+            cache_key = prediction_cache.key(data)
+            prediction = prediction_cache.get(cache_key)
+
         prediction_proba = None
-        
-        # Get prediction probabilities if available (for classification)
-        if hasattr(model, 'predict_proba'):
-            prediction_proba = model.predict_proba(processed_data)[0].tolist()
+        if prediction is None:
+            scoring_started = time.perf_counter()
+            # Preprocess the data
+            processed_data = transform_records([data], version)
+
+            # Make prediction, coalesced with concurrent requests when enabled
+            with metrics.stage('predict'):
+                if micro_batcher is not None and is_production:
+                    prediction = micro_batcher.predict(processed_data)
+                else:
+                    prediction = predict_matrix(processed_data, version)[0]
+            if cache_key is not None:
+                prediction_cache.set(cache_key, prediction)
+            if model_registry is not None:
+                model_registry.count_request(model_name, time.perf_counter() - scoring_started)
+
+            # Get prediction probabilities if available (for classification)
+            if hasattr(version.model, 'predict_proba'):
+                with metrics.stage('predict_proba'):
+                    prediction_proba = version.model.predict_proba(processed_data)[0].tolist()
         
         # Prepare response
         response = {
             "prediction": float(prediction),
-            "input_data": data,
             "timestamp": datetime.now().isoformat(),
-            "model_type": str(type(model).__name__)
+            "model_type": model_type_name(version),
+            "model_version": version.version_id,
+            "model": model_name
         }
+        if echo:
+            response["input_data"] = data
         
         if prediction_proba:
             response["prediction_probabilities"] = prediction_proba
+
+        if model_registry is not None:
+            # Candidates score a copy on a background thread after we answer
+            model_registry.shadow_score(model_name, data, float(prediction), score_record)
             
-        return jsonify(response)
+        return response, 200
         
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
-        return jsonify({"error": f"Prediction failed: {str(e)}"}), 500
+        return {"error": f"Prediction failed: {str(e)}"}, 500
+
+def echo_requested(echo=None, prefer=None):
+    """False when the caller opted out of the input echo (?echo=false or Prefer: return=minimal)"""
+    if echo is not None and echo.strip().lower() in ('0', 'false', 'no', 'off'):
+        return False
+    return 'return=minimal' not in (prefer or '').replace(' ', '').lower()
+
+def decode_record_body(body, mimetype):
+    """One record (or request object) from a JSON, MessagePack or one-row Arrow body.
+
+    Returns None for unreadable bodies; raises wire_formats.UnsupportedMediaType
+    for formats this process cannot decode.
+    """
+    try:
+        if wire_formats.is_arrow(mimetype):
+            df = wire_formats.read_arrow(body, mimetype)
+            return df.to_dict('records')[0] if len(df) == 1 else None
+        return wire_formats.loads(body, mimetype)
+    except wire_formats.UnsupportedMediaType:
+        raise
+    except ValueError:
+        return None
+
+def respond(payload, status=200, arrow=True):
+    """Encode ``payload`` as JSON, MessagePack or Arrow, following the Accept header"""
+    mimetype = wire_formats.negotiate(request.headers.get('Accept'), arrow)
+    if mimetype is None:
+        payload, status, mimetype = wire_formats.not_acceptable_payload(arrow), 406, wire_formats.JSON_MIMETYPE
+    body, mimetype = wire_formats.encode(payload, status, mimetype)
+    return Response(body, status=status, mimetype=mimetype)
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    """Make sales prediction"""
+    with metrics.stage('parse'):
+        try:
+            data = decode_record_body(request.get_data(), request.mimetype)
+        except wire_formats.UnsupportedMediaType as e:
+            return respond({"error": str(e)}, 415)
+    echo = echo_requested(request.args.get('echo'), request.headers.get('Prefer'))
+    payload, status = predict_payload(data, echo, request.args.get('model'))
+    with metrics.stage('serialize'):
+        return respond(payload, status)
+
+def transform_records(records, version=None):
+    """Preprocess a list of raw records, preferring the compiled fast path"""
+    version = version or active_version
+    if version.compiled_preprocessor is not None:
+        with metrics.stage('preprocess'):
+            return version.compiled_preprocessor.transform(records)
+    with metrics.stage('dataframe'):
+        df = pd.DataFrame(records)
+    with metrics.stage('preprocess'):
+        return version.preprocessor.transform(df)
+
+def transform_frame(df, version=None):
+    """Preprocess a validated DataFrame, preferring the compiled fast path"""
+    version = version or active_version
+    if version.compiled_preprocessor is not None:
+        return version.compiled_preprocessor.transform_frame(df)
+    return version.preprocessor.transform(df)
+
+def model_type_name(version=None):
+    """Class name of the served model, also when it is mapped from the model store"""
+    version = version or active_version
+    if version is None or version.model is None:
+        return "Not loaded"
+    if version.model is version.flat_model:
+        return version.flat_model.source
+    return type(version.model).__name__
+
+def predict_matrix(X, version=None):
+    """Score a preprocessed feature matrix, preferring the flattened trees"""
+    version = version or active_version
+    flat = version.flat_model
+    if flat is not None and (version.model is flat or X.shape[0] <= FLAT_FOREST_MAX_ROWS):
+        return flat.predict(X)
+    return version.model.predict(X)
+
+# MICRO_BATCH=1 coalesces concurrent /predict calls into one model call
+# (needs a threaded server, e.g. gunicorn --threads)
+micro_batcher = batcher_from_env(predict_matrix)
+
+def parse_batch_records(body, mimetype):
+    """Read records from a JSON array/object, NDJSON, MessagePack or Arrow body.
+
+    Arrow bodies come back as a DataFrame so they are validated and scored
+    column-wise without ever becoming per-row dicts.
+    """
+    content_type = (mimetype or '').lower()
+    if wire_formats.is_arrow(content_type):
+        return wire_formats.read_arrow(body, content_type)
+    if content_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonlines'):
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        return [wire_formats.loads(line, None) for line in body.splitlines() if line.strip()]
+
+    try:
+        data = wire_formats.loads(body, content_type)
+    except wire_formats.UnsupportedMediaType:
+        raise
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        # Accept {"records": [...]} and the notebook's {"data": [...]} shape
+        data = data.get('records', data.get('data'))
+    return data
+
+def validate_batch(records):
+    """Validate all records in one pass.
+
+    Returns the feature DataFrame plus a boolean mask of valid rows and a
+    per-row error list (``None`` for rows that passed).
+    """
+    # Records that are not objects become all-NaN rows; flag them explicitly
+    not_object = np.array([not isinstance(r, dict) for r in records], dtype=bool)
+    rows = [r if isinstance(r, dict) else {} for r in records]
+
+    df = pd.DataFrame.from_records(rows, columns=feature_names)
+    return validate_frame(df, not_object)
+
+def validate_frame(df, not_object=None):
+    """Column-wise validation of a DataFrame holding (at least) the features.
+
+    Same return values as validate_batch(); the returned frame has only the
+    feature columns and a fresh RangeIndex.
+    """
+    df = df.reindex(columns=feature_names).reset_index(drop=True)
+    if not_object is None:
+        not_object = np.zeros(len(df), dtype=bool)
+    errors = [None] * len(df)
+
+    numeric = df[numeric_features].apply(pd.to_numeric, errors='coerce')
+    missing = df.isna()
+    bad_numeric = numeric.isna() & ~missing[numeric_features]
+    df[numeric_features] = numeric
+    categorical = [f for f in feature_names if f not in numeric_features]
+    df[categorical] = df[categorical].where(missing[categorical], df[categorical].astype(str))
+
+    invalid = not_object | missing.any(axis=1).to_numpy() | bad_numeric.any(axis=1).to_numpy()
+    for i in np.flatnonzero(invalid):
+        if not_object[i]:
+            errors[i] = "Record must be a JSON object"
+            continue
+        problems = []
+        missing_cols = [f for f in feature_names if missing.at[i, f]]
+        if missing_cols:
+            problems.append(f"Missing required features: {missing_cols}")
+        bad_cols = [f for f in numeric_features if bad_numeric.at[i, f]]
+        if bad_cols:
+            problems.append(f"Non-numeric values for: {bad_cols}")
+        errors[i] = "; ".join(problems)
+
+    return df, ~invalid, errors
+
+def predict_frame(df, chunk_size=None, version=None):
+    """Run the preprocessor and model over a validated DataFrame in chunks"""
+    version = version or active_version
+    chunk_size = max(1, chunk_size or BATCH_MAX_CHUNK_SIZE)
+    predictions = np.empty(len(df), dtype=np.float64)
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        with metrics.stage('batch_preprocess'):
+            X = transform_frame(chunk, version)
+        with metrics.stage('batch_predict'):
+            predictions[start:start + len(chunk)] = predict_matrix(X, version)
+    return predictions
+
+def predict_batch_payload(records, chunk_size=None, model_name=None):
+    """Score a list of records or a DataFrame; returns (response dict, HTTP status)"""
+    try:
+        try:
+            model_name, version = select_version(None, model_name)
+        except LookupError as e:
+            return {"error": str(e)}, 404
+        if version is None or not version.complete:
+            return model_unavailable()
+
+        is_frame = isinstance(records, pd.DataFrame)
+        if not (is_frame or isinstance(records, list)) or len(records) == 0:
+            return {
+                "error": "Expected a non-empty array of records",
+                "required_features": feature_names
+            }, 400
+
+        chunk_size = min(chunk_size or BATCH_MAX_CHUNK_SIZE, BATCH_MAX_CHUNK_SIZE)
+
+        metrics.REGISTRY.observe('superkart_batch_size', len(records), endpoint='/predict/batch')
+        with metrics.stage('batch_validate'):
+            input_df, valid, errors = validate_frame(records) if is_frame else validate_batch(records)
+        monitor = drift_monitor
+        if monitor is not None:
+            monitor.observe_frame(input_df[valid])
+
+        predictions = [None] * len(records)
+        if valid.any():
+            valid_idx = np.flatnonzero(valid)
+            scoring_started = time.perf_counter()
+            values = predict_frame(input_df.iloc[valid_idx], chunk_size, version)
+            if model_registry is not None:
+                model_registry.count_request(model_name, time.perf_counter() - scoring_started)
+            for i, value in zip(valid_idx.tolist(), values.tolist()):
+                predictions[i] = value
+
+        return {
+            "predictions": predictions,
+            "errors": [{"index": i, "error": e} for i, e in enumerate(errors) if e],
+            "count": len(records),
+            "valid_count": int(valid.sum()),
+            "timestamp": datetime.now().isoformat(),
+            "model_type": model_type_name(version),
+            "model_version": version.version_id,
+            "model": model_name
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}")
+        return {"error": f"Batch prediction failed: {str(e)}"}, 500
+
+def parse_chunk_size(value):
+    """``?chunk_size=`` as an int (None when absent); raises ValueError unless it is a positive integer"""
+    if value is None:
+        return None
+    if not value.strip().isdigit() or int(value) < 1:
+        raise ValueError(f"chunk_size must be a positive integer, got {value!r}")
+    return int(value)
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Make sales predictions for an array of records (JSON, NDJSON, MessagePack or Arrow)"""
+    try:
+        chunk_size = parse_chunk_size(request.args.get('chunk_size'))
+    except ValueError as e:
+        return respond({"error": str(e)}, 400)
+    try:
+        with metrics.stage('batch_parse'):
+            records = parse_batch_records(request.get_data(), request.mimetype)
+    except wire_formats.UnsupportedMediaType as e:
+        return respond({"error": str(e)}, 415)
+    except ValueError as e:
+        return respond({"error": f"Invalid request body: {str(e)}"}, 400)
+    payload, status = predict_batch_payload(records, chunk_size, request.args.get('model'))
+    with metrics.stage('batch_serialize'):
+        return respond(payload, status)
+
+def expand_sweep(feature, spec):
+    """Values of one sweep axis: a list, or {"start", "stop", "step"|"num"} for numeric features"""
+    if isinstance(spec, list):
+        if not spec:
+            raise ValueError(f"Sweep for {feature} has no values")
+        return spec
+    if not isinstance(spec, dict):
+        raise ValueError(f"Sweep for {feature} must be a list of values or a range object")
+    if feature not in numeric_features:
+        raise ValueError(f"Range sweeps are only supported for {numeric_features}")
+    try:
+        start, stop = float(spec['start']), float(spec['stop'])
+        num = int(spec['num']) if 'num' in spec else None
+        step = float(spec['step']) if num is None else None
+    except KeyError as e:
+        raise ValueError(f"Sweep for {feature} is missing {str(e)}")
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid sweep for {feature}: {str(e)}")
+
+    if num is not None:
+        if num < 1 or num > SCENARIO_MAX_POINTS:
+            raise ValueError(f"Sweep for {feature}: num must be between 1 and {SCENARIO_MAX_POINTS}")
+        values = np.linspace(start, stop, num)
+    else:
+        if step <= 0:
+            raise ValueError(f"Sweep for {feature}: step must be positive")
+        if (stop - start) / step >= SCENARIO_MAX_POINTS:
+            raise ValueError(f"Sweep for {feature} exceeds {SCENARIO_MAX_POINTS} points")
+        # Include stop when it lies on the grid
+        values = np.arange(start, stop + step * 1e-9, step)
+    if len(values) == 0:
+        raise ValueError(f"Sweep for {feature} is empty")
+    return values.round(10).tolist()
+
+def scenario_payload(data, model_name=None):
+    """Score the grid spanned by ``sweeps`` around a ``base`` record; returns (response dict, HTTP status)
+
+    ``predictions`` is an array nested in the order of ``axes``, i.e.
+    ``predictions[i][j]`` is the prediction for ``axes[0].values[i]`` and
+    ``axes[1].values[j]``.
+    """
+    try:
+        try:
+            model_name, version = select_version(None, model_name)
+        except LookupError as e:
+            return {"error": str(e)}, 404
+        if version is None or not version.complete:
+            return model_unavailable()
+
+        if not isinstance(data, dict) or not isinstance(data.get('base'), dict) \
+                or not isinstance(data.get('sweeps'), dict) or not data['sweeps']:
+            return {"error": "Expected {\"base\": {...}, \"sweeps\": {feature: values or range}}"}, 400
+
+        base, sweeps = data['base'], data['sweeps']
+        unknown = [f for f in sweeps if f not in feature_names]
+        if unknown:
+            return {"error": f"Cannot sweep unknown features: {unknown}",
+                    "required_features": feature_names}, 400
+        missing_features = [f for f in feature_names if f not in base and f not in sweeps]
+        if missing_features:
+            return {
+                "error": f"Missing required features: {missing_features}",
+                "required_features": feature_names
+            }, 400
+
+        try:
+            axes = [(feature, expand_sweep(feature, spec)) for feature, spec in sweeps.items()]
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        shape = tuple(len(values) for _, values in axes)
+        n_points = int(np.prod(shape))
+        if n_points > SCENARIO_MAX_POINTS:
+            return {"error": f"Scenario grid has {n_points} points, the limit is {SCENARIO_MAX_POINTS}"}, 400
+
+        # Expand the cartesian product column-wise instead of building records
+        metrics.REGISTRY.observe('superkart_batch_size', n_points, endpoint='/predict/scenarios')
+        columns = {f: np.repeat(np.asarray([base.get(f)], dtype=object), n_points)
+                   for f in feature_names if f not in sweeps}
+        grids = np.meshgrid(*[np.arange(n) for n in shape], indexing='ij')
+        for (feature, values), grid in zip(axes, grids):
+            columns[feature] = np.asarray(values, dtype=object)[grid.ravel()]
+        with metrics.stage('batch_validate'):
+            grid_df, valid, errors = validate_frame(pd.DataFrame(columns))
+        if not valid.all():
+            return {"error": next(e for e in errors if e)}, 400
+
+        predictions = predict_frame(grid_df, version=version).reshape(shape)
+        return {
+            "axes": [{"feature": feature, "values": values} for feature, values in axes],
+            "shape": list(shape),
+            "predictions": predictions.round(4).tolist(),
+            "count": n_points,
+            "timestamp": datetime.now().isoformat(),
+            "model_type": model_type_name(version),
+            "model_version": version.version_id,
+            "model": model_name
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Scenario prediction error: {str(e)}")
+        return {"error": f"Scenario prediction failed: {str(e)}"}, 500
+
+@app.route('/predict/scenarios', methods=['POST'])
+def predict_scenarios():
+    """Score a what-if grid around one record in a single pass"""
+    with metrics.stage('batch_parse'):
+        try:
+            data = decode_record_body(request.get_data(), request.mimetype)
+        except wire_formats.UnsupportedMediaType as e:
+            return respond({"error": str(e)}, 415)
+    payload, status = scenario_payload(data, request.args.get('model'))
+    with metrics.stage('batch_serialize'):
+        return respond(payload, status)
+
+def sales_cube_payload(by=(), filters=None):
+    """Slice of the sales cube rolled up to ``by``; returns (response dict, HTTP status)"""
+    if not os.path.exists(SALES_CUBE_PATH):
+        return {"error": "Sales cube not built. Run: python sales_cube.py SuperKart.csv"}, 503
+    try:
+        cube, cube_metadata = sales_cube.load_cube(SALES_CUBE_PATH)
+        rows = sales_cube.slice_cube(cube, by, filters)
+    except ValueError as e:
+        return {"error": str(e), "dimensions": sales_cube.DIMENSIONS}, 400
+    except Exception as e:
+        logger.error(f"Sales cube error: {str(e)}")
+        return {"error": f"Sales cube query failed: {str(e)}"}, 500
+    return {
+        "by": list(by),
+        "filters": filters or {},
+        "rows": rows,
+        "source_rows": cube_metadata["rows"] if cube_metadata else None,
+        "updated_at": cube_metadata["updated_at"] if cube_metadata else None,
+        "mrp_bands": sales_cube.MRP_BAND_LABELS
+    }, 200
+
+@app.route('/analytics/cube')
+def analytics_cube():
+    """Aggregated SuperKart sales, e.g. /analytics/cube?by=Store_Type&Store_Size=Medium"""
+    by = [d for d in request.args.get('by', '').split(',') if d]
+    filters = {k: request.args.getlist(k) for k in request.args if k != 'by'}
+    payload, status = sales_cube_payload(by, filters)
+    return jsonify(payload), status
+
+def model_info_payload():
+    """Model status and serving statistics"""
+    version = active_version
+    return {
+        "model_type": model_type_name(version),
+        "features": feature_names,
+        "model_loaded": version is not None and version.model is not None,
+        "preprocessor_loaded": version is not None and version.preprocessor is not None,
+        "compiled_preprocessor": version is not None and version.compiled_preprocessor is not None,
+        "flat_tree_inference": version is not None and version.flat_model is not None,
+        "model_store": version.model_store if version is not None else None,
+        "compact_model": version.compact_model if version is not None else None,
+        "model_version": versions.stats(),
+        "prediction_cache": prediction_cache.stats() if prediction_cache is not None else None,
+        "micro_batching": micro_batcher.stats() if micro_batcher is not None else None,
+        "model_registry": model_registry.stats() if model_registry is not None else None,
+        "drift_monitor": {"sample_rate": drift_monitor.sample_rate,
+                          "reference": drift_monitor.profile.get("source")} if drift_monitor is not None else None,
+        "wire_formats": wire_formats.available_mimetypes(),
+        "startup": startup_state.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
 
 @app.route('/model_info')
 def model_info():
     """Get model information"""
     try:
-        info = {
-            "model_type": str(type(model).__name__) if model else "Not loaded",
-            "features": feature_names,
-            "model_loaded": model is not None,
-            "preprocessor_loaded": preprocessor is not None,
-            "timestamp": datetime.now().isoformat()
-        }
-        return jsonify(info)
+        return jsonify(model_info_payload())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/features')
-def get_features():
-    """Get required features for prediction"""
-    return jsonify({
+def features_payload():
+    """Required features and their descriptions"""
+    return {
         "required_features": feature_names,
         "feature_descriptions": {
             "Product_Weight": "Weight of the product",
@@ -148,7 +864,95 @@ def get_features():
             "Store_Location_Type": "Location type (Tier 1/Tier 2/Tier 3)",
             "Store_Type": "Type of store (Grocery Store/Supermarket Type1/etc)"
         }
-    })
+    }
+
+@app.route('/features')
+def get_features():
+    """Get required features for prediction"""
+    return jsonify(features_payload())
+
+def drift_payload():
+    """Drift of the sampled production inputs against the training profile; returns (response dict, HTTP status)"""
+    monitor = drift_monitor
+    if monitor is None:
+        return {"error": "Drift monitoring is off (DRIFT_SAMPLE_RATE=0) or no model is loaded"}, 503
+    return monitor.report(), 200
+
+@app.route('/drift')
+def drift():
+    """Per-feature drift scores (PSI, mean shift, unseen categories) merged across workers"""
+    payload, status = drift_payload()
+    return jsonify(payload), status
+
+def reload_payload(version_id=None):
+    """Load, smoke-test and activate a model version; returns (response dict, HTTP status)"""
+    try:
+        if MODEL_DIR and not version_id:
+            # A plain reload follows the newest version again
+            model_versions.clear_pin(MODEL_DIR)
+        result = versions.reload(version_id)
+        if MODEL_DIR and version_id:
+            model_versions.write_pin(MODEL_DIR, version_id)
+        return result, 200
+    except model_versions.UnknownVersion as e:
+        # Only a missing version is a 404; a load can raise KeyError (a LookupError) too
+        return {"error": str(e)}, 404
+    except Exception as e:
+        serving = active_version.version_id if active_version else None
+        return {"error": f"Reload failed: {str(e)}", "active_version": serving}, 422
+
+def rollback_payload():
+    """Swap back to the previous in-memory version; returns (response dict, HTTP status)"""
+    try:
+        result = versions.rollback()
+    except LookupError as e:
+        return {"error": str(e)}, 409
+    if MODEL_DIR:
+        model_versions.write_pin(MODEL_DIR, active_version.version_id)
+    return result, 200
+
+def admin_authorized(token):
+    return ADMIN_TOKEN is not None and hmac.compare_digest(token or '', ADMIN_TOKEN)
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Hot-reload the model; body may name a version: {"version": "..."}"""
+    if not admin_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({"error": "Admin token missing or invalid"}), 403
+    data = request.get_json(silent=True) or {}
+    payload, status = reload_payload(data.get('version'))
+    return jsonify(payload), status
+
+@app.route('/admin/rollback', methods=['POST'])
+def admin_rollback():
+    """Reactivate the previously served model version"""
+    if not admin_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({"error": "Admin token missing or invalid"}), 403
+    payload, status = rollback_payload()
+    return jsonify(payload), status
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics, merged across all gunicorn workers"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profiler = metrics.start_profile()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        elapsed = time.perf_counter() - started
+        # Route pattern rather than raw path keeps label cardinality bounded
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.record_request(endpoint, response.status_code, elapsed)
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            metrics.finish_profile(profiler, endpoint, elapsed)
+    return response
 
 @app.errorhandler(404)
 def not_found(error):
@@ -158,9 +962,11 @@ def not_found(error):
 def internal_error(error):
     return jsonify({"error": "Internal server error"}), 500
 
+startup_state = startup.Startup()
+
 if __name__ == '__main__':
-    # Load model and preprocessor on startup
-    load_model_and_preprocessor()
+    # Load model and preprocessor in the background; /ready reports when done
+    start()
     
     # Run the app
     port = int(os.environ.get('PORT', 5000))
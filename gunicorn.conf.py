@@ -0,0 +1,39 @@
+import glob
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '7860')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+timeout = 120
+# Threads per worker; needed for MICRO_BATCH=1 to see concurrent requests
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Load and warm up the model once in the master before forking so workers
+# inherit it and are ready immediately. Together with MODEL_STORE=mmap the
+# forest pages stay shared between all workers instead of each worker holding
+# its own unpickled copy. With GUNICORN_PRELOAD=0 workers accept connections
+# at once and load in the background; /ready answers 503 until they are warm.
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Workers share metrics and drift sketches through per-process snapshot files
+# in METRICS_DIR; start every server with an empty directory
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'superkart_metrics'))
+for stale in glob.glob(os.path.join(os.environ['METRICS_DIR'], 'metrics-*.json')) + \
+        glob.glob(os.path.join(os.environ['METRICS_DIR'], 'drift-*.json')):
+    os.remove(stale)
+
+
+def on_starting(server):
+    if preload_app:
+        import flask_app
+        flask_app.start(background=False)
+
+
+def post_worker_init(worker):
+    # Without preload (or when it failed) each worker loads its own model in the background
+    import flask_app
+    if flask_app.active_version is None:
+        flask_app.start()
+    else:
+        # The master's watcher thread is not inherited by the fork
+        flask_app.versions.start_watcher(flask_app.MODEL_WATCH_INTERVAL)
@@ -0,0 +1,325 @@
+import bisect
+import cProfile
+import glob
+import json
+import logging
+import os
+import random
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Directory shared by all gunicorn workers; each process writes a snapshot of
+# its metrics there and /metrics merges them. Unset = this process only.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+
+# Opt-in sampled profiling: profile this fraction of requests and keep the
+# cProfile dump of those slower than PROFILE_SLOW_MS
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 100))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+
+LATENCY_BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384, 65536]
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``buckets`` are inclusive upper bounds"""
+
+    def __init__(self, buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = [str(b) for b in self.buckets] + ['+Inf']
+            return {
+                "buckets": dict(zip(labels, self.counts)),
+                "count": self.count,
+                "sum": self.total,
+                "mean": self.total / self.count if self.count else 0.0,
+            }
+
+
+class Registry:
+    """Counters, gauges and histograms keyed by (name, sorted label items)"""
+
+    def __init__(self):
+        self.meta = {}
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flusher = None
+        self._flusher_pid = None
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self._dirty = False
+
+    def reset_after_fork(self):
+        """Empty state with a new lock, for a forked child.
+
+        The lock is replaced rather than acquired: a parent thread (the
+        flusher, a request) may have held it at fork time, and that thread
+        does not exist in the child to release it.
+        """
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._dirty = False
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self.meta[name] = {"type": kind, "help": help_text, "buckets": buckets}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            self._dirty = True
+        self._ensure_flusher()
+
+    def set_gauge(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.gauges[key] = value
+            self._dirty = True
+        self._ensure_flusher()
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        hist = self.histograms.get(key)
+        if hist is None:
+            with self._lock:
+                hist = self.histograms.get(key)
+                if hist is None:
+                    hist = Histogram(self.meta[name]["buckets"])
+                    self.histograms[key] = hist
+        return hist
+
+    def observe(self, name, value, **labels):
+        self.histogram(name, **labels).observe(value)
+        self._dirty = True
+        self._ensure_flusher()
+
+    def snapshot(self):
+        """JSON-serializable state of this process"""
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "counters": [[n, list(l), v] for (n, l), v in self.counters.items()],
+                "gauges": [[n, list(l), v] for (n, l), v in self.gauges.items()],
+                "histograms": [[n, list(l), h.counts[:], h.total, h.count]
+                               for (n, l), h in self.histograms.items()],
+            }
+
+    # --- cross-process sharing -------------------------------------------
+
+    def _ensure_flusher(self):
+        if METRICS_DIR is None:
+            return
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        # Threads do not survive fork; each worker starts its own flusher
+        with self._lock:
+            if self._flusher_pid != pid:
+                self._flusher_pid = pid
+                self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush',
+                                                 daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            if self._dirty:
+                self._dirty = False
+                with self._lock:
+                    self.gauges[('superkart_process_resident_memory_bytes',
+                                 (('pid', str(os.getpid())),))] = current_rss_bytes()
+                try:
+                    self.flush()
+                except OSError as e:
+                    logger.warning(f"Could not write metrics snapshot: {str(e)}")
+
+    def flush(self):
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f'metrics-{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+
+REGISTRY = Registry()
+# A forked worker starts from zero; what the parent recorded stays in the parent's file
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=REGISTRY.reset_after_fork)
+REGISTRY.describe('superkart_requests_total', 'counter', "HTTP requests by endpoint and status")
+REGISTRY.describe('superkart_request_duration_seconds', 'histogram',
+                  "End-to-end request handling time", LATENCY_BUCKETS)
+REGISTRY.describe('superkart_stage_duration_seconds', 'histogram',
+                  "Time spent per prediction stage", LATENCY_BUCKETS)
+REGISTRY.describe('superkart_batch_size', 'histogram', "Rows per scored request", BATCH_SIZE_BUCKETS)
+REGISTRY.describe('superkart_model_load_seconds', 'gauge', "Time taken by the last model load")
+REGISTRY.describe('superkart_model_load_memory_bytes', 'gauge',
+                  "Resident memory added by the last model load")
+REGISTRY.describe('superkart_model_file_bytes', 'gauge', "Size of the model artifact on disk")
+REGISTRY.describe('superkart_process_resident_memory_bytes', 'gauge', "Resident memory per process")
+
+
+@contextmanager
+def stage(name):
+    """Record the duration of one prediction stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe('superkart_stage_duration_seconds', time.perf_counter() - started, stage=name)
+
+
+def record_request(endpoint, status, seconds):
+    REGISTRY.inc('superkart_requests_total', endpoint=endpoint, status=str(status))
+    REGISTRY.observe('superkart_request_duration_seconds', seconds, endpoint=endpoint)
+
+
+def current_rss_bytes():
+    """Current resident set size; falls back to peak RSS where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def record_model_load(seconds, rss_delta_bytes, model_path):
+    REGISTRY.set_gauge('superkart_model_load_seconds', seconds, pid=str(os.getpid()))
+    REGISTRY.set_gauge('superkart_model_load_memory_bytes', rss_delta_bytes, pid=str(os.getpid()))
+    if model_path and os.path.exists(model_path):
+        REGISTRY.set_gauge('superkart_model_file_bytes', os.path.getsize(model_path))
+
+
+def start_profile():
+    """A running cProfile.Profile for a sampled request, else None"""
+    if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active in this thread
+        return None
+    return profiler
+
+
+def finish_profile(profiler, endpoint, seconds):
+    """Stop ``profiler`` and keep its dump if the request was slow"""
+    profiler.disable()
+    if seconds * 1000.0 < PROFILE_SLOW_MS:
+        return None
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = endpoint.strip('/').replace('/', '_') or 'root'
+    path = os.path.join(PROFILE_DIR, f'{name}-{int(time.time() * 1000)}-{os.getpid()}.prof')
+    profiler.dump_stats(path)
+    logger.info(f"Slow request ({seconds * 1000.0:.1f}ms) on {endpoint}, profile saved to {path}")
+    return path
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _collect():
+    """Merge snapshots of all processes; counters/histograms of exited workers are kept"""
+    REGISTRY.set_gauge('superkart_process_resident_memory_bytes', current_rss_bytes(),
+                       pid=str(os.getpid()))
+    snapshots = [REGISTRY.snapshot()]
+    if METRICS_DIR is not None:
+        for path in glob.glob(os.path.join(METRICS_DIR, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get('pid') != os.getpid():
+                snapshots.append(snapshot)
+
+    counters, gauges, histograms = {}, {}, {}
+    for snapshot in snapshots:
+        alive = snapshot['pid'] == os.getpid() or _pid_alive(snapshot['pid'])
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(l) for l in labels))
+            counters[key] = counters.get(key, 0) + value
+        if alive:
+            for name, labels, value in snapshot['gauges']:
+                gauges[(name, tuple(tuple(l) for l in labels))] = value
+        for name, labels, counts, total, count in snapshot['histograms']:
+            key = (name, tuple(tuple(l) for l in labels))
+            merged = histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], counts)]
+            merged[1] += total
+            merged[2] += count
+    return counters, gauges, histograms
+
+
+def _format_labels(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for k, v in items]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format (0.0.4)"""
+    counters, gauges, histograms = _collect()
+    lines = []
+    for name, meta in REGISTRY.meta.items():
+        if meta['type'] == 'counter':
+            series = {k: v for k, v in counters.items() if k[0] == name}
+        elif meta['type'] == 'gauge':
+            series = {k: v for k, v in gauges.items() if k[0] == name}
+        else:
+            series = {k: v for k, v in histograms.items() if k[0] == name}
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {meta['help']}")
+        lines.append(f"# TYPE {name} {meta['type']}")
+        for (_, labels), value in sorted(series.items()):
+            if meta['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket_count in zip(meta['buckets'] + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return '\n'.join(lines) + '\n'
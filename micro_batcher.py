@@ -0,0 +1,112 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into one model call.
+
+    The first request to arrive opens a window; every request that arrives
+    within ``max_wait_ms`` (or until ``max_batch_size`` rows are queued) is
+    stacked into one matrix, scored with a single ``predict_fn`` call and the
+    results are handed back to the waiting request threads. When more than
+    ``max_queue`` rows are already waiting, callers score inline instead, so
+    queueing delay stays bounded under overload.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0, max_queue=1024):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.wait_ms = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100])
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128, 256])
+        self.bypassed = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Threads do not survive fork; start one lazily in each process
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def predict(self, row):
+        """Score one preprocessed row (1 x n_features); blocks until it is done"""
+        self._ensure_worker()
+        if self._queue.qsize() >= self.max_queue:
+            self.bypassed += 1
+            return float(self.predict_fn(row)[0])
+
+        future = Future()
+        self._queue.put((row, future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.wait_ms.observe((started - enqueued) * 1000.0)
+            self.batch_size.observe(len(batch))
+            try:
+                rows = [row.toarray() if hasattr(row, 'toarray') else row for row, _, _ in batch]
+                predictions = self.predict_fn(np.vstack(rows))
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), value in zip(batch, predictions):
+                future.set_result(float(value))
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize(),
+            "bypassed": self.bypassed,
+            "wait_ms": self.wait_ms.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
+
+
+def batcher_from_env(predict_fn):
+    """Build the micro-batcher from MICRO_BATCH_* settings (None if disabled)"""
+    if os.environ.get('MICRO_BATCH', '0') != '1':
+        return None
+    return MicroBatcher(
+        predict_fn,
+        max_batch_size=int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64)),
+        max_wait_ms=float(os.environ.get('MICRO_BATCH_WAIT_MS', 2)),
+        max_queue=int(os.environ.get('MICRO_BATCH_MAX_QUEUE', 1024)),
+    )
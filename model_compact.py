@@ -0,0 +1,389 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+from startup import lazy_import
+from superkart_options import COLUMN_ALIASES, TARGET
+from tree_inference import FlatForest, compile_model, probe_matrix
+
+joblib = lazy_import('joblib')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# A compact model is one compressed .npz holding the flattened trees with
+# float32 thresholds/leaf values and per-tree node indices in the narrowest
+# unsigned type that fits. Impurities, sample counts and the other
+# training-only attributes of the pickle are not kept.
+COMPACT_FORMAT_VERSION = 1
+
+# Relative RMSE increase on the holdout set that pruning may cost by default
+DEFAULT_RMSE_BUDGET = 0.01
+
+# Rows stored with the artifact so servers can verify the trees without the pickle
+CHECK_ROWS = 64
+
+
+def compact_path_for(model_path):
+    """Where the compact artifact for ``model_path`` lives: <stem>.compact.npz beside it"""
+    return os.path.splitext(model_path)[0] + '.compact.npz'
+
+
+def compact_source(model_path):
+    """The compact artifact to serve for ``model_path``, or None.
+
+    It is used when it exists and is not older than the pickle, so retraining
+    without re-running the compaction falls back to the fresh pickle.
+    """
+    compact_path = compact_path_for(model_path)
+    if not os.path.exists(compact_path):
+        return None
+    if os.path.exists(model_path) and os.path.getmtime(model_path) > os.path.getmtime(compact_path):
+        logger.warning(f"{compact_path} is older than {model_path}, ignoring it")
+        return None
+    return compact_path
+
+
+def _narrowest_uint(max_value):
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    return np.uint64
+
+
+def _float32_floor(threshold):
+    """Largest float32 <= ``threshold``, so ``x <= t`` decides the same for float32 inputs"""
+    t32 = threshold.astype(np.float32)
+    above = t32.astype(np.float64) > threshold
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    return t32
+
+
+def node_depths(flat):
+    """Depth of every node of a FlatForest (roots are 0)"""
+    depths = np.full(flat.n_nodes, -1, dtype=np.intp)
+    level = np.asarray(flat.roots, dtype=np.intp)
+    depth = 0
+    while level.size:
+        depths[level] = depth
+        internal = level[~flat.is_leaf[level]]
+        level = np.concatenate([flat.left[internal], flat.right[internal]])
+        depth += 1
+    return depths
+
+
+def prune(flat, n_trees=None, max_depth=None):
+    """FlatForest restricted to the first ``n_trees`` trees, cut off at ``max_depth``.
+
+    Nodes at ``max_depth`` become leaves predicting their own value, which for
+    sklearn forests is the mean target of the training samples that reached
+    them. Boosted ensembles (``aggregate='sum'``) only have leaf values, so
+    they can be truncated to fewer rounds but not pruned by depth.
+    """
+    n_trees = min(n_trees or flat.n_trees, flat.n_trees)
+    if max_depth is not None and flat.aggregate != 'mean':
+        raise ValueError("Depth pruning needs internal node values (sklearn forests only)")
+
+    roots = np.asarray(flat.roots, dtype=np.intp)
+    stop = roots[n_trees] if n_trees < flat.n_trees else flat.n_nodes
+    keep = np.zeros(flat.n_nodes, dtype=bool)
+    keep[:stop] = True
+    is_leaf = flat.is_leaf.copy()
+    if max_depth is not None:
+        depths = node_depths(flat)
+        keep &= depths <= max_depth
+        is_leaf |= depths == max_depth
+
+    # Old node index -> new node index for the kept nodes
+    new_index = np.cumsum(keep) - 1
+    old = np.flatnonzero(keep)
+    leaf = is_leaf[old]
+    self_index = np.arange(len(old))
+    left = np.where(leaf, self_index, new_index[flat.left[old]])
+    right = np.where(leaf, self_index, new_index[flat.right[old]])
+    feature = np.where(leaf, 0, flat.feature[old])
+    threshold = np.where(leaf, np.inf, flat.threshold[old]).astype(flat.threshold.dtype)
+    default_left = flat.default_left[old] | leaf
+    depth = flat.max_depth if max_depth is None else min(max_depth, flat.max_depth)
+    return FlatForest(feature, threshold, left, right, flat.value[old], default_left,
+                      new_index[roots[:n_trees]], depth, aggregate=flat.aggregate,
+                      base_score=flat.base_score, n_features=flat.n_features, source=flat.source)
+
+
+def make_check(X, expected, pruned, y=None):
+    """Check rows for an artifact: inputs, the predictions it must reproduce and, for
+    pruned forests scored on a holdout set, the targets and the RMSE it reached.
+
+    ``expected`` is the original model's output for an unpruned forest and the
+    pruned forest's own output otherwise.
+    """
+    X = np.asarray(X, dtype=np.float64)[:CHECK_ROWS]
+    expected = np.asarray(expected, dtype=np.float64).ravel()[:CHECK_ROWS]
+    check = {"X": X, "expected": expected, "pruned": bool(pruned), "y": None, "holdout_rmse": None}
+    if pruned and y is not None:
+        check["y"] = np.asarray(y, dtype=np.float64)[:CHECK_ROWS]
+        check["holdout_rmse"] = float(np.sqrt(np.mean((expected - check["y"]) ** 2)))
+    return check
+
+
+def verify_check(flat, check, rtol=1e-5, atol=1e-3):
+    """Raise ValueError unless ``flat`` reproduces the check rows recorded with its artifact.
+
+    Unpruned forests must match the recorded predictions of the original
+    model; pruned ones must stay within the holdout RMSE recorded for them
+    (or match their own recorded predictions when there was no holdout set).
+    """
+    predicted = np.asarray(flat.predict(check["X"]), dtype=np.float64).ravel()
+    if check["pruned"] and check["y"] is not None:
+        rmse = float(np.sqrt(np.mean((predicted - check["y"]) ** 2)))
+        if rmse > check["holdout_rmse"] * (1.0 + rtol) + atol:
+            raise ValueError(f"Holdout RMSE {rmse:g} exceeds the {check['holdout_rmse']:g} "
+                             f"recorded for the pruned forest")
+    elif not np.allclose(predicted, check["expected"], rtol=rtol, atol=atol):
+        worst = float(np.max(np.abs(predicted - check["expected"])))
+        raise ValueError(f"Serving trees differ from the recorded predictions by up to {worst:g}")
+
+
+def check_arrays(check):
+    """``check`` as (arrays, meta) for storing next to the tree arrays"""
+    arrays = {"check_X": check["X"], "check_expected": check["expected"]}
+    if check["y"] is not None:
+        arrays["check_y"] = check["y"]
+    return arrays, {"pruned": check["pruned"], "holdout_rmse": check["holdout_rmse"]}
+
+
+def check_from_arrays(arrays, meta):
+    """Inverse of check_arrays(); None for artifacts written without check rows"""
+    if meta is None or "check_X" not in arrays:
+        return None
+    return {"X": np.asarray(arrays["check_X"]), "expected": np.asarray(arrays["check_expected"]),
+            "y": np.asarray(arrays["check_y"]) if "check_y" in arrays else None,
+            "pruned": meta["pruned"], "holdout_rmse": meta["holdout_rmse"]}
+
+
+def save_compact(flat, path, info=None, check=None):
+    """Write ``flat`` (and optional make_check() rows) as a compact .npz; returns the file size in bytes"""
+    roots = np.asarray(flat.roots, dtype=np.intp)
+    tree_sizes = np.diff(np.append(roots, flat.n_nodes))
+    # Child indices relative to their tree's root fit in 8/16 bits for typical trees
+    tree_of_node = np.repeat(np.arange(flat.n_trees), tree_sizes)
+    offset = roots[tree_of_node]
+    index_dtype = _narrowest_uint(int(tree_sizes.max()) - 1)
+    meta = {
+        "format_version": COMPACT_FORMAT_VERSION,
+        "model_type": flat.source,
+        "aggregate": flat.aggregate,
+        "base_score": flat.base_score,
+        "max_depth": flat.max_depth,
+        "n_features": flat.n_features,
+        "n_trees": flat.n_trees,
+        "n_nodes": flat.n_nodes,
+        "info": info or {},
+    }
+    extra = {}
+    if check is not None:
+        extra, meta["check"] = check_arrays(check)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8),
+            tree_sizes=tree_sizes.astype(np.uint32),
+            feature=flat.feature.astype(_narrowest_uint(max(int(flat.feature.max()), 0))),
+            threshold=_float32_floor(np.asarray(flat.threshold, dtype=np.float64)),
+            value=flat.value.astype(np.float32),
+            left=(flat.left - offset).astype(index_dtype),
+            right=(flat.right - offset).astype(index_dtype),
+            default_left=np.packbits(flat.default_left),
+            **extra,
+        )
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def load_compact(path):
+    """Load a compact .npz as a FlatForest (float32 thresholds and leaf values)"""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+        if meta.get('format_version') != COMPACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format in {path}: {meta.get('format_version')}")
+        tree_sizes = data['tree_sizes'].astype(np.intp)
+        roots = np.concatenate([[0], np.cumsum(tree_sizes)[:-1]]).astype(np.intp)
+        offset = np.repeat(roots, tree_sizes)
+        n_nodes = int(tree_sizes.sum())
+        return FlatForest(
+            data['feature'], data['threshold'],
+            data['left'].astype(np.intp) + offset, data['right'].astype(np.intp) + offset,
+            data['value'], np.unpackbits(data['default_left'], count=n_nodes).astype(bool), roots,
+            meta['max_depth'], aggregate=meta['aggregate'], base_score=meta['base_score'],
+            n_features=meta['n_features'], source=meta['model_type'])
+
+
+def read_check(path):
+    """The check rows stored in a compact .npz, or None"""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+        return check_from_arrays({name: data[name] for name in data.files if name.startswith('check_')},
+                                 meta.get('check'))
+
+
+def regression_scores(y_true, y_pred):
+    residual = y_true - y_pred
+    rmse = float(np.sqrt(np.mean(residual ** 2)))
+    total = float(np.sum((y_true - y_true.mean()) ** 2))
+    return {
+        "rmse": round(rmse, 4),
+        "mae": round(float(np.mean(np.abs(residual))), 4),
+        "r2": round(1.0 - float(np.sum(residual ** 2)) / total, 6) if total else None,
+    }
+
+
+def load_holdout(csv_path, preprocessor):
+    """(X, y) from a labelled CSV in either the API's or the notebook's column names"""
+    df = pd.read_csv(csv_path).rename(columns=COLUMN_ALIASES)
+    df = df.dropna(subset=[TARGET])
+    columns = list(getattr(preprocessor, 'feature_names_in_', [c for c in df.columns if c != TARGET]))
+    X = preprocessor.transform(df[columns])
+    if hasattr(X, 'toarray'):
+        X = X.toarray()
+    return np.asarray(X, dtype=np.float64), df[TARGET].to_numpy(dtype=np.float64)
+
+
+def choose_pruning(flat, X, y, rmse_budget, min_trees=1):
+    """Smallest (n_trees, max_depth) whose holdout RMSE is within ``rmse_budget`` of the full model.
+
+    Per-tree predictions are computed once per depth, so every tree count is
+    scored from a cumulative sum instead of a separate traversal.
+    """
+    full_rmse = regression_scores(y, flat.predict(X))["rmse"]
+    limit = full_rmse * (1.0 + rmse_budget)
+    depths = node_depths(flat)
+    roots = np.asarray(flat.roots, dtype=np.intp)
+    tree_sizes = np.diff(np.append(roots, flat.n_nodes))
+    tree_of_node = np.repeat(np.arange(flat.n_trees), tree_sizes)
+
+    depth_options = [None] if flat.aggregate != 'mean' else [None] + list(range(flat.max_depth - 1, 0, -1))
+    best = (flat.n_nodes, flat.n_trees, None)
+    for max_depth in depth_options:
+        candidate = flat if max_depth is None else prune(flat, max_depth=max_depth)
+        per_tree = candidate.tree_predictions(X)
+        cumulative = np.cumsum(per_tree, axis=1)
+        counts = np.arange(1, flat.n_trees + 1)
+        if flat.aggregate == 'mean':
+            predictions = cumulative / counts
+        else:
+            predictions = cumulative + flat.base_score
+        rmse = np.sqrt(np.mean((predictions - y[:, None]) ** 2, axis=0))
+        ok = np.flatnonzero((rmse <= limit) & (counts >= min_trees))
+        if ok.size == 0:
+            # Shallower trees will not do better
+            break
+        n_trees = int(ok[0]) + 1
+        kept = tree_of_node < n_trees
+        if max_depth is not None:
+            kept &= depths <= max_depth
+        n_nodes = int(kept.sum())
+        if n_nodes < best[0]:
+            best = (n_nodes, n_trees, max_depth)
+    return best[1], best[2]
+
+
+def _measure_load(load_fn, path, repeats=3):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        load_fn(path)
+        timings.append(time.perf_counter() - started)
+    return round(min(timings), 4)
+
+
+def compact_model(model_path, output_path, preprocessor_path=None, holdout_path=None,
+                  n_trees=None, max_depth=None, rmse_budget=None):
+    """Write a compact artifact for ``model_path`` and return a comparison report.
+
+    With a holdout set and ``rmse_budget``, the tree count and depth are chosen
+    automatically unless given explicitly.
+    """
+    model = joblib.load(model_path)
+    flat = compile_model(model)
+    if flat is None:
+        raise ValueError(f"{type(model).__name__} from {model_path} cannot be flattened")
+
+    X = y = None
+    if holdout_path:
+        if not preprocessor_path:
+            raise ValueError("A holdout set needs the preprocessor to build features")
+        X, y = load_holdout(holdout_path, joblib.load(preprocessor_path))
+        if rmse_budget is not None and n_trees is None and max_depth is None:
+            n_trees, max_depth = choose_pruning(flat, X, y, rmse_budget)
+            logger.info(f"Within a {rmse_budget:.1%} RMSE budget: {n_trees} trees, "
+                        f"max depth {max_depth or flat.max_depth}")
+
+    pruned = bool(n_trees or max_depth)
+    compact = prune(flat, n_trees, max_depth) if pruned else flat
+    X_check = X if X is not None else probe_matrix(flat.n_features)
+    reference = np.asarray(model.predict(X_check), dtype=np.float64).ravel()
+    check = make_check(X_check, compact.predict(X_check) if pruned else reference, pruned, y)
+    size = save_compact(compact, output_path, info={
+        "source_model": os.path.basename(model_path),
+        "n_trees": n_trees, "max_depth": max_depth, "rmse_budget": rmse_budget}, check=check)
+    loaded = load_compact(output_path)
+
+    report = {
+        "original": {
+            "path": model_path,
+            "bytes": os.path.getsize(model_path),
+            "load_seconds": _measure_load(joblib.load, model_path),
+            "trees": flat.n_trees,
+            "nodes": flat.n_nodes,
+            "max_depth": flat.max_depth,
+        },
+        "compact": {
+            "path": output_path,
+            "bytes": size,
+            "load_seconds": _measure_load(load_compact, output_path),
+            "trees": loaded.n_trees,
+            "nodes": loaded.n_nodes,
+            "max_depth": loaded.max_depth,
+            "max_abs_diff": round(float(np.max(np.abs(loaded.predict(X_check) - reference))), 6),
+        },
+    }
+    if y is not None:
+        report["original"]["holdout"] = regression_scores(y, reference)
+        report["compact"]["holdout"] = regression_scores(y, loaded.predict(X))
+        report["holdout_rows"] = len(y)
+    report["size_ratio"] = round(size / report["original"]["bytes"], 4)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shrink a fitted tree ensemble into a compact serving artifact")
+    parser.add_argument('model_path', help="Pickled RandomForestRegressor/XGBRegressor")
+    parser.add_argument('output_path', nargs='?', default=None,
+                        help="Compact artifact (default: <model>.compact.npz)")
+    parser.add_argument('--preprocessor', default='superkart_preprocessor.pkl')
+    parser.add_argument('--holdout', default=None, help="Labelled CSV to report (and budget) accuracy on")
+    parser.add_argument('--max-trees', type=int, default=None, help="Keep only the first N trees")
+    parser.add_argument('--max-depth', type=int, default=None, help="Cut trees off at this depth")
+    parser.add_argument('--rmse-budget', type=float, default=None,
+                        help=f"Pick trees/depth automatically within this relative holdout RMSE "
+                             f"increase, e.g. {DEFAULT_RMSE_BUDGET}")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.rmse_budget is not None and not args.holdout:
+        parser.error("--rmse-budget needs --holdout")
+    output_path = args.output_path or compact_path_for(args.model_path)
+    report = compact_model(args.model_path, output_path, args.preprocessor if args.holdout else None,
+                           args.holdout, args.max_trees, args.max_depth, args.rmse_budget)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Name under which the model managed by model_versions (MODEL_PATH/MODEL_DIR) is served
+PRODUCTION = 'production'
+
+metrics.REGISTRY.describe('superkart_model_predict_seconds', 'histogram',
+                          "Scoring time per served or shadowed model", metrics.LATENCY_BUCKETS)
+metrics.REGISTRY.describe('superkart_shadow_abs_delta', 'histogram',
+                          "Absolute difference between shadow and served predictions",
+                          [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500])
+metrics.REGISTRY.describe('superkart_registry_evictions_total', 'counter',
+                          "Registry models evicted to stay within the memory budget")
+metrics.REGISTRY.describe('superkart_registry_loaded_bytes', 'gauge',
+                          "Estimated memory of the registry models loaded in this process")
+
+
+def estimate_bytes(version):
+    """Rough in-memory size of a loaded ModelVersion's model"""
+    flat = version.flat_model
+    if version.model is flat and flat is not None:
+        return sum(getattr(flat, name).nbytes for name in
+                   ('feature', 'threshold', 'left', 'right', 'value', 'default_left', 'is_leaf', 'children'))
+    total = 0
+    for estimator in getattr(version.model, 'estimators_', []):
+        state = estimator.tree_.__getstate__()
+        total += state['nodes'].nbytes + state['values'].nbytes
+    if hasattr(version.model, 'get_booster'):
+        total += len(version.model.get_booster().save_raw())
+    if flat is not None:
+        total += sum(getattr(flat, name).nbytes for name in ('feature', 'threshold', 'left', 'right', 'value'))
+    return total
+
+
+class ShadowStats:
+    """Running comparison of one shadow model against the served predictions"""
+
+    def __init__(self):
+        self.count = 0
+        self.abs_delta_sum = 0.0
+        self.rel_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, served, shadow):
+        delta = abs(shadow - served)
+        with self._lock:
+            self.count += 1
+            self.abs_delta_sum += delta
+            self.rel_delta_sum += delta / abs(served) if served else 0.0
+            self.max_abs_delta = max(self.max_abs_delta, delta)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "compared": self.count,
+                "errors": self.errors,
+                "mean_abs_delta": round(self.abs_delta_sum / self.count, 4) if self.count else None,
+                "mean_rel_delta": round(self.rel_delta_sum / self.count, 6) if self.count else None,
+                "max_abs_delta": round(self.max_abs_delta, 4),
+            }
+
+
+class ModelRegistry:
+    """Named models served beside production, loaded on first use and evicted LRU.
+
+    ``config`` is the parsed registry file::
+
+        {"models": {"xgb": {"model_path": "models/xgb/superkart_model.pkl"}},
+         "routes": [{"match": {"Store_Type": "Grocery Store"}, "model": "grocery"}],
+         "split": {"xgb": 0.1},
+         "shadow": {"xgb": 1.0}}
+
+    A request is served by an explicitly requested model, else by the first
+    route whose ``match`` fields equal the record's, else by a traffic split
+    (sticky per record), else by production. Shadow models score a sampled
+    copy of the request on a background thread after the response is built.
+    """
+
+    def __init__(self, config, load_fn, memory_budget_bytes, shadow_workers=2, shadow_max_pending=1000):
+        self.models = config.get('models', {})
+        self.routes = config.get('routes', [])
+        self.split = config.get('split', {})
+        shadow = config.get('shadow', {})
+        self.shadow = {name: 1.0 for name in shadow} if isinstance(shadow, list) else dict(shadow)
+        for name in [r['model'] for r in self.routes] + list(self.split) + list(self.shadow):
+            if name != PRODUCTION and name not in self.models:
+                raise ValueError(f"Model registry refers to undefined model {name!r}")
+        if sum(self.split.values()) > 1.0:
+            raise ValueError("Model registry split fractions add up to more than 1")
+
+        self.load_fn = load_fn
+        self.memory_budget_bytes = memory_budget_bytes
+        self.shadow_workers = shadow_workers
+        self.shadow_max_pending = shadow_max_pending
+        self._loaded = OrderedDict()
+        self._load_locks = {name: threading.Lock() for name in self.models}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+        self.requests = {}
+        self.shadow_stats = {name: ShadowStats() for name in self.shadow}
+        self.shadow_dropped = 0
+        self._shadow_pending = 0
+        self._shadow_pool = None
+        self._shadow_pid = None
+
+    # --- loading -------------------------------------------------------------
+
+    def get(self, name):
+        """Loaded ModelVersion for ``name``, loading (and evicting others) if needed"""
+        if name not in self.models:
+            raise LookupError(f"Unknown model {name!r}; available: {[PRODUCTION] + list(self.models)}")
+        with self._lock:
+            entry = self._loaded.get(name)
+            if entry is not None:
+                self._loaded.move_to_end(name)
+                return entry[0]
+        with self._load_locks[name]:
+            # Another thread may have loaded it while we waited
+            with self._lock:
+                entry = self._loaded.get(name)
+            if entry is not None:
+                return entry[0]
+            started = time.perf_counter()
+            version = self.load_fn(name, self.models[name])
+            size = estimate_bytes(version)
+            with self._lock:
+                self._loaded[name] = (version, size)
+                self.loads += 1
+                self._evict(keep=name)
+            logger.info(f"Registry model {name} loaded in {time.perf_counter() - started:.2f}s "
+                        f"(~{size / 1e6:.1f} MB)")
+            return version
+
+    def _evict(self, keep):
+        total = sum(size for _, size in self._loaded.values())
+        for name in list(self._loaded):
+            if total <= self.memory_budget_bytes:
+                break
+            if name == keep:
+                continue
+            # In-flight requests keep their reference; the memory goes once they finish
+            _, size = self._loaded.pop(name)
+            total -= size
+            self.evictions += 1
+            metrics.REGISTRY.inc('superkart_registry_evictions_total', model=name)
+            logger.info(f"Evicted registry model {name} to stay within the memory budget")
+        metrics.REGISTRY.set_gauge('superkart_registry_loaded_bytes', total, pid=str(os.getpid()))
+
+    # --- routing -------------------------------------------------------------
+
+    def select(self, record=None, requested=None):
+        """Name of the model that serves a request"""
+        if requested:
+            if requested != PRODUCTION and requested not in self.models:
+                raise LookupError(f"Unknown model {requested!r}; available: {[PRODUCTION] + list(self.models)}")
+            return requested
+        if isinstance(record, dict):
+            for route in self.routes:
+                if all(str(record.get(k)) == str(v) for k, v in route['match'].items()):
+                    return route['model']
+            if self.split:
+                # Hash the record so the same input always lands on the same model
+                key = json.dumps(record, sort_keys=True, default=str).encode('utf-8')
+                point = (zlib.crc32(key) & 0xffffffff) / 2 ** 32
+                for name, fraction in self.split.items():
+                    if point < fraction:
+                        return name
+                    point -= fraction
+        return PRODUCTION
+
+    def count_request(self, name, seconds):
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+        metrics.REGISTRY.observe('superkart_model_predict_seconds', seconds, model=name, role='served')
+
+    # --- shadow scoring ------------------------------------------------------
+
+    def _pool(self):
+        pid = os.getpid()
+        if self._shadow_pid != pid:
+            # Threads do not survive fork; each worker starts its own pool
+            self._shadow_pool = ThreadPoolExecutor(max_workers=self.shadow_workers,
+                                                   thread_name_prefix='shadow')
+            self._shadow_pid = pid
+            self._shadow_pending = 0
+        return self._shadow_pool
+
+    def shadow_score(self, served_name, record, served_prediction, score_fn):
+        """Queue shadow scoring of ``record``; never blocks the caller"""
+        for name, rate in self.shadow.items():
+            if name == served_name or (rate < 1.0 and random.random() >= rate):
+                continue
+            with self._lock:
+                if self._shadow_pending >= self.shadow_max_pending:
+                    self.shadow_dropped += 1
+                    continue
+                self._shadow_pending += 1
+            self._pool().submit(self._run_shadow, name, record, served_prediction, score_fn)
+
+    def _run_shadow(self, name, record, served_prediction, score_fn):
+        stats = self.shadow_stats[name]
+        try:
+            version = self.get(name) if name != PRODUCTION else None
+            started = time.perf_counter()
+            shadow_prediction = float(score_fn(version, record))
+            metrics.REGISTRY.observe('superkart_model_predict_seconds', time.perf_counter() - started,
+                                     model=name, role='shadow')
+            stats.record(served_prediction, shadow_prediction)
+            metrics.REGISTRY.observe('superkart_shadow_abs_delta',
+                                     abs(shadow_prediction - served_prediction), model=name)
+        except Exception as e:
+            stats.record_error()
+            logger.warning(f"Shadow scoring with {name} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._shadow_pending -= 1
+
+    def stats(self):
+        with self._lock:
+            loaded = {name: round(size / 1e6, 2) for name, (_, size) in self._loaded.items()}
+            requests = dict(self.requests)
+        return {
+            "models": [PRODUCTION] + list(self.models),
+            "loaded_mb": loaded,
+            "memory_budget_mb": round(self.memory_budget_bytes / 1e6, 2),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "requests": requests,
+            "routes": self.routes,
+            "split": self.split,
+            "shadow": {name: stats.snapshot() for name, stats in self.shadow_stats.items()},
+            "shadow_dropped": self.shadow_dropped,
+        }
+
+
+def registry_from_env(load_fn):
+    """ModelRegistry from the JSON file named by MODEL_REGISTRY, or None when unset"""
+    path = os.environ.get('MODEL_REGISTRY')
+    if not path:
+        return None
+    with open(path) as f:
+        config = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for spec in config.get('models', {}).values():
+        # Relative paths are relative to the registry file
+        for key in ('model_path', 'preprocessor_path'):
+            if spec.get(key) and not os.path.isabs(spec[key]):
+                spec[key] = os.path.join(base_dir, spec[key])
+    budget_mb = float(os.environ.get('MODEL_REGISTRY_MEMORY_MB', config.get('memory_budget_mb', 1024)))
+    registry = ModelRegistry(config, load_fn, budget_mb * 1e6,
+                             shadow_workers=int(os.environ.get('SHADOW_WORKERS', 2)))
+    logger.info(f"Model registry: {[PRODUCTION] + list(registry.models)} "
+                f"within {budget_mb:.0f} MB")
+    return registry
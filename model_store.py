@@ -0,0 +1,192 @@
+import json
+import logging
+import os
+import sys
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are not serialized across processes
+    fcntl = None
+
+import numpy as np
+
+from model_compact import (
+    CHECK_ROWS, check_arrays, check_from_arrays, compact_source, load_compact, make_check, read_check,
+)
+from startup import lazy_import
+from tree_inference import ARRAY_FIELDS, FlatForest, compile_model, probe_matrix
+
+joblib = lazy_import('joblib')
+
+logger = logging.getLogger(__name__)
+
+# A bundle is a directory with one .npy file per FlatForest node array plus a
+# manifest. Workers map the arrays read-only, so every process on the host
+# shares one physical copy through the page cache.
+MANIFEST_NAME = 'manifest.json'
+STORE_FORMAT_VERSION = 1
+
+
+@contextmanager
+def _build_lock(store_dir):
+    """Serialize bundle builds between processes (e.g. gunicorn workers)"""
+    if fcntl is None:
+        yield
+        return
+    with open(store_dir.rstrip('/\\') + '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def store_dir_for(model_path):
+    """Default bundle directory for ``model_path``: <stem>_store beside it"""
+    return os.path.splitext(model_path)[0] + '_store'
+
+
+def _source_signature(model_path):
+    stat = os.stat(model_path)
+    return {"size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def save_flat_model(flat, store_dir, source_path=None, check=None):
+    """Write ``flat`` (and optional check rows, see model_compact.make_check) to ``store_dir``"""
+    os.makedirs(store_dir, exist_ok=True)
+    manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+    if os.path.exists(manifest_path):
+        # Invalidate the bundle while its arrays are being replaced
+        os.remove(manifest_path)
+    arrays = {name: getattr(flat, name) for name in ARRAY_FIELDS}
+    check_meta = None
+    if check is not None:
+        check_data, check_meta = check_arrays(check)
+        arrays.update(check_data)
+    for name in ('check_X', 'check_expected', 'check_y'):
+        # Check rows of the previous build must not be read with this one
+        if name not in arrays and os.path.exists(os.path.join(store_dir, f'{name}.npy')):
+            os.remove(os.path.join(store_dir, f'{name}.npy'))
+    for name, array in arrays.items():
+        # Replace rather than overwrite: other processes may still map the old file
+        path = os.path.join(store_dir, f'{name}.npy')
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(path + '.tmp', path)
+
+    manifest = {
+        "format_version": STORE_FORMAT_VERSION,
+        "model_type": flat.source,
+        "aggregate": flat.aggregate,
+        "base_score": flat.base_score,
+        "max_depth": flat.max_depth,
+        "n_features": flat.n_features,
+        "n_trees": flat.n_trees,
+        "n_nodes": flat.n_nodes,
+        "source": _source_signature(source_path) if source_path else None,
+        "check": check_meta,
+    }
+    # Write the manifest last so a half-written bundle is never considered valid
+    tmp_path = os.path.join(store_dir, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+    return manifest
+
+
+def read_manifest(store_dir):
+    """Return the bundle manifest, or None if there is no complete bundle"""
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != STORE_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def _source_path(model_path, use_compact=True):
+    """The compact artifact for ``model_path`` when there is a current one, else the pickle"""
+    return (compact_source(model_path) if use_compact else None) or model_path
+
+
+def is_fresh(store_dir, model_path, use_compact=True):
+    """True if the bundle in ``store_dir`` was built from ``model_path`` as it is now"""
+    manifest = read_manifest(store_dir)
+    if manifest is None:
+        return False
+    source_path = _source_path(model_path, use_compact)
+    if not os.path.exists(source_path):
+        # No pickle to compare against; trust the bundle
+        return True
+    return manifest.get("source") == _source_signature(source_path)
+
+
+def load_flat_model(store_dir, mmap_mode='r'):
+    """Open a bundle; with ``mmap_mode='r'`` the arrays are read-only page-cache maps"""
+    manifest = read_manifest(store_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No model store bundle in {store_dir}")
+
+    arrays = {name: np.load(os.path.join(store_dir, f'{name}.npy'), mmap_mode=mmap_mode,
+                            allow_pickle=False)
+              for name in ARRAY_FIELDS}
+    return FlatForest(
+        arrays['feature'], arrays['threshold'], arrays['left'], arrays['right'],
+        arrays['value'], arrays['default_left'], arrays['roots'],
+        manifest['max_depth'], aggregate=manifest['aggregate'],
+        base_score=manifest['base_score'], n_features=manifest['n_features'],
+        source=manifest['model_type'], is_leaf=arrays['is_leaf'], children=arrays['children'])
+
+
+def read_store_check(store_dir):
+    """The check rows saved with the bundle in ``store_dir``, or None"""
+    manifest = read_manifest(store_dir)
+    meta = manifest.get("check") if manifest else None
+    if meta is None:
+        return None
+    arrays = {name: np.load(os.path.join(store_dir, f'{name}.npy'), allow_pickle=False)
+              for name in ('check_X', 'check_expected', 'check_y')
+              if os.path.exists(os.path.join(store_dir, f'{name}.npy'))}
+    return check_from_arrays(arrays, meta)
+
+
+def build_store(model_path, store_dir, use_compact=True):
+    """Flatten ``model_path`` (or load its compact artifact) and save a bundle"""
+    source_path = _source_path(model_path, use_compact)
+    if source_path != model_path:
+        flat = load_compact(source_path)
+        check = read_check(source_path)
+    else:
+        model = joblib.load(model_path)
+        flat = compile_model(model)
+        if flat is None:
+            raise ValueError(f"{type(model).__name__} from {model_path} cannot be flattened")
+        # Record the pickle's own predictions, so servers can verify the bundle without it
+        X_check = probe_matrix(flat.n_features, n_rows=CHECK_ROWS)
+        check = make_check(X_check, model.predict(X_check), pruned=False)
+    manifest = save_flat_model(flat, store_dir, source_path=source_path, check=check)
+    logger.info(f"Model store written to {store_dir} ({manifest['n_trees']} trees, "
+                f"{manifest['n_nodes']} nodes)")
+    return manifest
+
+
+def load_or_build(model_path, store_dir, mmap_mode='r', use_compact=True):
+    """Map the bundle for ``model_path``, rebuilding it first if it is stale"""
+    with _build_lock(store_dir):
+        if not is_fresh(store_dir, model_path, use_compact):
+            build_store(model_path, store_dir, use_compact)
+        # Map under the lock too, so no other process rewrites the arrays halfway through
+        return load_flat_model(store_dir, mmap_mode=mmap_mode)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) != 3:
+        # <model.pkl> need not exist when <model>.compact.npz sits beside it
+        print("Usage: python model_store.py <model.pkl> <store_dir>")
+        sys.exit(2)
+    with _build_lock(sys.argv[2]):
+        build_store(sys.argv[1], sys.argv[2])
@@ -0,0 +1,331 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from drift_monitor import build_profile, profile_path_for
+from model_compact import regression_scores
+from startup import lazy_import
+from superkart_options import COLUMN_ALIASES, TARGET
+
+joblib = lazy_import('joblib')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# The features the API accepts, in the notebook's preprocessing order
+NUMERIC_FEATURES = ['Product_Weight', 'Product_Visibility', 'Product_MRP']
+CATEGORICAL_FEATURES = ['Product_Sugar_Content', 'Product_Type', 'Store_Size',
+                        'Store_Location_Type', 'Store_Type']
+
+# The notebook's hyperparameter grids; successive halving only fits every
+# candidate on a fraction of the rows and the best third on more
+PARAM_GRIDS = {
+    'random_forest': {
+        'n_estimators': [50, 100],
+        'max_depth': [10, 20],
+        'min_samples_split': [2, 5],
+        'min_samples_leaf': [1, 2],
+    },
+    'xgboost': {
+        'n_estimators': [50, 100],
+        'max_depth': [3, 6],
+        'learning_rate': [0.1, 0.2],
+        'subsample': [0.8, 1.0],
+    },
+}
+
+# Bump when prepare_data changes what it produces, to invalidate old caches
+PREPARED_FORMAT_VERSION = 2
+
+
+def metrics_path_for(model_path):
+    """Where the training manifest for ``model_path`` lives: <stem>.metrics.json beside it"""
+    return os.path.splitext(model_path)[0] + '.metrics.json'
+
+
+def read_metrics(model_path):
+    """Training manifest written next to ``model_path``, or None"""
+    try:
+        with open(metrics_path_for(model_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def file_sha1(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_training_frame(csv_path):
+    """Labelled rows in the API's column names, missing values filled as in the notebook"""
+    df = pd.read_csv(csv_path).rename(columns=COLUMN_ALIASES)
+    missing = [c for c in NUMERIC_FEATURES + CATEGORICAL_FEATURES + [TARGET] if c not in df.columns]
+    if missing:
+        raise ValueError(f"{csv_path} is missing columns: {missing}")
+    df = df.dropna(subset=[TARGET])
+    for column in NUMERIC_FEATURES:
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+        df[column] = df[column].fillna(df[column].median())
+    for column in CATEGORICAL_FEATURES:
+        if df[column].isna().any():
+            df[column] = df[column].fillna(df[column].mode()[0])
+        df[column] = df[column].astype(str)
+    return df
+
+
+def build_preprocessor():
+    """The notebook's ColumnTransformer: scaled numerics, one-hot categoricals"""
+    from sklearn.compose import make_column_transformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    return make_column_transformer(
+        (StandardScaler(), NUMERIC_FEATURES),
+        (OneHotEncoder(drop='first', sparse_output=False, handle_unknown='ignore'), CATEGORICAL_FEATURES),
+        remainder='passthrough'
+    )
+
+
+def prepare_data(csv_path, cache_dir=None, test_size=0.2, cv=3, random_state=42):
+    """Train/test split, fitted preprocessor, transformed matrices and CV folds.
+
+    The result is cached in ``cache_dir`` under a key made of the data's hash
+    and the split settings, so retraining on unchanged data skips straight to
+    the model search. Cached matrices are memory-mapped, which also lets the
+    parallel search workers share them.
+    """
+    from sklearn import __version__ as sklearn_version
+    from sklearn.model_selection import KFold, train_test_split
+
+    data_sha1 = file_sha1(csv_path)
+    key = hashlib.sha1(json.dumps([PREPARED_FORMAT_VERSION, data_sha1, test_size, cv, random_state,
+                                   NUMERIC_FEATURES, CATEGORICAL_FEATURES, sklearn_version]).encode('utf-8'))
+    cache_path = os.path.join(cache_dir, f'prepared-{key.hexdigest()[:16]}.joblib') if cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        prepared = joblib.load(cache_path, mmap_mode='r')
+        logger.info(f"Using cached preprocessing and folds from {cache_path}")
+        return dict(prepared, cache_hit=True)
+
+    started = time.perf_counter()
+    df = load_training_frame(csv_path)
+    X_train, X_test, y_train, y_test = train_test_split(
+        df[NUMERIC_FEATURES + CATEGORICAL_FEATURES], df[TARGET].to_numpy(dtype=np.float64),
+        test_size=test_size, random_state=random_state)
+    preprocessor = build_preprocessor()
+    X_train_processed = preprocessor.fit_transform(X_train)
+    X_test_processed = preprocessor.transform(X_test)
+    folds = [(train_idx, test_idx) for train_idx, test_idx in
+             KFold(n_splits=cv, shuffle=True, random_state=random_state).split(X_train_processed)]
+
+    prepared = {
+        "preprocessor": preprocessor,
+        "X_train": np.ascontiguousarray(X_train_processed, dtype=np.float64),
+        "X_test": np.ascontiguousarray(X_test_processed, dtype=np.float64),
+        "y_train": y_train,
+        "y_test": y_test,
+        "folds": folds,
+        # Raw-feature distributions the API's drift monitor compares production inputs with
+        "profile": build_profile(X_train, NUMERIC_FEATURES, CATEGORICAL_FEATURES),
+        "data": {"path": os.path.abspath(csv_path), "sha1": data_sha1, "rows": len(df),
+                 "train_rows": len(y_train), "test_rows": len(y_test)},
+    }
+    logger.info(f"Prepared {len(df)} rows into {X_train_processed.shape[1]} features "
+                f"in {time.perf_counter() - started:.2f}s")
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        joblib.dump(prepared, tmp_path)
+        os.replace(tmp_path, cache_path)
+    return dict(prepared, cache_hit=False)
+
+
+def candidate_estimators(random_state=42):
+    """Untrained estimator per model family; XGBoost is skipped when it is not installed"""
+    from sklearn.ensemble import RandomForestRegressor
+
+    # One thread per candidate fit: the search itself spreads fits over the cores
+    estimators = {'random_forest': RandomForestRegressor(random_state=random_state, n_jobs=1)}
+    try:
+        from xgboost import XGBRegressor
+    except ImportError:
+        logger.warning("xgboost is not installed; searching random forests only")
+    else:
+        estimators['xgboost'] = XGBRegressor(random_state=random_state, n_jobs=1)
+    return estimators
+
+
+def search_model(estimator, param_grid, X, y, folds, method='halving', n_jobs=-1, random_state=42):
+    """Fitted hyperparameter search over ``param_grid`` (without the final refit)"""
+    if method == 'halving':
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import HalvingGridSearchCV
+
+        search = HalvingGridSearchCV(estimator, param_grid, cv=folds, scoring='r2', factor=3,
+                                     refit=False, n_jobs=n_jobs, random_state=random_state)
+    else:
+        from sklearn.model_selection import GridSearchCV
+
+        search = GridSearchCV(estimator, param_grid, cv=folds, scoring='r2', refit=False, n_jobs=n_jobs)
+    return search.fit(X, y)
+
+
+def test_scores(y_true, y_pred, n_features):
+    """The notebook's test metrics: RMSE, MAE, R², adjusted R² and MAPE"""
+    scores = regression_scores(y_true, y_pred)
+    n = len(y_true)
+    if scores["r2"] is not None and n - n_features - 1 > 0:
+        scores["adj_r2"] = round(1.0 - (1.0 - scores["r2"]) * (n - 1) / (n - n_features - 1), 6)
+    nonzero = y_true != 0
+    scores["mape"] = round(float(np.mean(np.abs((y_true[nonzero] - y_pred[nonzero]) / y_true[nonzero]))), 6)
+    return scores
+
+
+def _dump_atomic(obj, path):
+    tmp_path = path + '.tmp'
+    joblib.dump(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_artifacts(output_dir, model, preprocessor, profile, manifest,
+                    model_filename='superkart_model.pkl', preprocessor_filename='superkart_preprocessor.pkl'):
+    """Write the model, preprocessor, its reference profile and the training manifest into ``output_dir``.
+
+    A new directory (e.g. the next MODEL_DIR version) is staged beside its
+    final name and renamed into place, so a watching server never sees half
+    of it. In an existing directory the files are replaced one by one, the
+    model last.
+    """
+    stage_dir = output_dir
+    if not os.path.isdir(output_dir):
+        stage_dir = output_dir.rstrip(os.sep) + '.tmp'
+        shutil.rmtree(stage_dir, ignore_errors=True)
+        os.makedirs(stage_dir)
+    model_path = os.path.join(stage_dir, model_filename)
+    preprocessor_path = os.path.join(stage_dir, preprocessor_filename)
+    with open(profile_path_for(preprocessor_path) + '.tmp', 'w') as f:
+        json.dump(profile, f)
+    os.replace(profile_path_for(preprocessor_path) + '.tmp', profile_path_for(preprocessor_path))
+    _dump_atomic(preprocessor, preprocessor_path)
+    with open(metrics_path_for(model_path) + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(metrics_path_for(model_path) + '.tmp', metrics_path_for(model_path))
+    _dump_atomic(model, model_path)
+    if stage_dir != output_dir:
+        os.replace(stage_dir, output_dir)
+    return os.path.join(output_dir, model_filename)
+
+
+def _library_versions():
+    import sklearn
+
+    versions = {"sklearn": sklearn.__version__, "numpy": np.__version__, "pandas": pd.__version__}
+    try:
+        import xgboost
+        versions["xgboost"] = xgboost.__version__
+    except ImportError:
+        pass
+    return versions
+
+
+def train(csv_path, output_dir='.', cache_dir='.training_cache', models=None, method='halving',
+          test_size=0.2, cv=3, n_jobs=-1, random_state=42):
+    """Search each model family, keep the best by CV R², write artifacts and return the manifest"""
+    from sklearn.base import clone
+
+    started = time.perf_counter()
+    prepared = prepare_data(csv_path, cache_dir, test_size, cv, random_state)
+    X_train, y_train = prepared["X_train"], prepared["y_train"]
+
+    estimators = candidate_estimators(random_state)
+    unknown = [name for name in (models or []) if name not in PARAM_GRIDS]
+    if unknown:
+        raise ValueError(f"Unknown model families {unknown}; choose from {list(PARAM_GRIDS)}")
+    names = [name for name in (models or PARAM_GRIDS) if name in estimators]
+    if not names:
+        raise ValueError("None of the requested model families can be trained here")
+
+    candidates = {}
+    for name in names:
+        search_started = time.perf_counter()
+        search = search_model(estimators[name], PARAM_GRIDS[name], X_train, y_train,
+                              prepared["folds"], method, n_jobs, random_state)
+        candidates[name] = {
+            "best_params": search.best_params_,
+            "cv_r2": round(float(search.best_score_), 6),
+            "candidates": len(search.cv_results_['params']),
+            "iterations": int(getattr(search, 'n_iterations_', 1)),
+            "seconds": round(time.perf_counter() - search_started, 2),
+        }
+        logger.info(f"{name}: CV R² {search.best_score_:.4f} with {search.best_params_} "
+                    f"({candidates[name]['seconds']}s)")
+
+    selected = max(candidates, key=lambda name: candidates[name]["cv_r2"])
+    fit_started = time.perf_counter()
+    # The final fit gets all the cores the candidates shared
+    model = clone(estimators[selected]).set_params(**candidates[selected]["best_params"], n_jobs=n_jobs)
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - fit_started
+    scores = test_scores(prepared["y_test"], np.asarray(model.predict(prepared["X_test"]), dtype=np.float64),
+                         X_train.shape[1])
+    logger.info(f"Selected {selected}; test RMSE {scores['rmse']}, R² {scores['r2']}")
+
+    manifest = {
+        "trained_at": datetime.now().isoformat(),
+        "model": selected,
+        "model_type": type(model).__name__,
+        "params": candidates[selected]["best_params"],
+        "cv_r2": candidates[selected]["cv_r2"],
+        "test": scores,
+        "candidates": candidates,
+        "search": {"method": method, "cv": cv, "scoring": "r2", "test_size": test_size,
+                   "random_state": random_state},
+        "data": prepared["data"],
+        "features": {"numeric": NUMERIC_FEATURES, "categorical": CATEGORICAL_FEATURES,
+                     "encoded": int(X_train.shape[1])},
+        "preprocessing_cached": prepared["cache_hit"],
+        "final_fit_seconds": round(fit_seconds, 2),
+        "training_seconds": round(time.perf_counter() - started, 2),
+        "versions": _library_versions(),
+    }
+    model_path = write_artifacts(output_dir, model, prepared["preprocessor"], prepared["profile"], manifest)
+    logger.info(f"Wrote {model_path} and its preprocessor, reference profile and metrics manifest")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the SuperKart sales model and preprocessor")
+    parser.add_argument('data_path', help="Labelled CSV (SuperKart.csv column names)")
+    parser.add_argument('output_dir', nargs='?', default='.',
+                        help="Where superkart_model.pkl, superkart_preprocessor.pkl and "
+                             "superkart_model.metrics.json go, e.g. a new MODEL_DIR version")
+    parser.add_argument('--cache-dir', default='.training_cache',
+                        help="Cache for the fitted preprocessing and CV folds ('' disables it)")
+    parser.add_argument('--models', nargs='+', choices=list(PARAM_GRIDS), default=None)
+    parser.add_argument('--search', choices=['halving', 'grid'], default='halving',
+                        help="Successive halving (default) or the notebook's full grid search")
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--cv', type=int, default=3)
+    parser.add_argument('--n-jobs', type=int, default=-1, help="Parallel candidate fits (-1: all cores)")
+    parser.add_argument('--random-state', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    manifest = train(args.data_path, args.output_dir, args.cache_dir or None, args.models, args.search,
+                     args.test_size, args.cv, args.n_jobs, args.random_state)
+    print(json.dumps(manifest, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,259 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from superkart_options import (
+    SUGAR_CONTENT_OPTIONS, PRODUCT_TYPE_OPTIONS, STORE_SIZE_OPTIONS,
+    STORE_LOCATION_TYPE_OPTIONS, STORE_TYPE_OPTIONS,
+    PRODUCT_WEIGHT_RANGE, PRODUCT_VISIBILITY_RANGE, PRODUCT_MRP_RANGE,
+)
+
+logger = logging.getLogger(__name__)
+
+# With MODEL_DIR set, every subdirectory holding the model file is a version;
+# the newest name wins unless PIN_FILE names another one
+PIN_FILE = 'CURRENT'
+
+
+class UnknownVersion(LookupError):
+    """The requested model version does not exist (as opposed to failing to load)"""
+
+
+class ModelVersion:
+    """One loaded model/preprocessor pair plus its fast paths and metadata"""
+
+    def __init__(self, version_id, model=None, preprocessor=None, flat_model=None,
+                 compiled_preprocessor=None, model_path=None, preprocessor_path=None):
+        self.version_id = version_id
+        self.model = model
+        self.preprocessor = preprocessor
+        self.flat_model = flat_model
+        self.compiled_preprocessor = compiled_preprocessor
+        self.model_path = model_path
+        self.preprocessor_path = preprocessor_path
+        self.loaded_at = datetime.now().isoformat()
+        self.model_store = None
+        self.compact_model = None
+        # Check rows recorded with a mapped/compact artifact (model_compact.make_check)
+        self.tree_check = None
+        self.load_seconds = None
+        self.smoke_test = None
+        self.training_metrics = None
+        self.reference_profile = None
+
+    @property
+    def complete(self):
+        return self.model is not None and self.preprocessor is not None
+
+    def info(self):
+        return {
+            "version": self.version_id,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "model_path": self.model_path,
+            "preprocessor_path": self.preprocessor_path,
+            "smoke_test": self.smoke_test,
+            "training": self.training_metrics,
+        }
+
+
+def file_version_id(*paths):
+    """Short token derived from the (mtime, size) of ``paths``"""
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f'{stat.st_mtime_ns}:{stat.st_size}')
+        except OSError:
+            parts.append('-')
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:12]
+
+
+def list_versions(model_dir, *model_filenames):
+    """Names of the version subdirectories of ``model_dir`` holding any of ``model_filenames``, oldest first"""
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(name for name in os.listdir(model_dir)
+                  if any(os.path.isfile(os.path.join(model_dir, name, filename))
+                         for filename in model_filenames))
+
+
+def read_pin(model_dir):
+    try:
+        with open(os.path.join(model_dir, PIN_FILE)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def write_pin(model_dir, version_id):
+    """Pin ``version_id`` so every worker watching ``model_dir`` serves it"""
+    path = os.path.join(model_dir, PIN_FILE)
+    with open(path + '.tmp', 'w') as f:
+        f.write(version_id)
+    os.replace(path + '.tmp', path)
+
+
+def clear_pin(model_dir):
+    try:
+        os.remove(os.path.join(model_dir, PIN_FILE))
+    except FileNotFoundError:
+        pass
+
+
+def smoke_test_records(n=32):
+    """Deterministic records that cycle through every dashboard category"""
+    records = []
+    for i in range(n):
+        t = (i % 8) / 7.0
+        records.append({
+            'Product_Weight': PRODUCT_WEIGHT_RANGE[0] + t * (20.0 - PRODUCT_WEIGHT_RANGE[0]),
+            'Product_Sugar_Content': SUGAR_CONTENT_OPTIONS[i % len(SUGAR_CONTENT_OPTIONS)],
+            'Product_Visibility': PRODUCT_VISIBILITY_RANGE[0] + t * 0.2,
+            'Product_Type': PRODUCT_TYPE_OPTIONS[i % len(PRODUCT_TYPE_OPTIONS)],
+            'Product_MRP': PRODUCT_MRP_RANGE[0] + t * (300.0 - PRODUCT_MRP_RANGE[0]),
+            'Store_Size': STORE_SIZE_OPTIONS[i % len(STORE_SIZE_OPTIONS)],
+            'Store_Location_Type': STORE_LOCATION_TYPE_OPTIONS[i % len(STORE_LOCATION_TYPE_OPTIONS)],
+            'Store_Type': STORE_TYPE_OPTIONS[i % len(STORE_TYPE_OPTIONS)],
+        })
+    return records
+
+
+def run_smoke_test(version, score_fn, reference_fn, records, rtol=1e-5, atol=1e-3):
+    """Score ``records`` through the serving path and the plain sklearn path.
+
+    Raises ValueError when predictions are missing, non-finite or the two
+    paths disagree. ``reference_fn`` returns None when there is no independent
+    model to compare with; the result then says ``verified: False``. Running
+    the records also warms the new version up.
+    """
+    started = time.perf_counter()
+    served = np.asarray(score_fn(version, records), dtype=np.float64).ravel()
+    if served.shape != (len(records),):
+        raise ValueError(f"Expected {len(records)} predictions, got shape {served.shape}")
+    if not np.all(np.isfinite(served)):
+        raise ValueError("Model returned non-finite predictions")
+    reference = reference_fn(version, records)
+    if reference is not None:
+        reference = np.asarray(reference, dtype=np.float64).ravel()
+        if not np.allclose(served, reference, rtol=rtol, atol=atol):
+            worst = float(np.max(np.abs(served - reference)))
+            raise ValueError(f"Serving path differs from sklearn by up to {worst:g}")
+    return {"records": len(records), "verified": reference is not None,
+            "seconds": round(time.perf_counter() - started, 4)}
+
+
+class VersionManager:
+    """Loads model versions off the request path and swaps them in atomically.
+
+    Requests read ``active`` once and use that object throughout, so a swap is
+    a single reference assignment and never waits for in-flight requests.
+    Reloads are serialized with a lock; the previous version stays in memory
+    for rollback().
+    """
+
+    def __init__(self, resolve_fn, load_fn, smoke_test_fn, activate_fn):
+        self.resolve_fn = resolve_fn
+        self.load_fn = load_fn
+        self.smoke_test_fn = smoke_test_fn
+        self.activate_fn = activate_fn
+        self.active = None
+        self.previous = None
+        self.last_error = None
+        self.reloads = 0
+        self.rollbacks = 0
+        # Versions the watcher must not (re)activate on its own: ones that
+        # failed to load and ones that were rolled back from
+        self._ignored = set()
+        self._reload_lock = threading.Lock()
+        self._watcher_pid = None
+
+    def _swap(self, version):
+        self.previous, self.active = self.active, version
+        self.activate_fn(version)
+
+    def reload(self, version_id=None, force=False):
+        """Load, smoke-test and activate a version; returns a status dict"""
+        with self._reload_lock:
+            target = self.resolve_fn(version_id)
+            if target is None:
+                raise UnknownVersion(f"Model version {version_id!r} not found")
+            if not force and self.active is not None and target[0] == self.active.version_id:
+                return {"status": "unchanged", "active": self.active.info()}
+
+            started = time.perf_counter()
+            try:
+                version = self.load_fn(*target)
+                if version.complete:
+                    version.smoke_test = self.smoke_test_fn(version)
+                elif self.active is not None:
+                    raise ValueError("Model or preprocessor file missing")
+            except Exception as e:
+                self.last_error = f"{target[0]}: {str(e)}"
+                self._ignored.add(target[0])
+                logger.error(f"Model version {target[0]} rejected: {str(e)}")
+                raise
+            version.load_seconds = time.perf_counter() - started
+
+            self._swap(version)
+            self.last_error = None
+            self._ignored.discard(version.version_id)
+            self.reloads += 1
+            logger.info(f"Activated model version {version.version_id} "
+                        f"(loaded in {version.load_seconds:.2f}s)")
+            return {"status": "activated", "active": version.info(),
+                    "previous": self.previous.info() if self.previous else None}
+
+    def rollback(self):
+        """Swap back to the previously active in-memory version"""
+        with self._reload_lock:
+            if self.previous is None:
+                raise LookupError("No previous model version in memory")
+            self._ignored.add(self.active.version_id)
+            self._swap(self.previous)
+            self.rollbacks += 1
+            logger.info(f"Rolled back to model version {self.active.version_id}")
+            return {"status": "rolled_back", "active": self.active.info(),
+                    "previous": self.previous.info()}
+
+    def check(self):
+        """Reload if the resolved on-disk version differs from the active one"""
+        target = self.resolve_fn(None)
+        if target is None or target[0] in self._ignored or \
+                (self.active is not None and target[0] == self.active.version_id):
+            return None
+        if self.previous is not None and target[0] == self.previous.version_id:
+            return self.rollback()
+        return self.reload()
+
+    def start_watcher(self, interval):
+        """Poll for new versions every ``interval`` seconds in a daemon thread"""
+        if interval <= 0 or self._watcher_pid == os.getpid():
+            return
+        # Threads do not survive fork; each worker runs its own watcher
+        self._watcher_pid = os.getpid()
+        threading.Thread(target=self._watch, args=(interval,), name='model-watcher',
+                         daemon=True).start()
+
+    def _watch(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.check()
+            except Exception as e:
+                # Keep serving the active version; the next change retries
+                logger.warning(f"Model watcher: {str(e)}")
+
+    def stats(self):
+        return {
+            "active": self.active.info() if self.active else None,
+            "previous": self.previous.info() if self.previous else None,
+            "reloads": self.reloads,
+            "rollbacks": self.rollbacks,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,444 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+# MicroStrategy object IDs are 32 upper-case hex digits
+OBJECT_ID = re.compile(r'\b[0-9A-F]{32}\b')
+
+# Property names in the generated documentation, mapped to our columns
+ID_KEYS = ('id', 'object id', 'objectid')
+NAME_KEYS = ('name', 'object name')
+TYPE_KEYS = ('type', 'object type', 'subtype')
+LOCATION_KEYS = ('location', 'path', 'folder')
+DESCRIPTION_KEYS = ('description',)
+EXPRESSION_KEYS = ('expression', 'definition', 'formula', 'metric formula', 'condition',
+                   'qualification', 'filter definition', 'attribute form expression', 'sql')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    objects INTEGER NOT NULL,
+    parsed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS objects (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    type TEXT,
+    location TEXT,
+    description TEXT,
+    expression TEXT,
+    properties TEXT,
+    source_path TEXT
+);
+CREATE INDEX IF NOT EXISTS objects_name ON objects (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS objects_type ON objects (type);
+CREATE INDEX IF NOT EXISTS objects_source ON objects (source_path);
+-- Every file documenting an object; objects.source_path is the one its definition came from
+CREATE TABLE IF NOT EXISTS object_files (
+    object_id TEXT NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY (object_id, path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS object_files_path ON object_files (path, object_id);
+CREATE TABLE IF NOT EXISTS dependencies (
+    object_id TEXT NOT NULL,
+    depends_on TEXT NOT NULL,
+    PRIMARY KEY (object_id, depends_on)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS dependencies_reverse ON dependencies (depends_on, object_id);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS objects_fts USING fts5(
+    id UNINDEXED, name, description, expression, tokenize = 'unicode61'
+);
+"""
+
+
+class _DocumentationParser(HTMLParser):
+    """Splits an HTML page into heading-delimited sections of key/value rows"""
+
+    HEADINGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections = []
+        self._new_section(None)
+        self._heading = None
+        self._cell = None
+        self._row = None
+        self._skip = 0
+
+    def _new_section(self, heading):
+        self.section = {"heading": heading, "pairs": [], "text": [], "links": []}
+        self.sections.append(self.section)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip += 1
+        elif tag in self.HEADINGS:
+            self._heading = []
+        elif tag == 'tr':
+            self._row = []
+        elif tag in ('td', 'th'):
+            self._cell = []
+        elif tag == 'br' and self._cell is not None:
+            self._cell.append('\n')
+        elif tag == 'a':
+            href = dict(attrs).get('href') or ''
+            self.section["links"].append(href)
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style'):
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.HEADINGS and self._heading is not None:
+            self._new_section(' '.join(''.join(self._heading).split()))
+            self._heading = None
+        elif tag in ('td', 'th') and self._cell is not None:
+            if self._row is not None:
+                self._row.append(''.join(self._cell).strip())
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            if len(self._row) == 2 and self._row[0]:
+                self.section["pairs"].append((self._row[0].rstrip(':').strip(), self._row[1]))
+            self._row = None
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._heading is not None:
+            self._heading.append(data)
+        if self._cell is not None:
+            self._cell.append(data)
+        self.section["text"].append(data)
+
+
+def _first(pairs, keys):
+    for key, value in pairs:
+        if key.lower() in keys and value:
+            return value
+    return None
+
+
+def parse_html(text, source_path=None):
+    """Object definitions found in one documentation page.
+
+    Each heading starts a section; a section that names an object ID (in an
+    "ID" row, or failing that anywhere in its text) becomes one object. Every
+    other object ID mentioned in the section, in text or links, is recorded as
+    a dependency. Expression rows keep their line breaks so CASE statements
+    stay readable.
+    """
+    parser = _DocumentationParser()
+    parser.feed(text)
+    parser.close()
+
+    objects = []
+    for section in parser.sections:
+        pairs = section["pairs"]
+        mentioned = OBJECT_ID.findall(' '.join(section["text"]) + ' ' + ' '.join(section["links"]).upper())
+        object_id = _first(pairs, ID_KEYS)
+        object_id = OBJECT_ID.search(object_id).group(0) if object_id and OBJECT_ID.search(object_id) else None
+        if object_id is None:
+            if not pairs or not mentioned:
+                continue
+            object_id = mentioned[0]
+        objects.append({
+            "id": object_id,
+            "name": _first(pairs, NAME_KEYS) or section["heading"],
+            "type": _first(pairs, TYPE_KEYS),
+            "location": _first(pairs, LOCATION_KEYS),
+            "description": _first(pairs, DESCRIPTION_KEYS),
+            "expression": _first(pairs, EXPRESSION_KEYS),
+            "properties": dict(pairs),
+            "dependencies": sorted(set(mentioned) - {object_id}),
+            "source_path": source_path,
+        })
+    return objects
+
+
+def _parse_file(path):
+    """Worker: (path, sha256, objects) for one HTML file"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    return path, digest, parse_html(raw.decode('utf-8', errors='replace'), path)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MetadataStore:
+    """SQLite store of MSTR object definitions with name, ID, text and dependency lookups"""
+
+    def __init__(self, path='mstr_metadata.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        with self.conn:
+            # Stores written before object_files existed know one file per object
+            if self.conn.execute("SELECT 1 FROM object_files LIMIT 1").fetchone() is None:
+                self.conn.execute("INSERT OR IGNORE INTO object_files SELECT id, source_path FROM objects "
+                                  "WHERE source_path IS NOT NULL")
+        try:
+            self.conn.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: search() falls back to LIKE
+            logger.warning("SQLite has no FTS5, full-text search will be slow")
+            self.has_fts = False
+
+    def close(self):
+        self.conn.close()
+
+    # --- indexing ------------------------------------------------------------
+
+    def _remove_file_objects(self, path):
+        """Unlink ``path`` and drop the objects no other file documents.
+
+        Returns the IDs still documented elsewhere, whose definition may have
+        to be re-read from one of those files (see ``_restore_definitions``).
+        """
+        ids = [row[0] for row in self.conn.execute("SELECT object_id FROM object_files WHERE path = ?", (path,))]
+        self.conn.execute("DELETE FROM object_files WHERE path = ?", (path,))
+        shared = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            marks = ','.join('?' * len(chunk))
+            shared.update(row[0] for row in self.conn.execute(
+                f"SELECT DISTINCT object_id FROM object_files WHERE object_id IN ({marks})", chunk))
+            orphans = [object_id for object_id in chunk if object_id not in shared]
+            if not orphans:
+                continue
+            marks = ','.join('?' * len(orphans))
+            self.conn.execute(f"DELETE FROM dependencies WHERE object_id IN ({marks})", orphans)
+            if self.has_fts:
+                self.conn.execute(f"DELETE FROM objects_fts WHERE id IN ({marks})", orphans)
+            self.conn.execute(f"DELETE FROM objects WHERE id IN ({marks})", orphans)
+        return shared
+
+    def _restore_definitions(self, ids):
+        """Re-read objects in ``ids`` whose definition came from a file that no longer documents them"""
+        stale = {}
+        for object_id in ids:
+            row = self.conn.execute(
+                "SELECT MIN(f.path) FROM objects o JOIN object_files f ON f.object_id = o.id "
+                "WHERE o.id = ? AND NOT EXISTS (SELECT 1 FROM object_files g "
+                "WHERE g.object_id = o.id AND g.path = o.source_path)", (object_id,)).fetchone()
+            if row[0] is not None:
+                stale.setdefault(row[0], set()).add(object_id)
+        for path, stale_ids in stale.items():
+            _, _, objects = _parse_file(path)
+            with self.conn:
+                self._store_objects([obj for obj in objects if obj["id"] in stale_ids])
+        return sum(len(stale_ids) for stale_ids in stale.values())
+
+    def _store_objects(self, objects):
+        for obj in objects:
+            # An ID documented in several files keeps the last definition indexed
+            self.conn.execute("DELETE FROM dependencies WHERE object_id = ?", (obj["id"],))
+            if self.has_fts:
+                self.conn.execute("DELETE FROM objects_fts WHERE id = ?", (obj["id"],))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO objects (id, name, type, location, description, expression, "
+                "properties, source_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (obj["id"], obj["name"], obj["type"], obj["location"], obj["description"],
+                 obj["expression"], json.dumps(obj["properties"]), obj["source_path"]))
+            self.conn.execute("INSERT OR IGNORE INTO object_files VALUES (?, ?)",
+                              (obj["id"], obj["source_path"]))
+            self.conn.executemany("INSERT OR IGNORE INTO dependencies VALUES (?, ?)",
+                                  [(obj["id"], dep) for dep in obj["dependencies"]])
+            if self.has_fts:
+                self.conn.execute("INSERT INTO objects_fts (id, name, description, expression) "
+                                  "VALUES (?, ?, ?, ?)",
+                                  (obj["id"], obj["name"], obj["description"], obj["expression"]))
+
+    def index_directory(self, html_dir, workers=None):
+        """Parse new or changed HTML files under ``html_dir`` and drop deleted ones.
+
+        Files whose size and mtime are unchanged are skipped without being read;
+        files that were touched but have the same SHA-256 are not re-parsed.
+        Returns counts of parsed, unchanged and removed files.
+        """
+        started = time.perf_counter()
+        known = {row['path']: row for row in self.conn.execute("SELECT * FROM files")}
+        present, candidates = set(), []
+        for root, _, names in os.walk(html_dir):
+            for name in names:
+                if not name.lower().endswith(('.htm', '.html')):
+                    continue
+                path = os.path.abspath(os.path.join(root, name))
+                present.add(path)
+                stat = os.stat(path)
+                row = known.get(path)
+                if row is not None and row['mtime_ns'] == stat.st_mtime_ns and row['size'] == stat.st_size:
+                    continue
+                candidates.append((path, stat))
+
+        to_parse, unchanged = [], len(present) - len(candidates)
+        for path, stat in candidates:
+            row = known.get(path)
+            if row is not None and row['size'] == stat.st_size and row['sha256'] == _sha256(path):
+                self.conn.execute("UPDATE files SET mtime_ns = ? WHERE path = ?", (stat.st_mtime_ns, path))
+                unchanged += 1
+            else:
+                to_parse.append(path)
+
+        removed = [path for path in known if path not in present]
+        shared = set()
+        with self.conn:
+            for path in removed:
+                shared |= self._remove_file_objects(path)
+                self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+        parsed = 0
+        if to_parse:
+            workers = workers or os.cpu_count() or 1
+            chunksize = max(1, len(to_parse) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for path, digest, objects in pool.map(_parse_file, to_parse, chunksize=chunksize):
+                    stat = os.stat(path)
+                    with self.conn:
+                        shared |= self._remove_file_objects(path)
+                        self._store_objects(objects)
+                        self.conn.execute(
+                            "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                            (path, digest, stat.st_mtime_ns, stat.st_size, len(objects),
+                             time.strftime('%Y-%m-%dT%H:%M:%S')))
+                    parsed += 1
+        restored = self._restore_definitions(shared)
+
+        summary = {"parsed": parsed, "unchanged": unchanged, "removed": len(removed), "restored": restored,
+                   "objects": self.conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0],
+                   "seconds": round(time.perf_counter() - started, 2)}
+        logger.info(f"Indexed {html_dir}: {summary}")
+        return summary
+
+    # --- lookups -------------------------------------------------------------
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        obj = dict(row)
+        obj["properties"] = json.loads(obj["properties"]) if obj["properties"] else {}
+        return obj
+
+    def get(self, object_id):
+        """Object with ``object_id``, or None"""
+        return self._to_dict(self.conn.execute("SELECT * FROM objects WHERE id = ?",
+                                               (object_id.upper(),)).fetchone())
+
+    def find_by_name(self, name, object_type=None):
+        """Objects named ``name`` (case-insensitive), optionally of one type"""
+        sql = "SELECT * FROM objects WHERE name = ? COLLATE NOCASE"
+        params = [name]
+        if object_type:
+            sql += " AND type = ? COLLATE NOCASE"
+            params.append(object_type)
+        return [self._to_dict(row) for row in self.conn.execute(sql, params)]
+
+    def search(self, query, limit=20):
+        """Full-text search over names, descriptions and expressions"""
+        if self.has_fts:
+            # Quote each term so MSTR names with punctuation are not FTS syntax
+            terms = ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+            rows = self.conn.execute(
+                "SELECT o.* FROM objects_fts f JOIN objects o ON o.id = f.id "
+                "WHERE objects_fts MATCH ? ORDER BY rank LIMIT ?", (terms, limit))
+        else:
+            pattern = f"%{query}%"
+            rows = self.conn.execute(
+                "SELECT * FROM objects WHERE name LIKE ? OR description LIKE ? OR expression LIKE ? LIMIT ?",
+                (pattern, pattern, pattern, limit))
+        return [self._to_dict(row) for row in rows]
+
+    def dependencies(self, object_id, recursive=False):
+        """IDs ``object_id`` uses (transitively with ``recursive``)"""
+        return self._walk(object_id, "SELECT depends_on FROM dependencies WHERE object_id = ?", recursive)
+
+    def dependents(self, object_id, recursive=False):
+        """IDs of objects that use ``object_id`` (transitively with ``recursive``)"""
+        return self._walk(object_id, "SELECT object_id FROM dependencies WHERE depends_on = ?", recursive)
+
+    def _walk(self, object_id, sql, recursive):
+        seen, frontier = set(), [object_id.upper()]
+        while frontier:
+            current = frontier.pop()
+            for (other,) in self.conn.execute(sql, (current,)):
+                if other not in seen:
+                    seen.add(other)
+                    if recursive:
+                        frontier.append(other)
+        seen.discard(object_id.upper())
+        return sorted(seen)
+
+    def resolve(self, name_or_id, object_type=None):
+        """Objects matching an ID or an exact name, e.g. for building report payloads"""
+        if OBJECT_ID.fullmatch(name_or_id.upper()):
+            obj = self.get(name_or_id)
+            return [obj] if obj else []
+        return self.find_by_name(name_or_id, object_type)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Index MicroStrategy HTML documentation and look objects up")
+    parser.add_argument('--db', default='mstr_metadata.db', help="SQLite metadata store")
+    commands = parser.add_subparsers(dest='command', required=True)
+    index = commands.add_parser('index', help="Parse new/changed HTML files")
+    index.add_argument('html_dir')
+    index.add_argument('--workers', type=int, default=None, help="Parser processes (default: all cores)")
+    lookup = commands.add_parser('lookup', help="Find objects by ID or exact name")
+    lookup.add_argument('name_or_id')
+    lookup.add_argument('--type', default=None)
+    search = commands.add_parser('search', help="Full-text search")
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=20)
+    deps = commands.add_parser('deps', help="Dependencies of an object")
+    deps.add_argument('object_id')
+    deps.add_argument('--reverse', action='store_true', help="Objects that depend on it instead")
+    deps.add_argument('--recursive', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    store = MetadataStore(args.db)
+    try:
+        if args.command == 'index':
+            result = store.index_directory(args.html_dir, workers=args.workers)
+        elif args.command == 'lookup':
+            result = store.resolve(args.name_or_id, args.type)
+        elif args.command == 'search':
+            result = store.search(args.query, args.limit)
+        elif args.reverse:
+            result = store.dependents(args.object_id, args.recursive)
+        else:
+            result = store.dependencies(args.object_id, args.recursive)
+    finally:
+        store.close()
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
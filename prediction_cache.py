@@ -0,0 +1,236 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Per-process LRU dict of key -> (prediction, expires_at)"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+
+    def set(self, key, value, expires_at):
+        """Store an entry; returns the number of entries evicted to make room"""
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        evicted = 0
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """Cache table in a local SQLite file shared by all workers on the host.
+
+    Put the file on a tmpfs such as /dev/shm to keep it in shared memory.
+    Entries are evicted oldest-written first once the table exceeds maxsize.
+    """
+
+    # Trim the table once per this many writes rather than on every write
+    TRIM_EVERY = 100
+
+    def __init__(self, maxsize, path):
+        self.maxsize = maxsize
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS prediction_cache ("
+            "key TEXT PRIMARY KEY, value REAL NOT NULL, expires_at REAL NOT NULL, "
+            "written_at REAL NOT NULL)")
+        self._conn().execute(
+            "CREATE INDEX IF NOT EXISTS prediction_cache_written ON prediction_cache (written_at)")
+
+    def _conn(self):
+        # Connections must not cross a fork (gunicorn preload), so key them by pid
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM prediction_cache WHERE key = ?", (key,)).fetchone()
+        return tuple(row) if row else None
+
+    def set(self, key, value, expires_at):
+        conn = self._conn()
+        conn.execute("INSERT OR REPLACE INTO prediction_cache VALUES (?, ?, ?, ?)",
+                     (key, value, expires_at, time.time()))
+        self._writes += 1
+        if self._writes % self.TRIM_EVERY:
+            return 0
+        excess = len(self) - self.maxsize
+        if excess <= 0:
+            return 0
+        conn.execute(
+            "DELETE FROM prediction_cache WHERE key IN ("
+            "SELECT key FROM prediction_cache ORDER BY written_at LIMIT ?)", (excess,))
+        return excess
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM prediction_cache WHERE key = ?", (key,))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM prediction_cache")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM prediction_cache").fetchone()[0]
+
+
+class PredictionCache:
+    """LRU/TTL cache of predictions keyed on a canonical hash of the features.
+
+    Numeric features can be rounded to ``precision`` decimals before hashing so
+    near-identical requests share an entry. ``version_fn`` returns a token for
+    the model currently served; it is polled at most every
+    ``version_check_interval`` seconds and the cache is flushed when it changes.
+    """
+
+    def __init__(self, feature_names, numeric_features, maxsize=10000, ttl=3600,
+                 precision=None, backend=None, version_fn=None, version_check_interval=1.0):
+        self.feature_names = list(feature_names)
+        self.numeric_features = set(numeric_features)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.precision = precision
+        self.backend = backend if backend is not None else MemoryBackend(maxsize)
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self._version = version_fn() if version_fn else None
+        self._version_checked_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _canonical_value(self, name, value):
+        if name in self.numeric_features:
+            value = float(value)
+            if self.precision is not None:
+                value = round(value, self.precision)
+            return repr(value)
+        return str(value)
+
+    def key(self, record):
+        """Canonical hash of the model features in ``record``"""
+        # The model version is part of the key so a worker that has not yet
+        # noticed a model change can never read or write a shared stale entry
+        values = [self._canonical_value(f, record[f]) for f in self.feature_names]
+        with self._lock:
+            self._check_version()
+            version = self._version
+        canonical = json.dumps([version, values], separators=(',', ':'), default=str)
+        return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+    def refresh_version(self):
+        """Pick up a model version change now instead of at the next poll"""
+        with self._lock:
+            self._check_version(force=True)
+
+    def _check_version(self, force=False):
+        if self.version_fn is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._version_checked_at < self.version_check_interval:
+            return
+        self._version_checked_at = now
+        version = self.version_fn()
+        if version != self._version:
+            logger.info("Model version changed, flushing prediction cache")
+            self._version = version
+            self.backend.clear()
+            self.invalidations += 1
+
+    def get(self, key):
+        """Cached prediction for ``key``, or None on a miss"""
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.time():
+                self.backend.delete(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self.evictions += self.backend.set(key, float(value), time.time() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "size": len(self.backend),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "precision": self.precision,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def cache_from_env(feature_names, numeric_features, version_fn=None):
+    """Build the prediction cache from PREDICTION_CACHE_* settings (None if disabled)"""
+    maxsize = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+    if maxsize <= 0:
+        return None
+    ttl = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+    precision = os.environ.get('PREDICTION_CACHE_PRECISION')
+    precision = int(precision) if precision not in (None, '') else None
+
+    backend_name = os.environ.get('PREDICTION_CACHE_BACKEND', 'memory')
+    if backend_name == 'sqlite':
+        path = os.environ.get('PREDICTION_CACHE_PATH', '/dev/shm/superkart_prediction_cache.db')
+        backend = SQLiteBackend(maxsize, path)
+    elif backend_name == 'memory':
+        backend = MemoryBackend(maxsize)
+    else:
+        raise ValueError(f"Unknown PREDICTION_CACHE_BACKEND: {backend_name}")
+
+    return PredictionCache(feature_names, numeric_features, maxsize=maxsize, ttl=ttl,
+                           precision=precision, backend=backend, version_fn=version_fn)
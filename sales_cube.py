@@ -0,0 +1,348 @@
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from startup import lazy_import
+from superkart_options import COLUMN_ALIASES, TARGET
+
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# The cube holds one row per combination of these dimensions with additive
+# measures (count, sums) plus a fixed-bin histogram of sales, so any roll-up
+# or slice is a sum over cube rows and never touches the raw data again.
+DIMENSIONS = ['Store_Type', 'Store_Size', 'Store_Location_Type', 'Product_Type',
+              'Product_Sugar_Content', 'MRP_Band']
+
+MRP_BAND_EDGES = [0, 50, 100, 150, 200, 250, 300]
+MRP_BAND_LABELS = ['0-50', '50-100', '100-150', '150-200', '200-250', '250-300', '300+']
+
+# Sales histogram used as a mergeable quantile sketch: SKETCH_BINS bins of
+# SKETCH_BIN_WIDTH, the last one also collecting everything above its start
+SKETCH_BIN_WIDTH = 50.0
+SKETCH_BINS = 200
+
+MEASURES = ['count', 'sales_sum', 'sales_sumsq', 'sales_min', 'sales_max', 'mrp_sum']
+METADATA_KEY = b'superkart_cube'
+FINGERPRINT_BYTES = 65536
+
+
+def mrp_band(mrp):
+    """Label of the MRP band for each value of ``mrp``"""
+    index = np.searchsorted(MRP_BAND_EDGES, np.asarray(mrp, dtype=np.float64), side='right') - 1
+    return np.asarray(MRP_BAND_LABELS, dtype=object)[np.clip(index, 0, len(MRP_BAND_LABELS) - 1)]
+
+
+def _group_codes(frame, columns):
+    """(group number per row, DataFrame of the distinct keys in group order)"""
+    grouper = frame.groupby(list(columns), sort=True)
+    return grouper.ngroup().to_numpy(), grouper.size().index.to_frame(index=False)
+
+
+def aggregate(df):
+    """Cube rows (one per dimension combination) for a frame of raw SuperKart rows"""
+    df = df.rename(columns=COLUMN_ALIASES)
+    sales = pd.to_numeric(df[TARGET], errors='coerce').to_numpy(dtype=np.float64)
+    mrp = pd.to_numeric(df['Product_MRP'], errors='coerce').to_numpy(dtype=np.float64)
+    keys = pd.DataFrame({d: df[d].astype(str) for d in DIMENSIONS if d != 'MRP_Band'})
+    keys['MRP_Band'] = mrp_band(mrp)
+    keep = ~np.isnan(sales) & ~np.isnan(mrp)
+    if not keep.all():
+        logger.warning(f"Skipping {int((~keep).sum())} rows without numeric sales/MRP")
+        keys, sales, mrp = keys[keep], sales[keep], mrp[keep]
+
+    codes, cube = _group_codes(keys, DIMENSIONS)
+    n_groups = len(cube)
+    cube['count'] = np.bincount(codes, minlength=n_groups)
+    cube['sales_sum'] = np.bincount(codes, weights=sales, minlength=n_groups)
+    cube['sales_sumsq'] = np.bincount(codes, weights=sales * sales, minlength=n_groups)
+    cube['sales_min'] = pd.Series(sales).groupby(codes).min().to_numpy()
+    cube['sales_max'] = pd.Series(sales).groupby(codes).max().to_numpy()
+    cube['mrp_sum'] = np.bincount(codes, weights=mrp, minlength=n_groups)
+
+    bins = np.clip((sales // SKETCH_BIN_WIDTH).astype(np.int64), 0, SKETCH_BINS - 1)
+    sketch = np.zeros((n_groups, SKETCH_BINS), dtype=np.int32)
+    np.add.at(sketch, (codes, bins), 1)
+    cube['sketch'] = list(sketch)
+    return cube
+
+
+def merge(*cubes):
+    """Combine cubes built from disjoint sets of rows"""
+    cubes = [c for c in cubes if c is not None and len(c)]
+    if not cubes:
+        return None
+    combined = pd.concat(cubes, ignore_index=True)
+    codes, merged = _group_codes(combined, DIMENSIONS)
+    grouped = combined[MEASURES].groupby(codes)
+    for column in ('count', 'sales_sum', 'sales_sumsq', 'mrp_sum'):
+        merged[column] = grouped[column].sum().to_numpy()
+    merged['sales_min'] = grouped['sales_min'].min().to_numpy()
+    merged['sales_max'] = grouped['sales_max'].max().to_numpy()
+    sketch = np.zeros((len(merged), SKETCH_BINS), dtype=np.int32)
+    np.add.at(sketch, codes, np.stack(combined['sketch'].to_numpy()))
+    merged['sketch'] = list(sketch)
+    return merged
+
+
+# --- storage ---------------------------------------------------------------
+
+def read_metadata(cube_path):
+    """Build metadata stored in the cube file, or None if there is no cube"""
+    if not os.path.exists(cube_path):
+        return None
+    import pyarrow.parquet as pq
+    metadata = pq.read_schema(cube_path).metadata or {}
+    if METADATA_KEY not in metadata:
+        return None
+    return json.loads(metadata[METADATA_KEY])
+
+
+def read_cube(cube_path):
+    import pyarrow.parquet as pq
+    cube = pq.read_table(cube_path).to_pandas()
+    cube['sketch'] = [np.asarray(s, dtype=np.int32) for s in cube['sketch']]
+    return cube
+
+
+def write_cube(cube, cube_path, metadata):
+    """Write ``cube`` as Parquet with ``metadata`` in the schema, atomically"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    table = pa.Table.from_pandas(cube, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(metadata).encode('utf-8')
+    table = table.replace_schema_metadata(schema_metadata)
+    pq.write_table(table, cube_path + '.tmp', compression='zstd')
+    os.replace(cube_path + '.tmp', cube_path)
+
+
+# --- incremental build -----------------------------------------------------
+
+class _ByteRange(io.RawIOBase):
+    """Read-only view of the next ``remaining`` bytes of an open binary file"""
+
+    def __init__(self, f, remaining):
+        self.f = f
+        self.remaining = remaining
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self.remaining)
+        if n <= 0:
+            return 0
+        data = self.f.read(n)
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def _complete_lines_end(path, size):
+    """Offset just past the last newline, so a row still being appended is left for later"""
+    with open(path, 'rb') as f:
+        position = size
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            block = f.read(position - start)
+            index = block.rfind(b'\n')
+            if index >= 0:
+                return start + index + 1
+            position = start
+    return 0
+
+
+def _fingerprint(path, length):
+    """Hash of the first and last FINGERPRINT_BYTES of the first ``length`` bytes"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        digest.update(f.read(min(length, FINGERPRINT_BYTES)))
+        f.seek(max(0, length - FINGERPRINT_BYTES))
+        digest.update(f.read(min(length, FINGERPRINT_BYTES)))
+    return digest.hexdigest()
+
+
+def update_cube(source_path, cube_path, chunk_size=100000, rebuild=False):
+    """Fold rows appended to ``source_path`` since the last run into the cube.
+
+    The cube remembers how many bytes of the CSV it has consumed plus a
+    fingerprint of the file head; if the file was rewritten rather than
+    appended to (or ``rebuild`` is set) the cube is rebuilt from scratch.
+    A last row without a newline is counted on a full build, or once the
+    file has not grown since the previous run. Returns the cube metadata.
+    """
+    size = os.path.getsize(source_path)
+    with open(source_path, 'rb') as f:
+        header_line = f.readline()
+    header = header_line.decode('utf-8-sig').strip().split(',')
+
+    metadata = None if rebuild else read_metadata(cube_path)
+    if metadata is not None and (
+            metadata.get('source') != os.path.abspath(source_path)
+            or metadata.get('header') != header
+            or metadata.get('bytes', 0) > size
+            or metadata.get('fingerprint') != _fingerprint(source_path, metadata['bytes'])):
+        logger.info("Source file was replaced, rebuilding the cube")
+        metadata = None
+
+    offset = metadata['bytes'] if metadata else len(header_line)
+    end = _complete_lines_end(source_path, size)
+    if end < size and (metadata is None or metadata.get('size') == size):
+        # The file does not end with a newline and is not being appended to
+        end = size
+    if metadata is not None and end <= offset:
+        if metadata.get('size') != size:
+            # Remember the size, so a last row without a newline is counted next time
+            metadata = dict(metadata, size=size)
+            write_cube(read_cube(cube_path), cube_path, metadata)
+        logger.info("No new rows")
+        return metadata
+
+    started = time.perf_counter()
+    cube = read_cube(cube_path) if metadata else None
+    new_rows = 0
+    if end > offset:
+        with open(source_path, 'rb') as f:
+            f.seek(offset)
+            reader = pd.read_csv(io.BufferedReader(_ByteRange(f, end - offset)), header=None,
+                                 names=header, chunksize=chunk_size)
+            for chunk in reader:
+                cube = merge(cube, aggregate(chunk))
+                new_rows += len(chunk)
+
+    metadata = {
+        "source": os.path.abspath(source_path),
+        "header": header,
+        "bytes": end,
+        "size": size,
+        "fingerprint": _fingerprint(source_path, end),
+        "rows": (metadata['rows'] if metadata else 0) + new_rows,
+        "cells": 0 if cube is None else len(cube),
+        "dimensions": DIMENSIONS,
+        "sketch_bin_width": SKETCH_BIN_WIDTH,
+        "sketch_bins": SKETCH_BINS,
+        "updated_at": datetime.now().isoformat(),
+    }
+    if cube is None:
+        # Header-only CSV: an empty cube with the right columns (the header has TARGET already)
+        cube = aggregate(pd.DataFrame(columns=header))
+    write_cube(cube, cube_path, metadata)
+    logger.info(f"Added {new_rows} rows in {time.perf_counter() - started:.2f}s; "
+                f"cube has {metadata['cells']} cells for {metadata['rows']} rows")
+    return metadata
+
+
+# --- querying --------------------------------------------------------------
+
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def load_cube(cube_path):
+    """Cube and metadata from ``cube_path``, re-read only when the file changes"""
+    stat = os.stat(cube_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _loaded_lock:
+        entry = _loaded.get(cube_path)
+        if entry is None or entry[0] != signature:
+            entry = (signature, read_cube(cube_path), read_metadata(cube_path))
+            _loaded[cube_path] = entry
+    return entry[1], entry[2]
+
+
+def sketch_quantiles(sketch, quantiles, low, high):
+    """Approximate quantiles from a sales histogram, clamped to the exact min/max"""
+    total = sketch.sum()
+    cumulative = np.cumsum(sketch)
+    values = []
+    for q in quantiles:
+        rank = q * total
+        index = int(np.searchsorted(cumulative, rank, side='left'))
+        index = min(index, SKETCH_BINS - 1)
+        before = cumulative[index - 1] if index else 0
+        in_bin = sketch[index]
+        fraction = (rank - before) / in_bin if in_bin else 0.0
+        value = (index + fraction) * SKETCH_BIN_WIDTH
+        values.append(float(min(max(value, low), high)))
+    return values
+
+
+def slice_cube(cube, by=(), filters=None, quantiles=(0.1, 0.25, 0.5, 0.75, 0.9)):
+    """Roll the cube up to the ``by`` dimensions after keeping rows matching ``filters``.
+
+    ``filters`` maps a dimension to a list of allowed values. Returns one dict
+    per group with count, mean/std/min/max of sales, mean MRP and quantiles.
+    """
+    unknown = [d for d in list(by) + list(filters or {}) if d not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimensions {unknown}; choose from {DIMENSIONS}")
+    mask = np.ones(len(cube), dtype=bool)
+    for dimension, allowed in (filters or {}).items():
+        mask &= cube[dimension].isin(allowed).to_numpy()
+    selected = cube[mask]
+    if selected.empty:
+        return []
+
+    if by:
+        codes, keys = _group_codes(selected, by)
+        groups = keys.to_dict('records')
+    else:
+        codes = np.zeros(len(selected), dtype=np.int64)
+        groups = [{}]
+    grouped = selected[MEASURES].groupby(codes)
+    sums = grouped[['count', 'sales_sum', 'sales_sumsq', 'mrp_sum']].sum()
+    lows = grouped['sales_min'].min()
+    highs = grouped['sales_max'].max()
+    sketches = np.zeros((len(groups), SKETCH_BINS), dtype=np.int64)
+    np.add.at(sketches, codes, np.stack(selected['sketch'].to_numpy()))
+
+    rows = []
+    for i, group in enumerate(groups):
+        count = int(sums['count'].iat[i])
+        mean = sums['sales_sum'].iat[i] / count
+        # Sample variance, matching pandas' std()
+        variance = max(sums['sales_sumsq'].iat[i] - count * mean * mean, 0.0) / max(count - 1, 1)
+        row = dict(group)
+        row.update({
+            "count": count,
+            "sales_total": round(float(sums['sales_sum'].iat[i]), 2),
+            "sales_mean": round(float(mean), 2),
+            "sales_std": round(float(np.sqrt(variance)), 2),
+            "sales_min": round(float(lows.iat[i]), 2),
+            "sales_max": round(float(highs.iat[i]), 2),
+            "mrp_mean": round(float(sums['mrp_sum'].iat[i] / count), 2),
+        })
+        for q, value in zip(quantiles, sketch_quantiles(sketches[i], quantiles, lows.iat[i], highs.iat[i])):
+            row[f"sales_p{int(round(q * 100))}"] = round(value, 2)
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update the SuperKart sales cube")
+    parser.add_argument('source', help="SuperKart CSV (rows may be appended between runs)")
+    parser.add_argument('cube', nargs='?', default='superkart_sales_cube.parquet', help="Cube Parquet file")
+    parser.add_argument('--rebuild', action='store_true', help="Ignore the existing cube")
+    parser.add_argument('--chunk-size', type=int, default=100000, help="CSV rows per chunk")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    metadata = update_cube(args.source, args.cube, chunk_size=args.chunk_size, rebuild=args.rebuild)
+    print(json.dumps({k: v for k, v in metadata.items() if k != 'header'}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Import time of this module; flask_app imports it first, so phases are
+# measured from (almost) the start of the application import
+IMPORT_STARTED = time.perf_counter()
+
+STARTING = 'starting'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def lazy_import(name):
+    """Module ``name``, imported for real on first attribute access; None if not installed.
+
+    Use as ``pd = lazy_import('pandas')`` instead of an import statement (which
+    would load the module straight away), so routes that never touch it never
+    pay for it.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_deferred(*names):
+    """Finish importing ``names`` now (e.g. before warm-up) instead of on the first request"""
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {str(e)}")
+
+
+class Startup:
+    """Phases, timings and readiness of one process's startup"""
+
+    def __init__(self):
+        self.created = time.perf_counter()
+        self.phases = {'imports': self.created - IMPORT_STARTED}
+        self.state = STARTING
+        self.error = None
+        self.ready_after = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    @property
+    def ready(self):
+        return self.state == READY
+
+    def run(self, steps, background=True):
+        """Run ``steps`` ((name, fn) pairs) once per process, on a daemon thread by default.
+
+        A step that raises or returns False marks startup as failed. Returns
+        the thread, or None when running in the foreground or already started.
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return None
+            self._pid = os.getpid()
+            # A forked worker retries a startup that failed in the master
+            self.state, self.error = STARTING, None
+            self._done.clear()
+        if not background:
+            self._run(steps)
+            return None
+        thread = threading.Thread(target=self._run, args=(steps,), name='startup', daemon=True)
+        thread.start()
+        return thread
+
+    def _run(self, steps):
+        try:
+            for name, fn in steps:
+                with self.phase(name):
+                    ok = fn()
+                if ok is False:
+                    raise RuntimeError(f"Startup step {name} failed")
+            self.state = READY
+        except Exception as e:
+            self.error = str(e)
+            self.state = FAILED
+            logger.error(f"Startup failed: {str(e)}")
+        finally:
+            self.ready_after = time.perf_counter() - IMPORT_STARTED
+            self._done.set()
+        logger.info(f"Startup {self.state} after {self.ready_after:.2f}s (pid {os.getpid()}): " +
+                    ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items()))
+
+    def wait(self, timeout=None):
+        """Block until startup finished; True when the process is ready"""
+        self._done.wait(timeout)
+        return self.ready
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "error": self.error,
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.perf_counter() - IMPORT_STARTED, 3),
+            "ready_after_seconds": round(self.ready_after, 3) if self.ready_after is not None else None,
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
@@ -0,0 +1,28 @@
+# Input choices offered by the dashboard; shared with tools that need
+# realistic SuperKart records (e.g. benchmark.py)
+SUGAR_CONTENT_OPTIONS = ["Low Fat", "Regular"]
+PRODUCT_TYPE_OPTIONS = [
+    "Dairy", "Soft Drinks", "Meat", "Fruits and Vegetables",
+    "Household", "Baking Goods", "Snack Foods", "Frozen Foods",
+    "Breakfast", "Health and Hygiene", "Hard Drinks", "Canned",
+    "Breads", "Starchy Foods", "Others", "Seafood"
+]
+STORE_SIZE_OPTIONS = ["Small", "Medium", "High"]
+STORE_LOCATION_TYPE_OPTIONS = ["Tier 1", "Tier 2", "Tier 3"]
+STORE_TYPE_OPTIONS = [
+    "Grocery Store", "Supermarket Type1", "Supermarket Type2", "Supermarket Type3"
+]
+
+# (min, max) of the numeric inputs
+PRODUCT_WEIGHT_RANGE = (0.1, 100.0)
+PRODUCT_VISIBILITY_RANGE = (0.0, 1.0)
+PRODUCT_MRP_RANGE = (1.0, 500.0)
+
+# Sales column of SuperKart.csv (the training target)
+TARGET = 'Product_Store_Sales_Total'
+
+# SuperKart.csv uses the notebook's column names; the API uses these
+COLUMN_ALIASES = {
+    'Store_Location_City_Type': 'Store_Location_Type',
+    'Product_Allocated_Area': 'Product_Visibility',
+}
@@ -0,0 +1,137 @@
+import os
+import shutil
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# The application is a set of top-level modules, not a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# flask_app reads its settings at import time, so point it at a scratch
+# MODEL_DIR before any test module imports it (directly or via bulk_score)
+WORK_DIR = tempfile.mkdtemp(prefix='superkart-tests-')
+os.environ.update({
+    'MODEL_DIR': os.path.join(WORK_DIR, 'models'),
+    'PREPROCESSOR_PATH': os.path.join(WORK_DIR, 'superkart_preprocessor.pkl'),
+    'SALES_CUBE_PATH': os.path.join(WORK_DIR, 'superkart_sales_cube.parquet'),
+    'ADMIN_TOKEN': 'test-admin-token',
+    'STARTUP_WARMUP': '0',
+    'DRIFT_SAMPLE_RATE': '1',
+})
+os.environ.pop('MODEL_STORE', None)
+os.environ.pop('MODEL_REGISTRY', None)
+
+from superkart_options import (  # noqa: E402
+    PRODUCT_TYPE_OPTIONS, STORE_LOCATION_TYPE_OPTIONS, STORE_SIZE_OPTIONS, STORE_TYPE_OPTIONS,
+    SUGAR_CONTENT_OPTIONS, TARGET,
+)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+def synthetic_frame(n, seed=0):
+    """SuperKart-shaped rows (API column names) with a learnable sales target"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'Product_Weight': rng.uniform(4.0, 22.0, n).round(2),
+        'Product_Sugar_Content': rng.choice(SUGAR_CONTENT_OPTIONS, n),
+        'Product_Visibility': rng.uniform(0.0, 0.3, n).round(3),
+        'Product_Type': rng.choice(PRODUCT_TYPE_OPTIONS, n),
+        'Product_MRP': rng.uniform(30.0, 270.0, n).round(2),
+        'Store_Size': rng.choice(STORE_SIZE_OPTIONS, n),
+        'Store_Location_Type': rng.choice(STORE_LOCATION_TYPE_OPTIONS, n),
+        'Store_Type': rng.choice(STORE_TYPE_OPTIONS, n),
+    })
+    store_effect = df['Store_Type'].map({name: 400.0 * i for i, name in enumerate(STORE_TYPE_OPTIONS)})
+    df[TARGET] = (df['Product_MRP'] * 14.0 + store_effect + df['Product_Weight'] * 20.0 +
+                  rng.normal(0.0, 50.0, n)).round(2)
+    return df
+
+
+def fit_artifacts(output_dir, n_estimators=12, seed=0):
+    """Fit the notebook preprocessor and a small forest; write them like model_training.py does"""
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+
+    import model_training
+
+    df = synthetic_frame(400, seed)
+    features = model_training.NUMERIC_FEATURES + model_training.CATEGORICAL_FEATURES
+    preprocessor = model_training.build_preprocessor()
+    X = preprocessor.fit_transform(df[features])
+    model = RandomForestRegressor(n_estimators=n_estimators, max_depth=8, random_state=seed)
+    model.fit(X, df[TARGET])
+
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = os.path.join(output_dir, 'superkart_model.pkl')
+    preprocessor_path = os.path.join(output_dir, 'superkart_preprocessor.pkl')
+    joblib.dump(model, model_path)
+    joblib.dump(preprocessor, preprocessor_path)
+    return SimpleNamespace(dir=output_dir, model_path=model_path, preprocessor_path=preprocessor_path,
+                           model=model, preprocessor=preprocessor, frame=df, X=X)
+
+
+@pytest.fixture(scope='session')
+def artifacts(tmp_path_factory):
+    return fit_artifacts(str(tmp_path_factory.mktemp('artifacts')))
+
+
+@pytest.fixture(scope='session')
+def serving(artifacts):
+    """flask_app serving version v1 of MODEL_DIR (the artifacts above)"""
+    model_dir = os.environ['MODEL_DIR']
+    os.makedirs(os.path.join(model_dir, 'v1'), exist_ok=True)
+    shutil.copy(artifacts.model_path, os.path.join(model_dir, 'v1', 'superkart_model.pkl'))
+    shutil.copy(artifacts.preprocessor_path, os.environ['PREPROCESSOR_PATH'])
+
+    import flask_app
+
+    flask_app.start(background=False)
+    assert flask_app.startup_state.ready, flask_app.startup_state.error
+    return flask_app
+
+
+@pytest.fixture
+def client(serving):
+    return serving.app.test_client()
+
+
+@pytest.fixture
+def records():
+    import model_versions
+
+    return model_versions.smoke_test_records(16)
+
+
+@pytest.fixture
+def make_frame():
+    return synthetic_frame
+
+
+@pytest.fixture
+def make_artifacts():
+    return fit_artifacts
+
+
+@pytest.fixture
+def second_version(serving, make_artifacts):
+    """Publish MODEL_DIR/v2 (a different forest); afterwards serve v1 again"""
+    model_dir = os.environ['MODEL_DIR']
+    version = make_artifacts(os.path.join(WORK_DIR, 'v2-build'), n_estimators=5, seed=11)
+    os.makedirs(os.path.join(model_dir, 'v2'))
+    shutil.copy(version.model_path, os.path.join(model_dir, 'v2', 'superkart_model.pkl'))
+    shutil.copy(version.preprocessor_path, os.path.join(model_dir, 'v2', 'superkart_preprocessor.pkl'))
+    yield version
+    shutil.rmtree(os.path.join(model_dir, 'v2'))
+    model_versions = sys.modules['model_versions']
+    model_versions.clear_pin(model_dir)
+    serving.versions.reload(force=True)
+    assert serving.active_version.version_id == 'v1'
@@ -0,0 +1,141 @@
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAVE_PATH = re.compile(r'^/api/model/reports/([0-9A-F]{32})/instances/save$')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        stub = self.server.stub
+        path = self.path.split('?')[0]
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length) or b'null')
+        stub.record(path)
+
+        if path == '/api/auth/login':
+            if payload != stub.user_info:
+                return self._reply(401, {"code": "ERR003", "message": "Invalid credentials"})
+            return self._reply(204, headers={'X-MSTR-AuthToken': stub.new_token()})
+        if self.headers.get('X-MSTR-AuthToken') not in stub.tokens:
+            return self._reply(401, {"code": "ERR009", "message": "Session expired"})
+        failure = stub.next_failure(path)
+        if failure is not None:
+            status, headers = failure
+            return self._reply(status, {"message": "Injected failure"}, headers)
+
+        if path == '/api/model/reports':
+            if not self.headers.get('X-MSTR-ProjectID'):
+                return self._reply(400, {"message": "Missing project"})
+            report_id, instance_id = stub.create(payload)
+            return self._reply(201, {"information": {"objectId": report_id}},
+                               {'X-MSTR-MS-Instance': instance_id})
+        match = SAVE_PATH.match(path)
+        if match:
+            if not stub.save(match.group(1), self.headers.get('X-MSTR-MS-Instance')):
+                return self._reply(404, {"message": "Unknown report instance"})
+            return self._reply(201, {})
+        return self._reply(404, {"message": "Not found"})
+
+
+class MstrStub:
+    """In-process stand-in for the three REST calls Report_Build.py makes.
+
+    Tokens can be expired on demand and failures (e.g. 429 with Retry-After)
+    queued per path, so retry and renewal paths are reproducible.
+    """
+
+    def __init__(self, user_info):
+        self.user_info = user_info
+        self.tokens = set()
+        self.logins = 0
+        self.instances = {}
+        self.created = []
+        self.saved = []
+        self.requests = []
+        self._failures = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.stub = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def record(self, path):
+        with self._lock:
+            self.requests.append((time.monotonic(), path))
+
+    def requests_to(self, path):
+        return [at for at, requested in self.requests if requested == path]
+
+    def new_token(self):
+        with self._lock:
+            token = uuid.uuid4().hex
+            self.tokens.add(token)
+            self.logins += 1
+            return token
+
+    def expire_tokens(self):
+        with self._lock:
+            self.tokens.clear()
+
+    def fail_next(self, path_pattern, status, headers=None, after=0):
+        """Answer a request whose path matches ``path_pattern`` with ``status``,
+        letting the first ``after`` matching requests through"""
+        with self._lock:
+            self._failures.append([re.compile(path_pattern), status, headers or {}, after])
+
+    def next_failure(self, path):
+        with self._lock:
+            for i, failure in enumerate(self._failures):
+                pattern, status, headers, after = failure
+                if not pattern.search(path):
+                    continue
+                if after:
+                    failure[3] -= 1
+                    continue
+                del self._failures[i]
+                return status, headers
+        return None
+
+    def create(self, payload):
+        with self._lock:
+            report_id = uuid.uuid4().hex.upper()
+            instance_id = uuid.uuid4().hex.upper()
+            self.instances[report_id] = instance_id
+            self.created.append((report_id, payload))
+            return report_id, instance_id
+
+    def save(self, report_id, instance_id):
+        with self._lock:
+            if self.instances.get(report_id) != instance_id:
+                return False
+            self.saved.append(report_id)
+            return True
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+import api_client
+from api_client import APIError, SuperKartClient
+
+
+def serve(app):
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+@pytest.fixture
+def start_server():
+    servers = []
+
+    def start(app):
+        server, url = serve(app)
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def single_record_backend(serving, calls):
+    """A backend from before /predict/batch: only /predict, answered by the real model"""
+    backend = Flask('single-record-backend')
+
+    @backend.route('/predict', methods=['POST'])
+    def predict():
+        calls.append(request.get_json())
+        response = serving.app.test_client().post('/predict', json=request.get_json())
+        return response.get_data(), response.status_code, {'Content-Type': response.content_type}
+
+    return backend
+
+
+def test_predict_many_uses_one_batch_round_trip(serving, records, start_server):
+    client = SuperKartClient(start_server(serving.app), retries=0)
+    try:
+        batch = client.predict_many(records)
+        assert client.predict_many([]) == []
+        singles = [client.predict(record)['prediction'] for record in records[:3]]
+    finally:
+        client.close()
+
+    assert len(batch) == len(records)
+    assert batch[:3] == pytest.approx(singles, abs=1e-3)
+
+
+def test_predict_many_falls_back_to_concurrent_single_calls(serving, records, start_server):
+    calls = []
+    client = SuperKartClient(start_server(single_record_backend(serving, calls)), retries=0, max_workers=4)
+    try:
+        predictions = client.predict_many(records)
+    finally:
+        client.close()
+
+    expected = serving.app.test_client().post('/predict/batch', json=records).get_json()['predictions']
+    assert len(calls) == len(records)
+    assert predictions == pytest.approx(expected, abs=1e-3)
+
+
+def test_other_batch_errors_are_not_retried_one_by_one(start_server):
+    backend = Flask('failing-backend')
+    calls = []
+
+    @backend.route('/predict/batch', methods=['POST'])
+    def predict_batch():
+        return jsonify({"error": "bad request"}), 400
+
+    @backend.route('/predict', methods=['POST'])
+    def predict():
+        calls.append(1)
+        return jsonify({"prediction": 1.0})
+
+    client = SuperKartClient(start_server(backend), retries=0)
+    with pytest.raises(APIError) as excinfo:
+        client.predict_many([{"Product_Weight": 1.0}])
+    client.close()
+    assert excinfo.value.status_code == 400 and not calls
+
+
+def test_metadata_is_cached_for_its_ttl(start_server, monkeypatch):
+    backend = Flask('metadata-backend')
+    hits = {'/model_info': 0, '/analytics/cube': 0}
+
+    @backend.route('/model_info')
+    def model_info():
+        hits['/model_info'] += 1
+        return jsonify({"version": hits['/model_info']})
+
+    @backend.route('/analytics/cube')
+    def cube():
+        hits['/analytics/cube'] += 1
+        return jsonify({"by": request.args.get('by')})
+
+    now = [1000.0]
+    monkeypatch.setattr(api_client.time, 'monotonic', lambda: now[0])
+    client = SuperKartClient(start_server(backend), retries=0, metadata_ttl=60)
+    try:
+        assert client.model_info() == client.model_info() == {"version": 1}
+        now[0] += 59
+        assert client.model_info() == {"version": 1}
+        now[0] += 2
+        assert client.model_info() == {"version": 2}
+        client.invalidate()
+        assert client.model_info() == {"version": 3}
+
+        # Different parameters are cached separately
+        assert client.sales_cube(['Store_Type']) == {"by": "Store_Type"}
+        assert client.sales_cube(['Store_Size']) == {"by": "Store_Size"}
+        assert client.sales_cube(['Store_Type']) == {"by": "Store_Type"}
+    finally:
+        client.close()
+    assert hits == {'/model_info': 3, '/analytics/cube': 2}
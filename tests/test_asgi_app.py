@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+import asgi_app
+
+
+def call(method, path, body=b'', query_string=b'', headers=()):
+    """(status, headers, body) of one request through the ASGI app"""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string,
+             'headers': [(b'content-type', b'application/json')] + list(headers)}
+    asyncio.run(asgi_app.app(scope, receive, send))
+    start = messages[0]
+    return start['status'], dict(start['headers']), b''.join(m.get('body', b'') for m in messages[1:])
+
+
+def test_predict_matches_flask(serving, client, records):
+    status, _, body = call('POST', '/predict', json.dumps(records[0]).encode())
+
+    expected = client.post('/predict', json=records[0]).get_json()['prediction']
+    assert status == 200
+    assert json.loads(body)['prediction'] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('method, path, query', [
+    ('POST', '/predict', b''),
+    ('POST', '/predict/batch', b''),
+    ('GET', '/drift', b''),
+    ('GET', '/analytics/cube', b'by=Store_Type'),
+])
+def test_full_pool_answers_429(serving, records, monkeypatch, method, path, query):
+    monkeypatch.setattr(asgi_app.pool, 'max_pending', 0)
+    body = json.dumps(records[0] if path == '/predict' else records).encode() if method == 'POST' else b''
+
+    status, headers, _ = call(method, path, body, query)
+
+    assert status == 429 and headers[b'retry-after'] == b'1'
+
+
+def test_batch_rejects_a_bad_chunk_size(serving, records):
+    status, _, body = call('POST', '/predict/batch', json.dumps(records).encode(), b'chunk_size=0')
+
+    assert status == 400
+    assert 'positive integer' in json.loads(body)['error']
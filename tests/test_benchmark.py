@@ -0,0 +1,36 @@
+import json
+
+import benchmark
+
+
+def test_in_process_layers_on_the_test_model(serving):
+    results = benchmark.bench_in_process(['model', 'flat_model', 'compiled_preprocess', 'gunicorn'],
+                                         [1, 50], budget_seconds=0.01)
+
+    assert [(r['layer'], r['batch_size']) for r in results] == [
+        ('model', 1), ('flat_model', 1), ('compiled_preprocess', 1),
+        ('model', 50), ('flat_model', 50), ('compiled_preprocess', 50)]
+    for result in results:
+        assert result['calls'] >= 5 and result['concurrency'] == 1
+        assert 0 < result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+        assert result['rows_per_sec'] > 0
+
+
+def test_summary_and_regression_report(serving, tmp_path):
+    summary = benchmark.summarize('flask', 10, 2, [0.001] * 98 + [0.1, 0.2], 0.5, 123.0)
+    assert summary['calls'] == 100 and summary['p50_ms'] == 1.0
+    assert summary['p99_ms'] > 99.0 and summary['rows_per_sec'] == 2000.0
+
+    baseline = {'results': [dict(summary, rows_per_sec=4000.0), dict(summary, batch_size=20)]}
+    regressions = benchmark.compare([summary], baseline, tolerance=0.15)
+    assert regressions == [{'layer': 'flask', 'batch_size': 10, 'concurrency': 2,
+                            'metric': 'rows_per_sec', 'baseline': 4000.0, 'current': 2000.0}]
+
+    baseline_path, out = tmp_path / 'baseline.json', tmp_path / 'results.json'
+    baseline_path.write_text(json.dumps({'results': []}))
+    code = benchmark.main(['--layers', 'flat_model', '--batch-sizes', '1,10', '--budget', '0.01',
+                           '--out', str(out), '--baseline', str(baseline_path)])
+    report = json.loads(out.read_text())
+    assert code == 0 and report['regressions'] == []
+    assert [(r['layer'], r['batch_size']) for r in report['results']] == [('flat_model', 1), ('flat_model', 10)]
+    assert report['meta']['model_type'] == 'RandomForestRegressor'
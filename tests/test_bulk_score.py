@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bulk_score
+
+CHUNK = 50
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def input_csv(serving, make_frame, tmp_path):
+    df = make_frame(420, seed=9)
+    df.loc[[17, 233], 'Product_MRP'] = None
+    path = str(tmp_path / 'input.csv')
+    df.to_csv(path, index=False)
+    return path
+
+
+def interrupt_at(monkeypatch, failing_chunk):
+    score_chunk = bulk_score.score_chunk
+
+    def flaky(index, chunk):
+        if index == failing_chunk:
+            raise Interrupted()
+        return score_chunk(index, chunk)
+    monkeypatch.setattr(bulk_score, 'score_chunk', flaky)
+
+
+def test_scores_match_the_batch_path(serving, input_csv, tmp_path):
+    output = str(tmp_path / 'scored.csv')
+    summary = bulk_score.score_file(input_csv, output, chunk_size=CHUNK, workers=1)
+
+    scored = pd.read_csv(output)
+    assert summary['rows'] == len(scored) == 420
+    assert scored['prediction'].isna().sum() == 2 and scored['error'].notna().sum() == 2
+    valid = scored[scored['error'].isna()]
+    features, _, _ = serving.validate_frame(valid)
+    np.testing.assert_allclose(valid['prediction'], serving.predict_frame(features))
+
+
+def test_csv_resume_after_interruption(input_csv, tmp_path, monkeypatch):
+    reference = str(tmp_path / 'reference.csv')
+    bulk_score.score_file(input_csv, reference, chunk_size=CHUNK, workers=1)
+
+    output = str(tmp_path / 'scored.csv')
+    with monkeypatch.context() as patch:
+        interrupt_at(patch, 5)
+        with pytest.raises(Interrupted):
+            bulk_score.score_file(input_csv, output, chunk_size=CHUNK, workers=1)
+    # Rows of a chunk that was being written when the process died
+    with open(output, 'a') as f:
+        f.write('1.0,Low Fat,0.1,Dairy')
+
+    summary = bulk_score.score_file(input_csv, output, chunk_size=CHUNK, workers=1, resume=True)
+
+    assert summary['rows'] == 420 and summary['rows_this_run'] == 420 - 5 * CHUNK
+    with open(output) as f, open(reference) as g:
+        assert f.read() == g.read()
+
+
+def test_parquet_resume_after_interruption(input_csv, tmp_path, monkeypatch):
+    output = str(tmp_path / 'scored.parquet')
+    with monkeypatch.context() as patch:
+        interrupt_at(patch, 2)
+        with pytest.raises(Interrupted):
+            bulk_score.score_file(input_csv, output, chunk_size=CHUNK, workers=1)
+
+    summary = bulk_score.score_file(input_csv, output, chunk_size=CHUNK, workers=1, resume=True)
+
+    scored = pd.read_parquet(output)
+    assert summary['rows_this_run'] == 420 - 2 * CHUNK
+    assert len(scored) == 420
+    pd.testing.assert_frame_equal(scored.drop(columns=['prediction', 'error']).reset_index(drop=True),
+                                  pd.read_csv(input_csv), check_dtype=False)
+
+
+def test_resume_rejects_a_different_chunk_size(input_csv, tmp_path, monkeypatch):
+    output = str(tmp_path / 'scored.csv')
+    with monkeypatch.context() as patch:
+        interrupt_at(patch, 1)
+        with pytest.raises(Interrupted):
+            bulk_score.score_file(input_csv, output, chunk_size=CHUNK, workers=1)
+
+    with pytest.raises(ValueError):
+        bulk_score.score_file(input_csv, output, chunk_size=CHUNK * 2, workers=1, resume=True)
+
+
+def test_notebook_column_names_are_accepted(input_csv, tmp_path):
+    df = pd.read_csv(input_csv)
+    notebook = df.rename(columns={'Store_Location_Type': 'Store_Location_City_Type',
+                                  'Product_Visibility': 'Product_Allocated_Area'})
+    notebook_csv = str(tmp_path / 'notebook.csv')
+    notebook.to_csv(notebook_csv, index=False)
+
+    bulk_score.score_file(input_csv, str(tmp_path / 'api.csv'), chunk_size=CHUNK, workers=1)
+    bulk_score.score_file(notebook_csv, str(tmp_path / 'notebook_scored.csv'), chunk_size=CHUNK, workers=1)
+
+    api, scored = pd.read_csv(tmp_path / 'api.csv'), pd.read_csv(tmp_path / 'notebook_scored.csv')
+    assert 'Store_Location_City_Type' in scored.columns
+    np.testing.assert_allclose(scored['prediction'], api['prediction'])
+
+
+def test_missing_model_aborts_before_any_chunk(serving, input_csv, tmp_path, monkeypatch):
+    monkeypatch.setattr(serving, 'active_version', None)
+    monkeypatch.setattr(serving, 'load_model_and_preprocessor', lambda: False)
+    submitted = []
+    monkeypatch.setattr(bulk_score, 'score_chunk', lambda *args: submitted.append(args))
+    output = str(tmp_path / 'scored.csv')
+
+    with pytest.raises(RuntimeError, match='Cannot score without a model'):
+        bulk_score.score_file(input_csv, output, chunk_size=CHUNK, workers=2)
+    assert bulk_score.main([input_csv, output, '--workers', '2']) == 1
+
+    assert submitted == []
+    assert not (tmp_path / 'scored.csv').exists()
+    assert not (tmp_path / 'scored.csv.progress.json').exists()
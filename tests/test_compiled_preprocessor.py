@@ -0,0 +1,59 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from compiled_preprocessor import CompiledPreprocessor, compile_preprocessor
+
+
+def sklearn_transform(preprocessor, df):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        matrix = preprocessor.transform(df)
+    return matrix.toarray() if hasattr(matrix, 'toarray') else np.asarray(matrix)
+
+
+@pytest.fixture(scope='module')
+def compiled(artifacts):
+    compiled = compile_preprocessor(artifacts.preprocessor)
+    assert compiled is not None
+    return compiled
+
+
+def test_records_and_frames_match_column_transformer(artifacts, compiled, make_frame):
+    df = make_frame(300, seed=7)
+    features = list(artifacts.preprocessor.feature_names_in_)
+    expected = sklearn_transform(artifacts.preprocessor, df[features])
+
+    np.testing.assert_allclose(compiled.transform(df[features].to_dict('records')), expected, atol=1e-9)
+    np.testing.assert_allclose(compiled.transform_frame(df), expected, atol=1e-9)
+
+
+def test_single_record_matches(artifacts, compiled, records):
+    import pandas as pd
+
+    expected = sklearn_transform(artifacts.preprocessor, pd.DataFrame([records[5]]))
+
+    np.testing.assert_allclose(compiled.transform(records[5]), expected, atol=1e-9)
+
+
+def test_unknown_category_encodes_as_zeros(artifacts, compiled, records):
+    import pandas as pd
+
+    record = dict(records[0], Product_Type='Pet Food', Store_Type='Kiosk')
+    expected = sklearn_transform(artifacts.preprocessor, pd.DataFrame([record]))
+
+    np.testing.assert_allclose(compiled.transform(record), expected, atol=1e-9)
+    np.testing.assert_allclose(compiled.transform_frame(pd.DataFrame([record])), expected, atol=1e-9)
+
+
+def test_unsupported_transformer_falls_back(artifacts):
+    from sklearn.compose import make_column_transformer
+    from sklearn.preprocessing import MinMaxScaler
+
+    preprocessor = make_column_transformer((MinMaxScaler(), ['Product_MRP']))
+    preprocessor.fit(artifacts.frame)
+
+    with pytest.raises(ValueError):
+        CompiledPreprocessor.from_column_transformer(preprocessor)
+    assert compile_preprocessor(preprocessor) is None
@@ -0,0 +1,162 @@
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+import pytest
+
+import drift_monitor
+import metrics
+from drift_monitor import CategoricalSketch, DriftMonitor, NumericSketch, build_profile
+from model_training import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+
+
+@pytest.fixture
+def profile(artifacts):
+    return build_profile(artifacts.frame, NUMERIC_FEATURES, CATEGORICAL_FEATURES)
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path / 'metrics'))
+    return metrics.METRICS_DIR
+
+
+def assert_same_numeric(actual, expected):
+    assert actual.n == expected.n and actual.counts == expected.counts
+    assert (actual.min, actual.max, actual.invalid) == (expected.min, expected.max, expected.invalid)
+    assert actual.mean == pytest.approx(expected.mean) and actual.m2 == pytest.approx(expected.m2)
+
+
+def test_numeric_sketches_merge_like_one_pass():
+    values = np.random.default_rng(0).normal(50.0, 10.0, 1000)
+    values[::97] = np.nan
+    edges = [30.0, 40.0, 50.0, 60.0, 70.0]
+    whole = NumericSketch(edges)
+    for value in values:
+        whole.add(value)
+
+    merged = NumericSketch(edges)
+    for part in np.array_split(values, 4):
+        sketch = NumericSketch(edges)
+        sketch.add_array(part)
+        merged.merge(json.loads(json.dumps(sketch.state())))
+
+    assert_same_numeric(merged, whole)
+    assert merged.quantile(0.5) == pytest.approx(np.nanmedian(values), abs=1.0)
+
+
+def test_categorical_sketches_merge_with_unseen_values():
+    values = ['a', 'b', 'a', 'zz', None, 'yy', 'a', 'zz']
+    whole = CategoricalSketch(['a', 'b', 'c'], max_unseen=5)
+    for value in values:
+        whole.add(value)
+
+    merged = CategoricalSketch(['a', 'b', 'c'], max_unseen=5)
+    for part in (values[:3], values[3:]):
+        sketch = CategoricalSketch(['a', 'b', 'c'], max_unseen=5)
+        for value in part:
+            sketch.add(value)
+        merged.merge(sketch.state())
+
+    assert merged.state() == whole.state()
+    assert merged.report({"frequencies": {'a': 0.5, 'b': 0.3, 'c': 0.2}})['status'] == 'insufficient_data'
+
+
+def observe_in_worker(profile, frame, done):
+    monitor = DriftMonitor(profile, 'v1', sample_rate=1.0)
+    monitor.observe_frame(frame)
+    monitor.flush()
+    # Stay alive like a serving worker; snapshots of exited workers are not merged
+    done.wait(30)
+
+
+def wait_for_files(paths, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not all(os.path.exists(path) for path in paths):
+        assert time.monotonic() < deadline, "workers did not write their snapshots"
+        time.sleep(0.02)
+
+
+def test_report_merges_sketches_of_all_workers(profile, metrics_dir, make_frame, monkeypatch):
+    rows = make_frame(600, seed=21)
+    parts = np.array_split(rows.index.to_numpy(), 3)
+    context = multiprocessing.get_context('fork')
+    done = context.Event()
+    workers = [context.Process(target=observe_in_worker, args=(profile, rows.loc[part], done))
+               for part in parts[1:]]
+    for worker in workers:
+        worker.start()
+    snapshot_files = [os.path.join(metrics_dir, f'drift-{worker.pid}.json') for worker in workers]
+    wait_for_files(snapshot_files)
+
+    monitor = DriftMonitor(profile, 'v1', sample_rate=1.0)
+    monitor.observe_frame(rows.loc[parts[0]])
+    # A worker still on another model version is left out
+    with open(os.path.join(metrics_dir, 'drift-1.json'), 'w') as f:
+        json.dump(dict(monitor.snapshot(), pid=1, reference_id='v0'), f)
+    report = monitor.report()
+    done.set()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    monitor.stop()
+
+    # The same rows seen by one process with nothing to merge
+    monkeypatch.setattr(metrics, 'METRICS_DIR', None)
+    single = DriftMonitor(profile, 'v1', sample_rate=1.0)
+    single.observe_frame(rows)
+    expected = single.report()
+
+    assert report['workers'] == 3 and report['rows_sampled'] == expected['rows_sampled'] == 600
+    for feature, stats in expected['features'].items():
+        assert report['features'][feature]['count'] == stats['count']
+        assert report['features'][feature]['psi'] == pytest.approx(stats['psi'], abs=1e-9)
+
+
+def test_snapshots_of_exited_workers_are_dropped(profile, metrics_dir, make_frame):
+    context = multiprocessing.get_context('fork')
+    done = context.Event()
+    done.set()
+    worker = context.Process(target=observe_in_worker, args=(profile, make_frame(300, seed=23), done))
+    worker.start()
+    worker.join()
+    snapshot_file = os.path.join(metrics_dir, f'drift-{worker.pid}.json')
+    assert worker.exitcode == 0 and os.path.exists(snapshot_file)
+
+    monitor = DriftMonitor(profile, 'v1', sample_rate=1.0)
+    monitor.observe_frame(make_frame(50, seed=24))
+    report = monitor.report()
+    monitor.stop()
+
+    assert report['workers'] == 1 and report['rows_sampled'] == 50
+    assert not os.path.exists(snapshot_file)
+
+
+def test_shifted_inputs_are_reported_as_drift(profile, make_frame):
+    monitor = DriftMonitor(profile, 'v1', sample_rate=1.0)
+    shifted = make_frame(2000, seed=22)
+    shifted['Product_MRP'] += 150.0
+    shifted.loc[::10, 'Store_Type'] = 'Pop-up Store'
+    monitor.observe_frame(shifted)
+
+    report = monitor.report()
+
+    assert report['status'] == 'drift'
+    assert set(report['drifting_features']) == {'Product_MRP', 'Store_Type'}
+    assert report['features']['Store_Type']['unseen'] == {'Pop-up Store': 200}
+    assert report['features']['Product_MRP']['mean_shift'] > 1.5
+    assert report['features']['Product_Weight']['psi'] < drift_monitor.PSI_DRIFT
+
+
+def test_drift_endpoint_counts_served_rows(client, serving, records):
+    assert serving.drift_monitor is not None and drift_monitor.DRIFT_SAMPLE_RATE == 1.0
+    before = client.get('/drift').get_json()['rows_sampled']
+
+    client.post('/predict/batch', json=records)
+    client.post('/predict', json=records[0])
+
+    payload = client.get('/drift').get_json()
+    assert payload['rows_sampled'] == before + len(records) + 1
+    assert payload['reference_id'] == serving.active_version.version_id
@@ -0,0 +1,35 @@
+import os
+import signal
+import time
+
+import pytest
+
+import metrics
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_forked_child_does_not_inherit_a_held_lock():
+    metrics.REGISTRY.inc('superkart_requests_total', endpoint='/parent', status='200')
+    # A parent thread (flusher, request) holding the lock at fork time
+    with metrics.REGISTRY._lock:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                metrics.REGISTRY.inc('superkart_requests_total', endpoint='/child', status='200')
+                # Only what the child recorded itself
+                expected = {('superkart_requests_total', (('endpoint', '/child'), ('status', '200'))): 1}
+                os._exit(0 if metrics.REGISTRY.counters == expected else 1)
+            finally:
+                os._exit(2)
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            break
+        time.sleep(0.05)
+    else:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        pytest.fail("Forked child deadlocked on the inherited metrics lock")
+    assert os.waitstatus_to_exitcode(status) == 0
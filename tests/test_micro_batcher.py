@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+class RecordingModel:
+    """predict_fn that remembers the batch sizes it was called with"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = []
+        self.delay = delay
+        self.fail = fail
+
+    def __call__(self, X):
+        self.calls.append(X.shape[0])
+        time.sleep(self.delay)
+        if self.fail:
+            raise ValueError("model exploded")
+        return X[:, 0] * 2.0
+
+
+def row(value):
+    return np.array([[float(value), 0.0]])
+
+
+def test_concurrent_requests_share_one_model_call():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=64, max_wait_ms=200)
+    start = threading.Barrier(16)
+
+    def request(i):
+        start.wait()
+        return batcher.predict(row(i))
+
+    with ThreadPoolExecutor(16) as pool:
+        results = list(pool.map(request, range(16)))
+
+    # Every caller gets its own row's prediction back
+    assert results == [2.0 * i for i in range(16)]
+    assert sum(model.calls) == 16 and len(model.calls) < 16
+    assert batcher.stats()['batch_size']['count'] == len(model.calls)
+
+
+def test_batch_is_cut_at_max_batch_size():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=200)
+    start = threading.Barrier(10)
+
+    def request(i):
+        start.wait()
+        return batcher.predict(row(i))
+
+    with ThreadPoolExecutor(10) as pool:
+        assert sorted(pool.map(request, range(10))) == [2.0 * i for i in range(10)]
+    assert max(model.calls) <= 4 and sum(model.calls) == 10
+
+
+def test_lone_request_waits_only_for_the_window():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_wait_ms=50)
+
+    started = time.perf_counter()
+    assert batcher.predict(row(3)) == 6.0
+    elapsed = time.perf_counter() - started
+
+    assert model.calls == [1]
+    assert 0.04 <= elapsed < 1.0
+
+
+def test_model_errors_reach_every_waiting_caller():
+    model = RecordingModel(fail=True)
+    batcher = MicroBatcher(model, max_wait_ms=100)
+    start = threading.Barrier(4)
+
+    def request(i):
+        start.wait()
+        return batcher.predict(row(i))
+
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(request, i) for i in range(4)]
+        for future in futures:
+            with pytest.raises(ValueError, match='exploded'):
+                future.result(timeout=10)
+
+    # The worker thread survives a failed batch
+    model.fail = False
+    assert batcher.predict(row(1)) == 2.0
+
+
+def test_full_queue_scores_inline():
+    model = RecordingModel(delay=0.3)
+    batcher = MicroBatcher(model, max_batch_size=1, max_wait_ms=0, max_queue=1)
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(batcher.predict, row(i)) for i in range(3)]
+        time.sleep(0.1)
+        assert [f.result(timeout=10) for f in futures] == [0.0, 2.0, 4.0]
+    assert batcher.stats()['bypassed'] >= 1
+
+
+def test_served_predictions_are_unchanged(serving, client, make_frame, monkeypatch):
+    monkeypatch.setattr(serving, 'micro_batcher', MicroBatcher(serving.predict_matrix, max_wait_ms=20))
+    monkeypatch.setattr(serving, 'prediction_cache', None)
+    records = make_frame(12, seed=31).drop(columns=['Product_Store_Sales_Total']).to_dict('records')
+
+    with ThreadPoolExecutor(6) as pool:
+        responses = list(pool.map(lambda r: serving.app.test_client().post('/predict', json=r).get_json(),
+                                  records))
+
+    expected = client.post('/predict/batch', json=records).get_json()['predictions']
+    assert [r['prediction'] for r in responses] == pytest.approx(expected)
+    assert serving.micro_batcher.stats()['batch_size']['count'] >= 1
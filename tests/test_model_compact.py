@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pytest
+
+from model_compact import compact_path_for, compact_source, load_compact, prune, save_compact
+from tree_inference import FlatForest, probe_matrix
+
+
+@pytest.fixture
+def flat(artifacts):
+    return FlatForest.from_model(artifacts.model)
+
+
+def test_compact_round_trip_keeps_every_split(artifacts, flat, tmp_path):
+    path = str(tmp_path / 'model.compact.npz')
+    save_compact(flat, path)
+    compact = load_compact(path)
+    X = np.asarray(artifacts.X, dtype=np.float64)
+
+    assert compact.n_trees == flat.n_trees and compact.n_nodes == flat.n_nodes
+    assert compact.threshold.dtype == np.float32 and compact.value.dtype == np.float32
+    # float32 leaf values, identical leaves for every row
+    np.testing.assert_allclose(compact.tree_predictions(X), flat.tree_predictions(X), rtol=1e-6)
+    np.testing.assert_allclose(compact.predict(X), artifacts.model.predict(X), rtol=1e-6)
+
+
+def test_prune_to_fewer_trees_and_depth(artifacts, flat):
+    X = probe_matrix(flat.n_features, n_rows=100)
+
+    first_trees = prune(flat, n_trees=4)
+    expected = np.mean([tree.predict(X) for tree in artifacts.model.estimators_[:4]], axis=0)
+    np.testing.assert_allclose(first_trees.predict(X), expected, rtol=1e-9, atol=1e-6)
+
+    shallow = prune(flat, max_depth=2)
+    assert shallow.n_nodes < flat.n_nodes and shallow.max_depth == 2
+    assert np.all(np.isfinite(shallow.predict(X)))
+
+
+def test_stale_compact_artifact_is_ignored(flat, tmp_path):
+    model_path = str(tmp_path / 'superkart_model.pkl')
+    compact_path = compact_path_for(model_path)
+    save_compact(flat, compact_path)
+    assert compact_source(model_path) == compact_path
+
+    open(model_path, 'wb').close()
+    later = os.path.getmtime(compact_path) + 5
+    os.utime(model_path, (later, later))
+    assert compact_source(model_path) is None
+
+
+def test_serving_uses_compact_artifact(serving, artifacts, flat, tmp_path):
+    model_path = str(tmp_path / 'superkart_model.pkl')
+    save_compact(flat, compact_path_for(model_path))
+
+    version = serving.load_version('compact', model_path, artifacts.preprocessor_path)
+
+    assert version.compact_model == compact_path_for(model_path)
+    # Saved without check rows, so there is nothing recorded to verify it against
+    assert serving.smoke_test_version(version)['verified'] is False
+    X = probe_matrix(flat.n_features, n_rows=50)
+    np.testing.assert_allclose(version.model.predict(X), artifacts.model.predict(X), rtol=1e-6)
@@ -0,0 +1,105 @@
+import time
+
+import pandas as pd
+import pytest
+
+from model_registry import PRODUCTION, ModelRegistry, estimate_bytes
+
+
+@pytest.fixture
+def candidates(make_artifacts, tmp_path):
+    root = tmp_path / 'registry'
+    return {name: make_artifacts(str(root / name), n_estimators=n, seed=seed)
+            for name, n, seed in (('small', 3, 41), ('medium', 6, 42), ('large', 9, 43))}
+
+
+def make_registry(serving, candidates, budget=1e12, **config):
+    models = {name: {'model_path': a.model_path, 'preprocessor_path': a.preprocessor_path}
+              for name, a in candidates.items()}
+    return ModelRegistry(dict(config, models=models), serving.load_registry_model, budget)
+
+
+@pytest.fixture
+def use_registry(serving, monkeypatch):
+    def install(registry):
+        monkeypatch.setattr(serving, 'model_registry', registry)
+        return registry
+    return install
+
+
+def expected_prediction(artifacts, record, feature_names):
+    X = artifacts.preprocessor.transform(pd.DataFrame([record], columns=feature_names))
+    return artifacts.model.predict(X)[0]
+
+
+def test_models_load_on_first_use(serving, client, candidates, use_registry, records):
+    registry = use_registry(make_registry(serving, candidates))
+    assert registry.loads == 0 and registry.stats()['loaded_mb'] == {}
+
+    payload = client.post('/predict?model=medium', json=records[1]).get_json()
+
+    assert payload['model'] == 'medium' and registry.loads == 1
+    assert list(registry.stats()['loaded_mb']) == ['medium']
+    assert payload['prediction'] == pytest.approx(
+        expected_prediction(candidates['medium'], records[1], serving.feature_names))
+    client.post('/predict?model=medium', json=records[2])
+    assert registry.loads == 1 and registry.stats()['requests']['medium'] == 2
+
+    assert client.post('/predict?model=nope', json=records[1]).status_code == 404
+    assert client.post('/predict/batch?model=nope', json=records[:2]).status_code == 404
+
+
+def test_least_recently_used_model_is_evicted(serving, candidates, records):
+    sizes = {name: estimate_bytes(serving.load_registry_model(
+        name, {'model_path': a.model_path, 'preprocessor_path': a.preprocessor_path}))
+        for name, a in candidates.items()}
+    # Room for medium and large together, not for all three
+    registry = make_registry(serving, candidates, budget=sizes['medium'] + sizes['large'] + 1)
+
+    registry.get('small')
+    registry.get('medium')
+    registry.get('small')  # medium is now least recently used
+    registry.get('large')
+
+    assert list(registry.stats()['loaded_mb']) == ['small', 'large']
+    assert registry.evictions == 1
+    registry.get('medium')
+    assert registry.loads == 4 and 'small' not in registry.stats()['loaded_mb']
+
+
+def test_shadow_scoring_does_not_change_the_response(serving, client, candidates, use_registry, records):
+    record = records[6]
+    without = client.post('/predict', json=record).get_json()
+    registry = use_registry(make_registry(serving, candidates, shadow={'large': 1.0}))
+
+    served = client.post('/predict', json=record).get_json()
+
+    assert served['model'] == PRODUCTION and served['prediction'] == without['prediction']
+    deadline = time.monotonic() + 10
+    while registry.stats()['shadow']['large']['compared'] < 1:
+        assert time.monotonic() < deadline, "shadow scoring did not run"
+        time.sleep(0.01)
+    shadow = expected_prediction(candidates['large'], record, serving.feature_names)
+    assert registry.stats()['shadow']['large']['max_abs_delta'] == \
+        pytest.approx(abs(shadow - served['prediction']), abs=1e-3)
+
+
+def test_routes_and_split_are_sticky(serving, candidates, records):
+    registry = make_registry(serving, candidates,
+                             routes=[{'match': {'Store_Type': 'Grocery Store'}, 'model': 'small'}],
+                             split={'medium': 0.5})
+    grocery = dict(records[0], Store_Type='Grocery Store')
+    assert registry.select(grocery) == 'small'
+    assert registry.select(grocery, requested=PRODUCTION) == PRODUCTION
+
+    others = [dict(r, Store_Type='Supermarket Type1', Product_Weight=float(i)) for i, r in enumerate(records * 4)]
+    chosen = [registry.select(r) for r in others]
+    assert chosen == [registry.select(r) for r in others]
+    assert set(chosen) == {'medium', PRODUCTION}
+
+
+def test_invalid_registry_config_is_rejected(serving, candidates):
+    with pytest.raises(ValueError, match='undefined'):
+        make_registry(serving, candidates, shadow={'ghost': 1.0})
+    with pytest.raises(ValueError, match='more than 1'):
+        make_registry(serving, candidates, split={'small': 0.7, 'medium': 0.6})
@@ -0,0 +1,70 @@
+import os
+import time
+
+import joblib
+import numpy as np
+import pytest
+
+import model_store
+from model_compact import compact_path_for, save_compact
+from tree_inference import FlatForest, probe_matrix
+
+
+@pytest.fixture
+def model_copy(artifacts, tmp_path):
+    path = str(tmp_path / 'superkart_model.pkl')
+    joblib.dump(artifacts.model, path)
+    return path
+
+
+def test_mapped_bundle_matches_the_model(artifacts, model_copy):
+    store_dir = model_store.store_dir_for(model_copy)
+    flat = model_store.load_or_build(model_copy, store_dir)
+    X = probe_matrix(flat.n_features, n_rows=300)
+
+    np.testing.assert_allclose(flat.predict(X), artifacts.model.predict(X), rtol=1e-9, atol=1e-6)
+    assert isinstance(flat.threshold, np.memmap) or isinstance(flat.threshold.base, np.memmap)
+    assert not flat.value.flags.writeable
+    assert model_store.read_manifest(store_dir)['n_trees'] == flat.n_trees
+
+
+def test_stale_bundle_is_rebuilt(model_copy, make_artifacts, tmp_path):
+    store_dir = model_store.store_dir_for(model_copy)
+    model_store.load_or_build(model_copy, store_dir)
+    assert model_store.is_fresh(store_dir, model_copy)
+
+    retrained = make_artifacts(str(tmp_path / 'retrained'), n_estimators=5, seed=1)
+    joblib.dump(retrained.model, model_copy)
+    os.utime(model_copy, (time.time() + 2, time.time() + 2))
+    assert not model_store.is_fresh(store_dir, model_copy)
+
+    flat = model_store.load_or_build(model_copy, store_dir)
+    assert flat.n_trees == 5
+    X = probe_matrix(flat.n_features, n_rows=50)
+    np.testing.assert_allclose(flat.predict(X), retrained.model.predict(X), rtol=1e-9, atol=1e-6)
+
+
+def test_bundle_builds_from_compact_artifact_alone(artifacts, tmp_path):
+    model_path = str(tmp_path / 'superkart_model.pkl')
+    save_compact(FlatForest.from_model(artifacts.model), compact_path_for(model_path))
+
+    flat = model_store.load_or_build(model_path, model_store.store_dir_for(model_path))
+
+    X = probe_matrix(flat.n_features, n_rows=200)
+    np.testing.assert_allclose(flat.predict(X), artifacts.model.predict(X), rtol=1e-4, atol=1e-2)
+
+
+def test_each_model_gets_its_own_bundle(make_artifacts, tmp_path):
+    first = make_artifacts(str(tmp_path / 'first'), n_estimators=4, seed=2)
+    second = make_artifacts(str(tmp_path / 'second'), n_estimators=6, seed=3)
+
+    model_store.load_or_build(first.model_path, model_store.store_dir_for(first.model_path))
+    model_store.load_or_build(second.model_path, model_store.store_dir_for(second.model_path))
+
+    assert model_store.read_manifest(model_store.store_dir_for(first.model_path))['n_trees'] == 4
+    assert model_store.read_manifest(model_store.store_dir_for(second.model_path))['n_trees'] == 6
+
+
+def test_missing_bundle_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        model_store.load_flat_model(str(tmp_path / 'nothing_here'))
@@ -0,0 +1,82 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+import model_training
+from drift_monitor import profile_path_for
+
+
+@pytest.fixture
+def training_csv(make_frame, tmp_path):
+    path = str(tmp_path / 'SuperKart.csv')
+    # The notebook's column names are accepted as well
+    make_frame(300, seed=31).rename(columns={'Store_Location_Type': 'Store_Location_City_Type'}).to_csv(
+        path, index=False)
+    return path
+
+
+def run_cli(capsys, *argv):
+    assert model_training.main(list(argv)) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_cli_writes_a_new_version_and_its_manifest(training_csv, tmp_path, capsys):
+    output_dir, cache_dir = str(tmp_path / 'models' / 'v9'), str(tmp_path / 'cache')
+    os.makedirs(os.path.dirname(output_dir))
+    manifest = run_cli(capsys, training_csv, output_dir, '--models', 'random_forest', '--cv', '2',
+                       '--n-jobs', '1', '--cache-dir', cache_dir)
+
+    # Staged beside its final name, then renamed into place
+    assert sorted(os.listdir(os.path.dirname(output_dir))) == ['v9']
+    model_path = os.path.join(output_dir, 'superkart_model.pkl')
+    preprocessor_path = os.path.join(output_dir, 'superkart_preprocessor.pkl')
+    assert sorted(os.listdir(output_dir)) == sorted([
+        'superkart_model.pkl', 'superkart_model.metrics.json', 'superkart_preprocessor.pkl',
+        os.path.basename(profile_path_for(preprocessor_path))])
+    assert model_training.read_metrics(model_path) == manifest
+
+    assert manifest['model'] == 'random_forest' and manifest['model_type'] == 'RandomForestRegressor'
+    assert manifest['search']['method'] == 'halving' and manifest['search']['cv'] == 2
+    assert manifest['data']['rows'] == 300 and manifest['data']['sha1'] == model_training.file_sha1(training_csv)
+    assert manifest['data']['train_rows'] + manifest['data']['test_rows'] == 300
+    assert manifest['test']['r2'] > 0.5 and not manifest['preprocessing_cached']
+    assert manifest['params'] == manifest['candidates']['random_forest']['best_params']
+
+    model, preprocessor = joblib.load(model_path), joblib.load(preprocessor_path)
+    assert model.get_params()['n_estimators'] == manifest['params']['n_estimators']
+    X = preprocessor.transform(model_training.load_training_frame(training_csv)[
+        model_training.NUMERIC_FEATURES + model_training.CATEGORICAL_FEATURES])
+    assert X.shape[1] == manifest['features']['encoded']
+    assert np.isfinite(model.predict(X)).all()
+
+
+def test_retraining_on_unchanged_data_reuses_the_prepared_cache(training_csv, tmp_path, capsys):
+    output_dir, cache_dir = str(tmp_path / 'v1'), str(tmp_path / 'cache')
+    argv = [training_csv, output_dir, '--models', 'random_forest', '--search', 'grid', '--cv', '2',
+            '--n-jobs', '1', '--cache-dir', cache_dir]
+    first = run_cli(capsys, *argv)
+    # Retraining into an existing directory replaces its files in place
+    second = run_cli(capsys, *argv)
+
+    assert not first['preprocessing_cached'] and second['preprocessing_cached']
+    assert second['candidates']['random_forest']['candidates'] == 16
+    assert (second['params'], second['test']) == (first['params'], first['test'])
+    assert model_training.read_metrics(os.path.join(output_dir, 'superkart_model.pkl')) == second
+    assert not [name for name in os.listdir(output_dir) if name.endswith('.tmp')]
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_unknown_model_family_and_missing_columns(training_csv, make_frame, tmp_path):
+    with pytest.raises(SystemExit):
+        model_training.main([training_csv, str(tmp_path / 'v1'), '--models', 'linear'])
+    with pytest.raises(ValueError, match='Unknown model families'):
+        model_training.train(training_csv, str(tmp_path / 'v1'), None, models=['linear'])
+
+    unlabelled = str(tmp_path / 'unlabelled.csv')
+    make_frame(20).drop(columns=[model_training.TARGET]).to_csv(unlabelled, index=False)
+    with pytest.raises(ValueError, match='missing columns'):
+        model_training.train(unlabelled, str(tmp_path / 'v2'), None)
+    assert not os.path.exists(str(tmp_path / 'v2'))
@@ -0,0 +1,113 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import model_compact
+import model_store
+import model_versions
+
+ADMIN = {'X-Admin-Token': 'test-admin-token'}
+
+
+def admin_post(client, path, **kwargs):
+    response = client.post(path, headers=ADMIN, **kwargs)
+    return response.status_code, response.get_json()
+
+
+def test_admin_routes_need_the_token(client):
+    assert client.post('/admin/reload').status_code == 403
+    assert client.post('/admin/rollback', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+
+
+def test_reload_then_rollback(client, serving, second_version, records):
+    before = client.post('/predict', json=records[0]).get_json()
+    assert before['model_version'] == 'v1'
+
+    status, payload = admin_post(client, '/admin/reload')
+    assert status == 200 and payload['status'] == 'activated'
+    assert payload['active']['version'] == 'v2' and payload['previous']['version'] == 'v1'
+    assert payload['active']['smoke_test']['verified'] is True
+    assert client.post('/predict', json=records[0]).get_json()['model_version'] == 'v2'
+
+    status, payload = admin_post(client, '/admin/rollback')
+    assert status == 200 and payload['active']['version'] == 'v1'
+    after = client.post('/predict', json=records[0]).get_json()
+    assert after['model_version'] == 'v1' and after['prediction'] == before['prediction']
+    # Pinned so other workers follow, and the watcher does not bring v2 back
+    assert model_versions.read_pin(os.environ['MODEL_DIR']) == 'v1'
+    assert serving.versions.check() is None
+
+
+def test_reload_of_named_version_and_unknown_version(client, second_version):
+    status, payload = admin_post(client, '/admin/reload', json={"version": "v1"})
+    assert status == 200 and payload['status'] == 'unchanged'
+
+    status, payload = admin_post(client, '/admin/reload', json={"version": "v9"})
+    assert status == 404
+
+
+def test_broken_version_is_rejected_and_v1_keeps_serving(client, serving, records):
+    broken_dir = os.path.join(os.environ['MODEL_DIR'], 'v3')
+    os.makedirs(broken_dir)
+    try:
+        with open(os.path.join(broken_dir, 'superkart_model.pkl'), 'wb') as f:
+            f.write(b'not a pickle')
+        status, payload = admin_post(client, '/admin/reload')
+
+        assert status == 422 and payload['active_version'] == 'v1'
+        assert client.post('/predict', json=records[0]).get_json()['model_version'] == 'v1'
+        # Rejected versions are not retried by the watcher
+        assert serving.versions.check() is None
+    finally:
+        shutil.rmtree(broken_dir)
+
+
+def test_rollback_without_previous_version(serving):
+    manager = model_versions.VersionManager(serving.resolve_version, serving.load_version,
+                                            serving.smoke_test_version, lambda version: None)
+    with pytest.raises(LookupError):
+        manager.rollback()
+
+
+def test_smoke_test_checks_mapped_model_against_recorded_rows(serving, artifacts, tmp_path, monkeypatch):
+    model_path = str(tmp_path / 'superkart_model.pkl')
+    shutil.copy(artifacts.model_path, model_path)
+    monkeypatch.setattr(serving, 'USE_MODEL_STORE', True)
+    version = serving.load_version('mapped', model_path, artifacts.preprocessor_path)
+    assert version.model is version.flat_model
+
+    assert serving.smoke_test_version(version)['verified'] is True
+
+    # A corrupted bundle no longer reproduces the pickle's recorded predictions
+    store_dir = model_store.store_dir_for(model_path)
+    value_path = os.path.join(store_dir, 'value.npy')
+    np.save(value_path, np.load(value_path) * 2)
+    corrupted = serving.load_version('mapped', model_path, artifacts.preprocessor_path)
+    with pytest.raises(ValueError, match='differ'):
+        serving.smoke_test_version(corrupted)
+
+
+@pytest.mark.parametrize('mapped', [False, True])
+def test_pruned_compact_next_to_its_pickle_passes(serving, artifacts, make_frame, tmp_path, monkeypatch, mapped):
+    model_path = str(tmp_path / 'superkart_model.pkl')
+    shutil.copy(artifacts.model_path, model_path)
+    holdout = str(tmp_path / 'holdout.csv')
+    make_frame(200, seed=5).to_csv(holdout, index=False)
+    model_compact.compact_model(model_path, model_compact.compact_path_for(model_path),
+                                artifacts.preprocessor_path, holdout, n_trees=3)
+    # The serving path must not unpickle the model: make the pickle unreadable (but older)
+    with open(model_path, 'wb') as f:
+        f.write(b'not a pickle')
+    os.utime(model_path, (0, 0))
+    monkeypatch.setattr(serving, 'USE_MODEL_STORE', mapped)
+
+    version = serving.load_version('pruned', model_path, artifacts.preprocessor_path)
+    assert version.flat_model.n_trees == 3
+    assert serving.smoke_test_version(version)['verified'] is True
+
+    # Leaves that drift away from the recorded holdout error are still caught
+    version.flat_model.value = version.flat_model.value + 500.0
+    with pytest.raises(ValueError, match='RMSE'):
+        serving.smoke_test_version(version)
@@ -0,0 +1,121 @@
+import os
+
+import pytest
+
+from mstr_metadata import MetadataStore
+
+REVENUE = 'A' * 32
+COST = 'B' * 32
+MARGIN = 'C' * 32
+REGION = 'D' * 32
+
+
+def page(*objects):
+    """A documentation page with one section per (id, name, expression)"""
+    sections = []
+    for object_id, name, expression in objects:
+        sections.append(f"<h2>{name}</h2><table>"
+                        f"<tr><td>ID</td><td>{object_id}</td></tr>"
+                        f"<tr><td>Name</td><td>{name}</td></tr>"
+                        f"<tr><td>Type</td><td>Metric</td></tr>"
+                        f"<tr><td>Expression</td><td>{expression}</td></tr></table>")
+    return '<html><body>' + ''.join(sections) + '</body></html>'
+
+
+def write(path, *objects, mtime=None):
+    with open(path, 'w') as f:
+        f.write(page(*objects))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return os.path.abspath(path)
+
+
+@pytest.fixture
+def docs(tmp_path):
+    html_dir = tmp_path / 'html'
+    html_dir.mkdir()
+    paths = {
+        'metrics': write(html_dir / 'metrics.html', (REVENUE, 'Revenue', f'Sum(Sales) by {REGION}'),
+                         (COST, 'Cost', 'Sum(Cost)')),
+        'report': write(html_dir / 'report.html', (REVENUE, 'Revenue', 'Sum(Sales)'),
+                        (MARGIN, 'Margin', f'{REVENUE} - {COST}')),
+    }
+    return str(html_dir), paths
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetadataStore(str(tmp_path / 'mstr.db'))
+    yield store
+    store.close()
+
+
+def test_unchanged_and_touched_files_are_not_reparsed(docs, store):
+    html_dir, paths = docs
+    assert store.index_directory(html_dir, workers=1)['parsed'] == 2
+
+    summary = store.index_directory(html_dir, workers=1)
+    assert (summary['parsed'], summary['unchanged']) == (0, 2)
+
+    # Same bytes, new mtime: hashed but not parsed again
+    os.utime(paths['report'], (1, 1))
+    summary = store.index_directory(html_dir, workers=1)
+    assert (summary['parsed'], summary['unchanged'], summary['objects']) == (0, 2, 3)
+
+
+def test_changed_file_replaces_its_definitions(docs, store):
+    html_dir, paths = docs
+    store.index_directory(html_dir, workers=1)
+
+    write(paths['metrics'], (COST, 'Cost', 'Sum(Cost) + Sum(Freight)'), mtime=2_000_000_000)
+    summary = store.index_directory(html_dir, workers=1)
+
+    assert summary['parsed'] == 1
+    assert store.get(COST)['expression'] == 'Sum(Cost) + Sum(Freight)'
+    # Revenue is still documented by report.html
+    assert store.get(REVENUE)['source_path'] == paths['report']
+    assert store.dependencies(REVENUE) == []
+    assert store.dependents(COST) == [MARGIN]
+
+
+def test_deleting_a_file_keeps_objects_other_files_document(docs, store):
+    html_dir, paths = docs
+    store.index_directory(html_dir, workers=1)
+    defining = store.get(REVENUE)['source_path']
+    remaining = next(path for path in paths.values() if path != defining)
+
+    os.remove(defining)
+    summary = store.index_directory(html_dir, workers=1)
+
+    assert summary['removed'] == 1 and summary['restored'] == 1
+    revenue = store.get(REVENUE)
+    assert revenue is not None and revenue['source_path'] == remaining
+    assert [obj['id'] for obj in store.search('Revenue')] == [REVENUE]
+    # Objects only the deleted file documented are gone, with their index entries
+    only_in_deleted = {COST} if defining == paths['metrics'] else {MARGIN}
+    for object_id in only_in_deleted:
+        assert store.get(object_id) is None
+    assert summary['objects'] == 2
+
+    os.remove(remaining)
+    summary = store.index_directory(html_dir, workers=1)
+    assert summary['objects'] == 0 and store.search('Revenue') == []
+    assert store.dependents(REGION) == []
+
+
+def test_store_without_object_links_is_backfilled(docs, tmp_path):
+    html_dir, _ = docs
+    db_path = str(tmp_path / 'old.db')
+    old = MetadataStore(db_path)
+    old.index_directory(html_dir, workers=1)
+    # As written before objects could be linked to several files
+    with old.conn:
+        old.conn.execute("DELETE FROM object_files")
+    old.close()
+
+    store = MetadataStore(db_path)
+    try:
+        links = store.conn.execute("SELECT COUNT(*) FROM object_files").fetchone()[0]
+        assert links == store.conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0] == 3
+    finally:
+        store.close()
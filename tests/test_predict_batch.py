@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+import flask_app
+
+
+def post_batch(client, body, content_type='application/json', **params):
+    response = client.post('/predict/batch', data=body, content_type=content_type, query_string=params)
+    return response.status_code, response.get_json()
+
+
+def test_batch_matches_single_predictions(client, records):
+    status, payload = post_batch(client, json.dumps(records))
+
+    assert status == 200
+    assert payload['count'] == payload['valid_count'] == len(records)
+    assert payload['errors'] == []
+    for record, prediction in zip(records[:4], payload['predictions']):
+        single = client.post('/predict', json=record).get_json()
+        assert single['prediction'] == pytest.approx(prediction)
+
+
+def test_invalid_rows_are_reported_by_index(client, records):
+    batch = [records[0], {k: v for k, v in records[1].items() if k != 'Product_MRP'},
+             dict(records[2], Product_Weight='heavy'), 'not a record', records[3]]
+
+    status, payload = post_batch(client, json.dumps(batch))
+
+    assert status == 200
+    assert payload['valid_count'] == 2
+    assert [p is None for p in payload['predictions']] == [False, True, True, True, False]
+    errors = {e['index']: e['error'] for e in payload['errors']}
+    assert "Missing required features: ['Product_MRP']" in errors[1]
+    assert "Non-numeric values for: ['Product_Weight']" in errors[2]
+    assert errors[3] == "Record must be a JSON object"
+
+
+def test_ndjson_and_wrapped_bodies(client, records):
+    ndjson = '\n'.join(json.dumps(r) for r in records[:5]) + '\n\n'
+    _, from_array = post_batch(client, json.dumps(records[:5]))
+    status, from_ndjson = post_batch(client, ndjson, 'application/x-ndjson')
+    _, from_wrapped = post_batch(client, json.dumps({"records": records[:5]}))
+
+    assert status == 200
+    assert from_ndjson['predictions'] == from_array['predictions'] == from_wrapped['predictions']
+
+
+def test_malformed_ndjson_line_is_rejected(client, records):
+    body = json.dumps(records[0]) + '\n{"Product_Weight": \n'
+
+    status, payload = post_batch(client, body, 'application/x-ndjson')
+
+    assert status == 400
+    assert payload['error'].startswith('Invalid request body')
+
+
+@pytest.mark.parametrize('body', ['[]', '{"records": {}}', 'not json'])
+def test_empty_or_unreadable_batch_is_rejected(client, body):
+    status, payload = post_batch(client, body)
+
+    assert status == 400
+    assert payload['error'] == "Expected a non-empty array of records"
+
+
+def test_chunking_does_not_change_predictions(client, records):
+    _, whole = post_batch(client, json.dumps(records))
+    _, chunked = post_batch(client, json.dumps(records), chunk_size=3)
+
+    assert chunked['predictions'] == pytest.approx(whole['predictions'])
+
+
+@pytest.mark.parametrize('chunk_size', ['0', '-5', 'abc', '2.5', ''])
+def test_chunk_size_must_be_a_positive_integer(client, records, chunk_size):
+    status, payload = post_batch(client, json.dumps(records), chunk_size=chunk_size)
+
+    assert status == 400
+    assert 'chunk_size must be a positive integer' in payload['error']
+
+
+def test_validate_frame_normalizes_types(serving, records):
+    import pandas as pd
+
+    df = pd.DataFrame(records[:3]).astype({'Product_MRP': str})
+    features, valid, errors = flask_app.validate_frame(df)
+
+    assert valid.all() and errors == [None] * 3
+    assert features['Product_MRP'].dtype.kind == 'f'
+    assert list(features.columns) == flask_app.feature_names
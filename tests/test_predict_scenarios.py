@@ -0,0 +1,75 @@
+import itertools
+
+import pytest
+
+
+def post_scenarios(client, body, **params):
+    response = client.post('/predict/scenarios', json=body, query_string=params)
+    return response.status_code, response.get_json()
+
+
+def test_grid_matches_the_batch_endpoint(client, records):
+    base = records[5]
+    sweeps = {'Product_MRP': {'start': 50, 'stop': 250, 'step': 50},
+              'Store_Type': ['Grocery Store', 'Supermarket Type1', 'Supermarket Type2']}
+    status, payload = post_scenarios(client, {'base': base, 'sweeps': sweeps})
+
+    assert status == 200
+    assert payload['shape'] == [5, 3] and payload['count'] == 15
+    mrps, stores = [axis['values'] for axis in payload['axes']]
+    assert mrps == [50.0, 100.0, 150.0, 200.0, 250.0]
+    grid = [dict(base, Product_MRP=mrp, Store_Type=store) for mrp, store in itertools.product(mrps, stores)]
+    batch = client.post('/predict/batch', json=grid).get_json()['predictions']
+    flat = [value for row in payload['predictions'] for value in row]
+    assert flat == pytest.approx(batch, abs=1e-4)
+
+
+def test_num_ranges_include_both_ends(client, records):
+    status, payload = post_scenarios(client, {'base': records[0],
+                                              'sweeps': {'Product_Weight': {'start': 5, 'stop': 15, 'num': 3}}})
+
+    assert status == 200 and payload['axes'][0]['values'] == [5.0, 10.0, 15.0]
+    assert len(payload['predictions']) == 3
+
+
+def test_grid_size_is_limited(client, serving, records, monkeypatch):
+    monkeypatch.setattr(serving, 'SCENARIO_MAX_POINTS', 100)
+    base = records[0]
+
+    # Each axis fits, their product does not
+    status, payload = post_scenarios(client, {'base': base, 'sweeps': {
+        'Product_MRP': {'start': 0, 'stop': 19, 'step': 1},
+        'Product_Weight': {'start': 0, 'stop': 9, 'step': 1}}})
+    assert status == 400 and '200 points' in payload['error']
+
+    status, payload = post_scenarios(client, {'base': base, 'sweeps': {
+        'Product_MRP': {'start': 0, 'stop': 1000, 'step': 1}}})
+    assert status == 400 and 'exceeds 100 points' in payload['error']
+
+    status, payload = post_scenarios(client, {'base': base, 'sweeps': {
+        'Product_MRP': {'start': 0, 'stop': 1, 'num': 101}}})
+    assert status == 400 and 'between 1 and 100' in payload['error']
+
+
+@pytest.mark.parametrize('sweeps, message', [
+    ({'Colour': ['red']}, 'unknown features'),
+    ({'Store_Type': {'start': 0, 'stop': 1, 'step': 1}}, 'only supported'),
+    ({'Product_MRP': {'start': 0, 'stop': 1, 'step': 0}}, 'positive'),
+    ({'Product_MRP': {'start': 0}}, 'missing'),
+    ({'Product_MRP': []}, 'no values'),
+    ({'Product_MRP': ['cheap']}, 'Non-numeric'),
+])
+def test_invalid_sweeps_are_rejected(client, records, sweeps, message):
+    status, payload = post_scenarios(client, {'base': records[0], 'sweeps': sweeps})
+
+    assert status == 400 and message in payload['error']
+
+
+def test_base_must_cover_the_other_features(client, records):
+    base = dict(records[0])
+    del base['Store_Size']
+    status, payload = post_scenarios(client, {'base': base, 'sweeps': {'Product_MRP': [100]}})
+    assert status == 400 and 'Store_Size' in payload['error']
+
+    status, _ = post_scenarios(client, {'base': records[0]})
+    assert status == 400
@@ -0,0 +1,74 @@
+import time
+
+import pandas as pd
+import pytest
+
+from prediction_cache import PredictionCache
+
+FEATURES = ['Product_MRP', 'Store_Type']
+
+
+def make_cache(**kwargs):
+    return PredictionCache(FEATURES, ['Product_MRP'], **kwargs)
+
+
+def test_key_is_canonical():
+    cache = make_cache()
+
+    assert cache.key({'Product_MRP': 100, 'Store_Type': 'A'}) == \
+        cache.key({'Store_Type': 'A', 'Product_MRP': '100.0', 'extra': 1})
+    assert cache.key({'Product_MRP': 100.0, 'Store_Type': 'A'}) != \
+        cache.key({'Product_MRP': 100.01, 'Store_Type': 'A'})
+    rounded = make_cache(precision=1)
+    assert rounded.key({'Product_MRP': 100.01, 'Store_Type': 'A'}) == \
+        rounded.key({'Product_MRP': 99.99, 'Store_Type': 'A'})
+
+
+def test_version_change_flushes_and_rekeys():
+    version = ['v1']
+    cache = make_cache(version_fn=lambda: version[0], version_check_interval=3600)
+    record = {'Product_MRP': 10.0, 'Store_Type': 'A'}
+    old_key = cache.key(record)
+    cache.set(old_key, 1.5)
+    assert cache.get(old_key) == 1.5
+
+    version[0] = 'v2'
+    # Not polled yet: the interval has not passed
+    assert cache.key(record) == old_key
+    cache.refresh_version()
+
+    assert cache.key(record) != old_key
+    assert cache.get(old_key) is None
+    assert cache.stats()['invalidations'] == 1 and cache.stats()['size'] == 0
+
+
+def test_entries_expire_and_lru_evicts():
+    cache = make_cache(maxsize=2, ttl=0.05)
+    keys = [cache.key({'Product_MRP': float(i), 'Store_Type': 'A'}) for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.set(key, float(i))
+
+    assert cache.get(keys[0]) is None
+    assert cache.stats()['evictions'] == 1
+    time.sleep(0.06)
+    assert cache.get(keys[2]) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_served_predictions_follow_a_reload(client, serving, second_version, records):
+    cache = serving.prediction_cache
+    record = records[3]
+    first = client.post('/predict', json=record).get_json()
+    hits = cache.stats()['hits']
+    assert client.post('/predict', json=record).get_json()['prediction'] == first['prediction']
+    assert cache.stats()['hits'] == hits + 1
+
+    invalidations = cache.stats()['invalidations']
+    response = client.post('/admin/reload', headers={'X-Admin-Token': 'test-admin-token'})
+    assert response.status_code == 200
+
+    after = client.post('/predict', json=record).get_json()
+    assert cache.stats()['invalidations'] == invalidations + 1
+    assert after['model_version'] == 'v2'
+    X = second_version.preprocessor.transform(pd.DataFrame([record], columns=serving.feature_names))
+    assert after['prediction'] == pytest.approx(second_version.model.predict(X)[0])
@@ -0,0 +1,87 @@
+import json
+import time
+
+import pytest
+
+import Report_Build
+from mstr_stub import MstrStub
+
+USER_INFO = {'loginMode': 1, 'username': 'administrator', 'password': 'secret'}
+PROJECT_ID = 'B19DEDCC11D4E0EFC000EB9495D0F44F'
+
+
+@pytest.fixture
+def stub():
+    server = MstrStub(USER_INFO).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(stub):
+    return Report_Build.MstrClient({'BASE_URL': stub.base_url}, USER_INFO, PROJECT_ID,
+                                   max_retries=3, backoff=0.01)
+
+
+def write_payloads(directory, count):
+    for i in range(count):
+        (directory / f"report_{i:02d}.json").write_text(json.dumps({"name": f"Report {i}"}))
+    return str(directory)
+
+
+def test_expired_token_is_renewed_once_for_all_threads(stub, client, tmp_path):
+    source = write_payloads(tmp_path, 8)
+    client.login()
+    stub.expire_tokens()
+
+    summary = Report_Build.run_bulk(client, source, Report_Build.Journal(str(tmp_path / 'j.ndjson')),
+                                    concurrency=4)
+
+    assert summary['saved'] == 8 and summary['failed'] == 0
+    # One login from run_bulk, then one renewal for every thread that hit the expiry
+    assert stub.logins == 2 and client.logins == 2
+    assert len(stub.saved) == 8
+
+
+def test_retry_after_pauses_before_the_retry(stub, client):
+    client.login()
+    stub.fail_next(r'^/api/model/reports$', 429, {'Retry-After': '1'})
+
+    started = time.monotonic()
+    report_id, instance_id = client.create_report({"name": "Paused"})
+
+    attempts = stub.requests_to('/api/model/reports')
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.95
+    assert time.monotonic() - started >= 0.95
+    assert stub.instances[report_id] == instance_id
+
+
+def test_client_error_is_not_retried(stub, client):
+    client.login()
+    stub.fail_next(r'^/api/model/reports$', 400)
+
+    with pytest.raises(Report_Build.ReportBuildError):
+        client.create_report({"name": "Bad"})
+    assert len(stub.requests_to('/api/model/reports')) == 1
+
+
+def test_rerun_resumes_after_failed_reports(stub, client, tmp_path):
+    payloads = tmp_path / 'payloads'
+    payloads.mkdir()
+    source = write_payloads(payloads, 5)
+    journal = Report_Build.Journal(str(tmp_path / 'journal.ndjson'))
+    # The third report is created but the server refuses to save it
+    stub.fail_next(r'/instances/save$', 403, after=2)
+
+    first = Report_Build.run_bulk(client, source, journal, concurrency=1)
+    assert first['saved'] == 4 and first['failed'] == 1
+    assert journal.saved_keys() == {'report_00.json', 'report_01.json', 'report_03.json', 'report_04.json'}
+
+    second = Report_Build.run_bulk(client, source, journal, concurrency=1)
+    assert (second['saved'], second['failed'], second['skipped']) == (1, 0, 4)
+    # Only the failed payload was created again
+    assert [payload['name'] for _, payload in stub.created] == [
+        'Report 0', 'Report 1', 'Report 2', 'Report 3', 'Report 4', 'Report 2']
+    assert len(stub.saved) == 5
+    assert journal.saved_keys() == {f"report_{i:02d}.json" for i in range(5)}
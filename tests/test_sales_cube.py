@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import sales_cube
+from superkart_options import TARGET
+
+
+def write_rows(path, df, header=False, mode='a', trailing_newline=True):
+    text = df.to_csv(index=False, header=header, lineterminator='\n')
+    if not trailing_newline:
+        text = text.rstrip('\n')
+    with open(path, mode, newline='') as f:
+        f.write(text)
+
+
+def sorted_cube(cube):
+    return cube.sort_values(sales_cube.DIMENSIONS).reset_index(drop=True)
+
+
+def assert_same_cube(actual, expected):
+    actual, expected = sorted_cube(actual), sorted_cube(expected)
+    pd.testing.assert_frame_equal(actual[sales_cube.DIMENSIONS], expected[sales_cube.DIMENSIONS])
+    for column in ('count', 'sales_min', 'sales_max'):
+        np.testing.assert_array_equal(actual[column], expected[column])
+    for column in ('sales_sum', 'sales_sumsq', 'mrp_sum'):
+        np.testing.assert_allclose(actual[column], expected[column], rtol=1e-12)
+    np.testing.assert_array_equal(np.stack(actual['sketch']), np.stack(expected['sketch']))
+
+
+@pytest.fixture
+def rows(make_frame):
+    return make_frame(900, seed=5)
+
+
+def test_appended_batches_match_a_full_rebuild(rows, tmp_path):
+    csv_path, cube_path = str(tmp_path / 'sales.csv'), str(tmp_path / 'cube.parquet')
+    write_rows(csv_path, rows.iloc[:300], header=True, mode='w')
+    assert sales_cube.update_cube(csv_path, cube_path, chunk_size=64)['rows'] == 300
+
+    # A half-written last line is left for the next run
+    write_rows(csv_path, rows.iloc[300:650], trailing_newline=False)
+    assert sales_cube.update_cube(csv_path, cube_path, chunk_size=64)['rows'] == 649
+    with open(csv_path, 'a', newline='') as f:
+        f.write('\n')
+    write_rows(csv_path, rows.iloc[650:])
+    metadata = sales_cube.update_cube(csv_path, cube_path, chunk_size=64)
+
+    rebuilt_path = str(tmp_path / 'rebuilt.parquet')
+    sales_cube.update_cube(csv_path, rebuilt_path, rebuild=True)
+    assert metadata['rows'] == len(rows)
+    assert_same_cube(sales_cube.read_cube(cube_path), sales_cube.read_cube(rebuilt_path))
+
+
+def test_last_row_without_newline_is_counted_once(rows, tmp_path):
+    csv_path, cube_path = str(tmp_path / 'sales.csv'), str(tmp_path / 'cube.parquet')
+    write_rows(csv_path, rows.iloc[:2], header=True, mode='w', trailing_newline=False)
+    assert sales_cube.update_cube(csv_path, cube_path)['rows'] == 2
+
+    write_rows(csv_path, rows.iloc[:300], header=True, mode='w')
+    assert sales_cube.update_cube(csv_path, cube_path)['rows'] == 300
+    write_rows(csv_path, rows.iloc[300:302], trailing_newline=False)
+    # The file just grew, so its last line may still be being written
+    assert sales_cube.update_cube(csv_path, cube_path)['rows'] == 301
+    # It has not grown since: the row is complete, and counted only once
+    assert sales_cube.update_cube(csv_path, cube_path)['rows'] == 302
+    assert sales_cube.update_cube(csv_path, cube_path)['rows'] == 302
+
+    with open(csv_path, 'a', newline='') as f:
+        f.write('\n')
+    write_rows(csv_path, rows.iloc[302:400])
+    assert sales_cube.update_cube(csv_path, cube_path)['rows'] == 400
+    rebuilt_path = str(tmp_path / 'rebuilt.parquet')
+    sales_cube.update_cube(csv_path, rebuilt_path, rebuild=True)
+    assert_same_cube(sales_cube.read_cube(cube_path), sales_cube.read_cube(rebuilt_path))
+
+
+def test_roll_up_matches_pandas(rows, tmp_path):
+    csv_path, cube_path = str(tmp_path / 'sales.csv'), str(tmp_path / 'cube.parquet')
+    write_rows(csv_path, rows, header=True, mode='w')
+    sales_cube.update_cube(csv_path, cube_path)
+
+    result = sales_cube.slice_cube(sales_cube.read_cube(cube_path), by=['Store_Type'],
+                                   filters={'Store_Size': ['Small', 'High']})
+
+    subset = rows[rows['Store_Size'].isin(['Small', 'High'])]
+    expected = subset.groupby('Store_Type')[TARGET].agg(['count', 'mean', 'std', 'min', 'max'])
+    assert [r['Store_Type'] for r in result] == list(expected.index)
+    for row, (_, stats) in zip(result, expected.iterrows()):
+        assert row['count'] == stats['count']
+        assert row['sales_mean'] == pytest.approx(stats['mean'], abs=0.01)
+        assert row['sales_std'] == pytest.approx(stats['std'], abs=0.01)
+        assert (row['sales_min'], row['sales_max']) == pytest.approx((stats['min'], stats['max']))
+        assert row['sales_min'] <= row['sales_p10'] <= row['sales_p50'] <= row['sales_p90'] <= row['sales_max']
+
+
+def test_rewritten_source_is_rebuilt(rows, tmp_path):
+    csv_path, cube_path = str(tmp_path / 'sales.csv'), str(tmp_path / 'cube.parquet')
+    write_rows(csv_path, rows.iloc[:400], header=True, mode='w')
+    sales_cube.update_cube(csv_path, cube_path)
+
+    write_rows(csv_path, rows.iloc[400:700], header=True, mode='w')
+    metadata = sales_cube.update_cube(csv_path, cube_path)
+
+    assert metadata['rows'] == 300
+    assert sales_cube.read_cube(cube_path)['count'].sum() == 300
+
+
+def test_header_only_source_and_notebook_column_names(rows, tmp_path):
+    notebook = rows.rename(columns={'Store_Location_Type': 'Store_Location_City_Type',
+                                    'Product_Visibility': 'Product_Allocated_Area'})
+    csv_path, cube_path = str(tmp_path / 'sales.csv'), str(tmp_path / 'cube.parquet')
+    write_rows(csv_path, notebook.iloc[:0], header=True, mode='w')
+    metadata = sales_cube.update_cube(csv_path, cube_path)
+    assert metadata['rows'] == 0 and metadata['cells'] == 0
+
+    write_rows(csv_path, notebook.iloc[:200])
+    assert sales_cube.update_cube(csv_path, cube_path)['rows'] == 200
+    cube = sales_cube.read_cube(cube_path)
+    assert set(cube['Store_Location_Type']) <= set(rows['Store_Location_Type'])
+
+
+def test_analytics_endpoint(client, serving, rows, tmp_path, monkeypatch):
+    monkeypatch.setattr(serving, 'SALES_CUBE_PATH', str(tmp_path / 'missing.parquet'))
+    assert client.get('/analytics/cube').status_code == 503
+
+    csv_path, cube_path = str(tmp_path / 'sales.csv'), str(tmp_path / 'cube.parquet')
+    write_rows(csv_path, rows, header=True, mode='w')
+    sales_cube.update_cube(csv_path, cube_path)
+    monkeypatch.setattr(serving, 'SALES_CUBE_PATH', cube_path)
+
+    payload = client.get('/analytics/cube?by=Store_Type').get_json()
+    assert payload['source_rows'] == len(rows)
+    assert sum(group['count'] for group in payload['rows']) == len(rows)
+    filtered = client.get('/analytics/cube?by=Store_Size&Store_Type=Supermarket%20Type1').get_json()
+    assert sum(group['count'] for group in filtered['rows']) == (rows['Store_Type'] == 'Supermarket Type1').sum()
+    assert client.get('/analytics/cube?by=Colour').status_code == 400
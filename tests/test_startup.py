@@ -0,0 +1,84 @@
+import sys
+import threading
+
+import pytest
+
+import startup
+
+
+@pytest.fixture
+def fresh_startup(serving, monkeypatch):
+    state = startup.Startup()
+    monkeypatch.setattr(serving, 'startup_state', state)
+    return state
+
+
+def test_ready_waits_for_warm_up_but_live_does_not(serving, client, fresh_startup, monkeypatch):
+    release = threading.Event()
+    warm_up = serving.warm_up
+
+    def slow_warm_up():
+        assert release.wait(10)
+        return warm_up()
+    monkeypatch.setattr(serving, 'STARTUP_WARMUP', True)
+    monkeypatch.setattr(serving, 'warm_up', slow_warm_up)
+
+    thread = serving.start()
+    try:
+        assert client.get('/live').status_code == 200
+        response = client.get('/ready')
+        assert response.status_code == 503
+        payload = response.get_json()
+        assert payload['ready'] is False and payload['startup']['state'] == startup.STARTING
+        assert client.get('/').get_json()['status'] == startup.STARTING
+    finally:
+        release.set()
+        thread.join(30)
+
+    response = client.get('/ready')
+    assert response.status_code == 200 and response.get_json()['model_version'] == 'v1'
+    assert set(response.get_json()['startup']['phases']) >= {'imports', 'deferred_imports', 'model_load', 'warm_up'}
+    assert client.get('/').get_json()['status'] == 'healthy'
+
+
+def test_failed_startup_stays_unready(serving, client, fresh_startup):
+    def broken():
+        raise RuntimeError("disk on fire")
+
+    fresh_startup.run([('model_load', broken)], background=False)
+
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.get_json()['startup']['error'] == "disk on fire"
+    assert client.get('/live').status_code == 200
+    assert client.get('/').get_json()['status'] == startup.FAILED
+
+
+def test_step_returning_false_fails_startup(fresh_startup):
+    fresh_startup.run([('ok', lambda: True), ('model_load', lambda: False)], background=False)
+
+    assert fresh_startup.state == startup.FAILED and 'model_load' in fresh_startup.error
+    # Only once per process
+    assert fresh_startup.run([('ok', lambda: True)], background=False) is None
+    assert fresh_startup.state == startup.FAILED
+
+
+def test_warm_up_runs_every_request_path(serving):
+    assert serving.warm_up() is True
+
+
+def test_lazy_import_defers_the_module_body(tmp_path, monkeypatch):
+    (tmp_path / 'slow_to_import.py').write_text("import sys\nsys.slow_to_import_ran = True\nVALUE = 42\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'slow_to_import', raising=False)
+
+    module = startup.lazy_import('slow_to_import')
+    try:
+        assert not getattr(sys, 'slow_to_import_ran', False)
+        assert module.VALUE == 42
+        assert sys.slow_to_import_ran is True
+    finally:
+        sys.modules.pop('slow_to_import', None)
+        if hasattr(sys, 'slow_to_import_ran'):
+            del sys.slow_to_import_ran
+    assert startup.lazy_import('no_such_module_anywhere') is None
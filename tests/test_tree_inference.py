@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import scipy.sparse
+
+import tree_inference
+from tree_inference import FlatForest, compile_model, probe_matrix
+
+
+def test_flat_forest_matches_random_forest(artifacts, make_frame):
+    flat = FlatForest.from_model(artifacts.model)
+    X = artifacts.preprocessor.transform(make_frame(500, seed=3))
+
+    np.testing.assert_allclose(flat.predict(X), artifacts.model.predict(X), rtol=1e-9, atol=1e-6)
+    assert flat.n_trees == len(artifacts.model.estimators_)
+    assert flat.n_features == X.shape[1]
+
+
+def test_sparse_input_and_chunked_traversal(artifacts, monkeypatch):
+    flat = FlatForest.from_model(artifacts.model)
+    X = probe_matrix(flat.n_features, n_rows=300, seed=1)
+    # Several traversal chunks, including a short last one
+    monkeypatch.setattr(tree_inference, 'TRAVERSAL_CHUNK_ROWS', 64)
+
+    expected = artifacts.model.predict(X)
+    np.testing.assert_allclose(flat.predict(X), expected, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(flat.predict(scipy.sparse.csr_matrix(X)), expected, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(flat.tree_predictions(X).mean(axis=1), expected, rtol=1e-9, atol=1e-6)
+
+
+def test_flat_forest_matches_xgboost_with_missing_values(artifacts):
+    xgboost = pytest.importorskip('xgboost')
+    model = xgboost.XGBRegressor(n_estimators=15, max_depth=4, learning_rate=0.3)
+    X = np.asarray(artifacts.X, dtype=np.float64)
+    model.fit(X, artifacts.frame['Product_Store_Sales_Total'])
+    X_test = probe_matrix(X.shape[1], n_rows=200, seed=2)
+    X_test[::7, 0] = np.nan
+
+    flat = FlatForest.from_model(model)
+
+    np.testing.assert_allclose(flat.predict(X_test), model.predict(X_test), rtol=1e-5, atol=1e-2)
+
+
+def test_wrong_width_is_rejected(artifacts):
+    flat = FlatForest.from_model(artifacts.model)
+
+    with pytest.raises(ValueError):
+        flat.predict(np.zeros((2, flat.n_features + 1)))
+
+
+def test_unsupported_model_keeps_predict(artifacts):
+    from sklearn.linear_model import LinearRegression
+
+    model = LinearRegression().fit(artifacts.X, artifacts.frame['Product_Store_Sales_Total'])
+
+    assert compile_model(model) is None
+    assert compile_model(artifacts.model) is not None
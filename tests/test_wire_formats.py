@@ -0,0 +1,113 @@
+import json
+
+import msgpack
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import wire_formats
+from wire_formats import ARROW_FILE_MIMETYPE, ARROW_STREAM_MIMETYPE, JSON_MIMETYPE, MSGPACK_MIMETYPE
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, JSON_MIMETYPE),
+    ('*/*', JSON_MIMETYPE),
+    ('application/x-msgpack', MSGPACK_MIMETYPE),
+    ('application/json;q=0.5, application/msgpack', MSGPACK_MIMETYPE),
+    ('application/msgpack;q=0.2, application/json', JSON_MIMETYPE),
+    (ARROW_FILE_MIMETYPE, ARROW_STREAM_MIMETYPE),
+    ('text/csv, */*;q=0.1', JSON_MIMETYPE),
+    ('text/csv', None),
+    ('application/json;q=0', None),
+])
+def test_negotiate(accept, expected):
+    assert wire_formats.negotiate(accept) == expected
+
+
+def read_arrow_response(response):
+    reader = pa.ipc.open_stream(pa.BufferReader(response.data))
+    table = reader.read_all()
+    metadata = {k.decode(): json.loads(v) for k, v in (table.schema.metadata or {}).items()}
+    return table.to_pandas(), metadata
+
+
+def test_msgpack_round_trip(client, records):
+    expected = client.post('/predict', json=records[2]).get_json()
+
+    response = client.post('/predict?echo=false', data=msgpack.packb(records[2]),
+                           content_type=MSGPACK_MIMETYPE, headers={'Accept': MSGPACK_MIMETYPE})
+
+    assert response.status_code == 200 and response.mimetype == MSGPACK_MIMETYPE
+    payload = msgpack.unpackb(response.data)
+    assert payload['prediction'] == pytest.approx(expected['prediction'])
+    assert 'input_data' not in payload and 'input_data' in expected
+
+
+def test_arrow_batch_round_trip(client, records):
+    batch = [dict(r) for r in records[:6]]
+    batch[4]['Product_MRP'] = 'not a number'
+    expected = client.post('/predict/batch', json=batch).get_json()
+
+    frame = pd.DataFrame(batch)
+    body = wire_formats.write_arrow({c: frame[c].astype(str).tolist() if c == 'Product_MRP' else frame[c].tolist()
+                                     for c in frame.columns})
+    response = client.post('/predict/batch', data=body, content_type=ARROW_STREAM_MIMETYPE,
+                           headers={'Accept': ARROW_STREAM_MIMETYPE})
+
+    assert response.status_code == 200 and response.mimetype == ARROW_STREAM_MIMETYPE
+    columns, metadata = read_arrow_response(response)
+    assert metadata['count'] == 6 and metadata['valid_count'] == 5
+    assert columns['prediction'].tolist()[:4] == pytest.approx(expected['predictions'][:4])
+    assert pd.isna(columns['prediction'][4]) and 'Product_MRP' in columns['error'][4]
+
+
+def test_arrow_scenario_response(client, records):
+    body = {'base': records[0], 'sweeps': {'Product_MRP': [100, 200], 'Store_Size': ['Small', 'High']}}
+    expected = client.post('/predict/scenarios', json=body).get_json()
+
+    response = client.post('/predict/scenarios', json=body, headers={'Accept': ARROW_STREAM_MIMETYPE})
+
+    columns, metadata = read_arrow_response(response)
+    assert metadata['shape'] == [2, 2]
+    assert columns['Product_MRP'].tolist() == [100, 100, 200, 200]
+    assert columns['Store_Size'].tolist() == ['Small', 'High', 'Small', 'High']
+    assert columns['prediction'].tolist() == pytest.approx(sum(expected['predictions'], []))
+
+
+def test_errors_are_never_arrow(client):
+    response = client.post('/predict/batch', json=[], headers={'Accept': ARROW_STREAM_MIMETYPE})
+
+    assert response.status_code == 400 and response.mimetype == JSON_MIMETYPE
+
+
+def test_missing_codec_is_415(client, records, monkeypatch):
+    monkeypatch.setattr(wire_formats, 'msgpack', None)
+
+    response = client.post('/predict', data=msgpack.packb(records[0]), content_type=MSGPACK_MIMETYPE)
+
+    assert response.status_code == 415 and 'MessagePack' in response.get_json()['error']
+    # Without the package MessagePack is no longer offered either
+    assert client.post('/predict', json=records[0],
+                       headers={'Accept': MSGPACK_MIMETYPE}).status_code == 406
+
+
+@pytest.mark.parametrize('path', ['/predict', '/predict/batch'])
+def test_unacceptable_accept_is_406(client, records, path):
+    body = records[0] if path == '/predict' else records[:2]
+    response = client.post(path, json=body, headers={'Accept': 'text/csv'})
+
+    assert response.status_code == 406 and response.mimetype == JSON_MIMETYPE
+    assert MSGPACK_MIMETYPE in response.get_json()['available']
+
+
+def test_asgi_negotiates_the_same_way(serving, records):
+    from test_asgi_app import call
+
+    status, headers, body = call('POST', '/predict', msgpack.packb(records[1]),
+                                 headers=[(b'content-type', MSGPACK_MIMETYPE.encode()),
+                                          (b'accept', MSGPACK_MIMETYPE.encode())])
+    assert status == 200 and headers[b'content-type'] == MSGPACK_MIMETYPE.encode()
+    assert 'prediction' in msgpack.unpackb(body)
+
+    status, _, body = call('POST', '/predict', json.dumps(records[1]).encode(), headers=[(b'accept', b'text/csv')])
+    assert status == 406 and json.loads(body)['available'][0] == JSON_MIMETYPE
@@ -0,0 +1,270 @@
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows evaluated per traversal pass; bounds the (rows x trees) scratch arrays
+TRAVERSAL_CHUNK_ROWS = 4096
+
+
+# Node arrays that make up a FlatForest, in the order they are stored on disk
+ARRAY_FIELDS = ('feature', 'threshold', 'left', 'right', 'value', 'default_left',
+                'roots', 'is_leaf', 'children')
+
+
+class FlatForest:
+    """A fitted tree ensemble flattened into contiguous NumPy arrays.
+
+    All trees share one set of node arrays (feature, threshold, left, right,
+    value, default_left); ``roots`` holds each tree's first node and leaves
+    point back to themselves. Prediction advances every (row, tree) pair one
+    level per step with array ops, dropping pairs as they reach a leaf, so
+    there is no per-node Python work. A row goes left when
+    ``x <= threshold`` (or when ``x`` is NaN and ``default_left`` is set).
+    """
+
+    def __init__(self, feature, threshold, left, right, value, default_left, roots,
+                 max_depth, aggregate='mean', base_score=0.0, n_features=None, source=None,
+                 is_leaf=None, children=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        # Compact models keep float32 thresholds and leaf values to halve their memory
+        self.threshold = np.ascontiguousarray(threshold, dtype=_float_dtype(threshold))
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.right = np.ascontiguousarray(right, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=_float_dtype(value))
+        self.default_left = np.ascontiguousarray(default_left, dtype=bool)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.aggregate = aggregate
+        self.base_score = float(base_score)
+        self.n_features = n_features
+        self.source = source
+        if is_leaf is None:
+            is_leaf = self.left == np.arange(len(self.left))
+        self.is_leaf = np.ascontiguousarray(is_leaf, dtype=bool)
+        if children is None:
+            # children[2 * node] is the left child, children[2 * node + 1] the right
+            children = np.stack([self.left, self.right], axis=1).ravel()
+        self.children = np.ascontiguousarray(children, dtype=np.intp)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @classmethod
+    def from_model(cls, model):
+        """Flatten a fitted RandomForestRegressor or XGBRegressor"""
+        kind = type(model).__name__
+        if hasattr(model, 'estimators_'):
+            return cls.from_sklearn_forest(model)
+        if hasattr(model, 'get_booster'):
+            return cls.from_xgboost(model)
+        raise ValueError(f"Unsupported model type for flat inference: {kind}")
+
+    @classmethod
+    def from_sklearn_forest(cls, model):
+        """Flatten a fitted sklearn forest regressor (single output)"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Only single-output forests are supported")
+
+        features, thresholds, lefts, rights, values, default_lefts, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            node_ids = np.arange(n)
+            is_leaf = tree.children_left < 0
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            threshold = np.where(is_leaf, np.inf, tree.threshold)
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+            missing_left = getattr(tree, 'missing_go_to_left', None)
+            if missing_left is None:
+                missing_left = np.zeros(n, dtype=bool)
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(tree.value.reshape(n, -1)[:, 0])
+            default_lefts.append(np.asarray(missing_left, dtype=bool) | is_leaf)
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+                   np.concatenate(rights), np.concatenate(values), np.concatenate(default_lefts),
+                   roots, max_depth, aggregate='mean', n_features=model.n_features_in_,
+                   source=type(model).__name__)
+
+    @classmethod
+    def from_xgboost(cls, model):
+        """Flatten a fitted XGBRegressor from its JSON tree dump"""
+        booster = model.get_booster()
+        config = json.loads(booster.save_config())
+        learner = config['learner']
+        objective = learner['objective']['name']
+        if objective not in ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror'):
+            raise ValueError(f"Unsupported XGBoost objective: {objective}")
+        base_score = float(learner['learner_model_param']['base_score'])
+
+        dumps = booster.get_dump(dump_format='json')
+        try:
+            best_iteration = model.best_iteration
+        except AttributeError:
+            best_iteration = None
+        if best_iteration is not None:
+            trees_per_round = int(learner['gradient_booster']['gbtree_model_param'].get('num_parallel_tree', 1))
+            dumps = dumps[:(best_iteration + 1) * trees_per_round]
+
+        names = booster.feature_names
+        name_to_index = {name: i for i, name in enumerate(names)} if names else None
+
+        features, thresholds, lefts, rights, values, default_lefts, roots = [], [], [], [], [], [], []
+        max_depth = 0
+        for dump in dumps:
+            root = len(features)
+            roots.append(root)
+            # Node ids in the dump are per tree; assign global ids in visit order
+            stack = [(json.loads(dump), 0)]
+            ids = {}
+            pending = []
+            while stack:
+                node, depth = stack.pop()
+                ids[node['nodeid']] = len(features)
+                features.append(0)
+                thresholds.append(np.inf)
+                lefts.append(0)
+                rights.append(0)
+                values.append(0.0)
+                default_lefts.append(True)
+                pending.append((node, depth))
+                for child in node.get('children', []):
+                    stack.append((child, depth + 1))
+
+            for node, depth in pending:
+                index = ids[node['nodeid']]
+                max_depth = max(max_depth, depth)
+                if 'leaf' in node:
+                    lefts[index] = rights[index] = index
+                    values[index] = node['leaf']
+                    continue
+                split = node['split']
+                features[index] = name_to_index[split] if name_to_index else int(split[1:])
+                # XGBoost goes left on x < t (in float32); express that as x <= t'
+                thresholds[index] = float(np.nextafter(np.float32(node['split_condition']),
+                                                       np.float32(-np.inf)))
+                lefts[index] = ids[node['yes']]
+                rights[index] = ids[node['no']]
+                default_lefts[index] = node['missing'] == node['yes']
+
+        return cls(features, thresholds, lefts, rights, values, default_lefts, roots,
+                   max_depth, aggregate='sum', base_score=base_score,
+                   n_features=getattr(model, 'n_features_in_', None), source=type(model).__name__)
+
+    def _leaf_values_chunk(self, X):
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        has_nan = bool(np.isnan(flat_x).any())
+
+        # One slot per (row, tree); slots are dropped once they reach a leaf
+        nodes = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, self.n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        for _ in range(self.max_depth):
+            if active.size == 0:
+                break
+            current = nodes[active]
+            x = flat_x[row_offset[active] + self.feature[current]]
+            go_right = x > self.threshold[current]
+            if has_nan:
+                go_right = np.where(np.isnan(x), ~self.default_left[current], go_right)
+            current = self.children[2 * current + go_right]
+            nodes[active] = current
+            active = active[~self.is_leaf[current]]
+
+        return self.value[nodes].reshape(n_rows, self.n_trees)
+
+    def _predict_chunk(self, X):
+        leaves = self._leaf_values_chunk(X)
+        if self.aggregate == 'mean':
+            return leaves.mean(axis=1, dtype=np.float64)
+        return leaves.sum(axis=1, dtype=np.float64) + self.base_score
+
+    def _as_input(self, X):
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+        # Both sklearn and XGBoost compare features in float32
+        X = np.ascontiguousarray(np.asarray(X, dtype=np.float32), dtype=np.float64)
+        if X.ndim != 2 or (self.n_features is not None and X.shape[1] != self.n_features):
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        return X
+
+    def tree_predictions(self, X):
+        """(rows, trees) matrix of every tree's leaf value, e.g. to score truncated ensembles"""
+        X = self._as_input(X)
+        out = np.empty((X.shape[0], self.n_trees), dtype=np.float64)
+        for start in range(0, X.shape[0], TRAVERSAL_CHUNK_ROWS):
+            stop = start + TRAVERSAL_CHUNK_ROWS
+            out[start:stop] = self._leaf_values_chunk(X[start:stop])
+        return out
+
+    def predict(self, X):
+        """Predict for a dense or sparse feature matrix"""
+        X = self._as_input(X)
+        if X.shape[0] <= TRAVERSAL_CHUNK_ROWS:
+            return self._predict_chunk(X)
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], TRAVERSAL_CHUNK_ROWS):
+            stop = start + TRAVERSAL_CHUNK_ROWS
+            out[start:stop] = self._predict_chunk(X[start:stop])
+        return out
+
+
+def _float_dtype(values):
+    return np.float32 if getattr(values, 'dtype', None) == np.float32 else np.float64
+
+
+def probe_matrix(n_features, n_rows=512, seed=0):
+    """Synthetic inputs for parity checks: scaled numerics and 0/1 indicators"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, n_features))
+    X[n_rows // 2:] = (X[n_rows // 2:] > 0.5).astype(np.float64)
+    return X
+
+
+def compile_model(model, X_probe=None, rtol=1e-5, atol=1e-3):
+    """Flatten ``model`` and verify it against ``model.predict`` on ``X_probe``.
+
+    ``X_probe`` defaults to probe_matrix() for the model's input width.
+
+    Returns None when the model type is unsupported or the predictions do not
+    match, in which case callers should keep calling ``model.predict``.
+    """
+    try:
+        flat = FlatForest.from_model(model)
+        if X_probe is None:
+            X_probe = probe_matrix(flat.n_features)
+        expected = np.asarray(model.predict(X_probe), dtype=np.float64).ravel()
+        actual = flat.predict(X_probe)
+    except Exception as e:
+        logger.warning(f"Flat tree inference unavailable, using model.predict: {str(e)}")
+        return None
+
+    if not np.allclose(expected, actual, rtol=rtol, atol=atol):
+        worst = float(np.max(np.abs(expected - actual)))
+        logger.warning(f"Flat tree inference failed parity check (max diff {worst}), "
+                       f"using model.predict")
+        return None
+
+    logger.info(f"Flat tree inference ready ({flat.n_trees} trees, {flat.n_nodes} nodes, "
+                f"depth {flat.max_depth})")
+    return flat
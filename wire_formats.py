@@ -0,0 +1,224 @@
+import io
+import json
+import logging
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+from startup import lazy_import
+
+logger = logging.getLogger(__name__)
+
+# Optional encoders: each format is only offered when its package is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+# pyarrow is heavy; it loads on the first Arrow body (or in the startup warm-up)
+pa = lazy_import('pyarrow')
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+ARROW_STREAM_MIMETYPE = 'application/vnd.apache.arrow.stream'
+ARROW_FILE_MIMETYPE = 'application/vnd.apache.arrow.file'
+
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, 'application/x-msgpack', 'application/vnd.msgpack')
+ARROW_MIMETYPES = (ARROW_STREAM_MIMETYPE, ARROW_FILE_MIMETYPE)
+
+
+class UnsupportedMediaType(ValueError):
+    pass
+
+
+def not_acceptable_payload(arrow=True):
+    """Error body for an Accept header negotiate() could not satisfy"""
+    return {"error": "None of the types in the Accept header can be produced",
+            "available": available_mimetypes(arrow)}
+
+
+def is_msgpack(mimetype):
+    return (mimetype or '').lower() in MSGPACK_MIMETYPES
+
+
+def is_arrow(mimetype):
+    return (mimetype or '').lower() in ARROW_MIMETYPES
+
+
+def available_mimetypes(arrow=True):
+    """Response types this process can produce, JSON first"""
+    mimetypes = [JSON_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.append(MSGPACK_MIMETYPE)
+    if arrow and pa is not None:
+        mimetypes.append(ARROW_STREAM_MIMETYPE)
+    return mimetypes
+
+
+def negotiate(accept, arrow=True):
+    """Response mimetype for an Accept header; JSON unless a binary type is preferred.
+
+    None when the header only lists types this process cannot produce (a 406).
+    """
+    if not accept:
+        return JSON_MIMETYPE
+    offered = available_mimetypes(arrow)
+    best, best_q = None, -1.0
+    for entry in accept.split(','):
+        parts = [p.strip() for p in entry.split(';')]
+        mimetype = parts[0].lower()
+        q = 1.0
+        for param in parts[1:]:
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if mimetype in ('*/*', 'application/*'):
+            mimetype = JSON_MIMETYPE
+        elif mimetype in MSGPACK_MIMETYPES:
+            mimetype = MSGPACK_MIMETYPE
+        elif mimetype == ARROW_FILE_MIMETYPE:
+            mimetype = ARROW_STREAM_MIMETYPE
+        # Ties go to the first listed type
+        if mimetype in offered and q > best_q and q > 0:
+            best, best_q = mimetype, q
+    return best
+
+
+def dumps(payload):
+    """Compact JSON bytes, through orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(payload, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson when available"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent'):
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, option=option).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def loads(body, mimetype):
+    """Decode a JSON or MessagePack request body; None for an empty body.
+
+    Raises ValueError for malformed bodies and UnsupportedMediaType for binary
+    types this process cannot read.
+    """
+    if not body:
+        return None
+    if is_msgpack(mimetype):
+        if msgpack is None:
+            raise UnsupportedMediaType("MessagePack support is not installed (pip install msgpack)")
+        try:
+            return msgpack.unpackb(body, raw=False, strict_map_key=False)
+        except Exception as e:
+            raise ValueError(str(e))
+    if orjson is not None:
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError as e:
+            raise ValueError(str(e))
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    return json.loads(body)
+
+
+def read_arrow(body, mimetype):
+    """Arrow IPC stream or file body as a column-oriented DataFrame"""
+    if pa is None:
+        raise UnsupportedMediaType("Arrow support is not installed (pip install pyarrow)")
+    try:
+        if (mimetype or '').lower() == ARROW_FILE_MIMETYPE:
+            table = pa.ipc.open_file(pa.BufferReader(body)).read_all()
+        else:
+            table = pa.ipc.open_stream(pa.BufferReader(body)).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValueError(str(e))
+    # Plain string columns, so validation sees the same values as for JSON
+    import pyarrow.compute as pc
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, pc.cast(table.column(i), field.type.value_type))
+    return table.to_pandas()
+
+
+def arrow_columns(payload):
+    """Columns of an Arrow response for a /predict, /predict/batch or /predict/scenarios body.
+
+    Per-row values become columns; the remaining scalars (version, timestamp,
+    counts) travel as schema metadata.
+    """
+    if 'axes' in payload:
+        # Scenario grid: one column per swept feature plus the flattened predictions
+        shape = payload['shape']
+        grids = np.meshgrid(*[np.arange(n) for n in shape], indexing='ij')
+        columns = {axis['feature']: np.asarray(axis['values'], dtype=object)[grid.ravel()].tolist()
+                   for axis, grid in zip(payload['axes'], grids)}
+        columns['prediction'] = np.asarray(payload['predictions'], dtype=np.float64).ravel()
+        skip = ('axes', 'predictions')
+    elif 'predictions' in payload:
+        errors = [None] * payload['count']
+        for entry in payload['errors']:
+            errors[entry['index']] = entry['error']
+        columns = {'prediction': pa.array(payload['predictions'], type=pa.float64()),
+                   'error': pa.array(errors, type=pa.string())}
+        skip = ('predictions', 'errors')
+    else:
+        columns = {'prediction': [payload['prediction']]}
+        if 'prediction_probabilities' in payload:
+            columns['prediction_probabilities'] = [payload['prediction_probabilities']]
+        skip = ('prediction', 'prediction_probabilities', 'input_data')
+    metadata = {key: value for key, value in payload.items() if key not in skip}
+    return columns, metadata
+
+
+def write_arrow(columns, metadata=None):
+    """Arrow IPC stream bytes for a dict of columns; metadata values are JSON encoded"""
+    table = pa.table(columns)
+    if metadata:
+        table = table.replace_schema_metadata({key: dumps(value) for key, value in metadata.items()})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def encode(payload, status, mimetype):
+    """(body bytes, mimetype) for a response payload in the negotiated format.
+
+    Error bodies are never Arrow tables; they fall back to JSON.
+    """
+    if mimetype == MSGPACK_MIMETYPE:
+        return msgpack.packb(payload, default=_json_default), MSGPACK_MIMETYPE
+    if mimetype == ARROW_STREAM_MIMETYPE and status == 200:
+        return write_arrow(*arrow_columns(payload)), ARROW_STREAM_MIMETYPE
+    return dumps(payload), JSON_MIMETYPE